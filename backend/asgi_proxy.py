@@ -0,0 +1,452 @@
+"""
+Asyncio (ASGI) implementation of the HTTP proxy's upload, status and download endpoints.
+
+Serves /api/upload, /api/status/<job_id> and /processed/<filename> exactly
+like http_proxy.py, with the same configuration and helpers, but each
+request is a coroutine: upload bodies are forwarded to UploadCSV through
+grpc.aio as they arrive, status calls use grpc.aio stubs on channels shared
+by all requests, and files are streamed in blocks read off the event loop.
+A slow client therefore holds a few buffers, not a thread. Run it under an
+ASGI server, for example:
+
+    uvicorn asgi_proxy:app --host 0.0.0.0 --port 8000 --workers 4
+
+The remaining endpoints (cancel, datasets, totals, profiles, storage and
+cache stats) are served by the Flask proxy only.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+from typing import AsyncIterator, Dict
+from urllib.parse import parse_qsl
+
+import grpc
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import http_date, parse_accept_header, parse_etags, parse_options_header, parse_range_header
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import http_proxy
+from proto import sales_pb2, sales_pb2_grpc
+from utils.streaming_upload import AsyncMultipartFileReader, arechunk
+
+logger = logging.getLogger(__name__)
+
+# Size of each block read from a result file and sent to the client
+DOWNLOAD_BLOCK_SIZE = 256 * 1024
+
+# Shared grpc.aio channels, one per (target, event loop); aio channels are bound to their loop
+_channels: Dict[tuple, grpc.aio.Channel] = {}
+
+
+class ClientDisconnected(Exception):
+    """The client went away before sending its whole request body."""
+
+
+def _get_stub() -> sales_pb2_grpc.SalesServiceStub:
+    """Return an aio stub on the running loop's shared channel to GRPC_SERVER."""
+    key = (http_proxy.GRPC_SERVER, asyncio.get_running_loop())
+    channel = _channels.get(key)
+    if channel is None:
+        options = []
+        if http_proxy.GRPC_HEALTH_CHECK:
+            options.append(('grpc.service_config', http_proxy.HEALTH_CHECK_SERVICE_CONFIG))
+        channel = _channels[key] = http_proxy.TRANSPORT.aio_insecure_channel(http_proxy.GRPC_SERVER, options)
+    return sales_pb2_grpc.SalesServiceStub(channel)
+
+
+async def close_channels() -> None:
+    """Close the running loop's gRPC channels."""
+    loop = asyncio.get_running_loop()
+    for key in [key for key in _channels if key[1] is loop]:
+        await _channels.pop(key).close()
+
+
+def _headers(scope) -> Dict[str, str]:
+    """Request headers with lower-case names (repeated headers keep the last value)."""
+    return {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+
+
+def _query(scope) -> MultiDict:
+    """Query parameters as a MultiDict, so http_proxy's argument helpers apply unchanged."""
+    return MultiDict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+
+
+def _auth_token(headers: Dict[str, str], query: MultiDict) -> str:
+    """Extract auth token from the Authorization header or the token query parameter."""
+    auth_header = headers.get('authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header[7:]
+    return query.get('token', '')
+
+
+async def _send_json(send, status: int, payload, headers=(), head: bool = False) -> None:
+    """Send a complete JSON response; for HEAD requests (head=True) only its headers."""
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            (b'access-control-allow-origin', b'*'),
+            *((name.encode('latin-1'), value.encode('latin-1')) for name, value in headers)
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+
+async def _iter_body(receive) -> AsyncIterator[bytes]:
+    """
+    Yield the request body as the server receives it.
+    
+    Raises:
+        ClientDisconnected: If the client disconnects mid-body
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ClientDisconnected()
+        body = message.get('body', b'')
+        if body:
+            yield body
+        if not message.get('more_body', False):
+            return
+
+
+async def upload(scope, receive, send) -> None:
+    """
+    Stream the request body to gRPC as it arrives.
+    
+    Accepts the same bodies and query parameters as http_proxy.upload().
+    """
+    headers = _headers(scope)
+    query = _query(scope)
+    auth_token = _auth_token(headers, query)
+    
+    # Validate authentication before reading any of the body
+    try:
+        http_proxy.auth_manager.require_auth(auth_token)
+    except PermissionError:
+        await _send_json(send, 401, {'error': 'Authentication failed'})
+        return
+    
+    mimetype, params = parse_options_header(headers.get('content-type', ''))
+    body = _iter_body(receive)
+    if mimetype == 'multipart/form-data':
+        boundary = params.get('boundary')
+        if not boundary:
+            await _send_json(send, 400, {'error': 'Missing multipart boundary'})
+            return
+        
+        reader = AsyncMultipartFileReader(body, boundary.encode('latin-1'))
+        try:
+            filename = await reader.open()
+        except ClientDisconnected:
+            logger.info("Client disconnected before sending the upload's file part")
+            return
+        except ValueError:
+            await _send_json(send, 400, {'error': 'Malformed multipart body'})
+            return
+        
+        if filename is None:
+            await _send_json(send, 400, {'error': 'No file provided'})
+            return
+        if filename == '':
+            await _send_json(send, 400, {'error': 'No file selected'})
+            return
+        
+        data_chunks = reader.iter_chunks(http_proxy.UPLOAD_CHUNK_SIZE)
+    elif mimetype in http_proxy.RAW_UPLOAD_MIMETYPES:
+        filename = headers.get('x-filename') or query.get('filename', 'upload.csv')
+        data_chunks = arechunk(body, http_proxy.UPLOAD_CHUNK_SIZE)
+    else:
+        await _send_json(send, 415, {'error': f'Unsupported content type: {mimetype}'})
+        return
+    
+    dataset = query.get('dataset', '')
+    profile = query.get('profile', '').lower() in ('1', 'true', 'yes')
+    columns = http_proxy._column_mapping_from_args(query)
+    filters = http_proxy._row_filter_from_args(query)
+    
+    # Forward body chunks to gRPC as they are read
+    disconnected = False
+    
+    async def generate_chunks():
+        nonlocal disconnected
+        first_chunk = True
+        try:
+            async for chunk_data in data_chunks:
+                chunk = sales_pb2.UploadChunk(data=chunk_data)
+                if first_chunk:
+                    chunk.filename = filename
+                    chunk.auth_token = auth_token
+                    chunk.dataset = dataset
+                    chunk.profile = profile
+                    chunk.columns.CopyFrom(columns)
+                    chunk.row_filter.CopyFrom(filters)
+                    first_chunk = False
+                
+                yield chunk
+        except ClientDisconnected:
+            # Fails the gRPC call; the server discards what it buffered
+            disconnected = True
+            raise
+    
+    try:
+        response = await _get_stub().UploadCSV(generate_chunks())
+    except asyncio.CancelledError:
+        # gRPC cancels the call when the body stream fails; nobody is left to read a response
+        if not disconnected:
+            raise
+        logger.info("Client disconnected mid-upload, upload abandoned")
+        return
+    except grpc.aio.AioRpcError as e:
+        if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            # Server at capacity: pass its retry hint on to the HTTP client
+            retry_after_ms = dict(tuple(e.trailing_metadata() or ())).get('retry-after-ms', '1000')
+            retry_after = max(1, math.ceil(int(retry_after_ms) / 1000))
+            await _send_json(send, 503, {'error': e.details()}, [('retry-after', str(retry_after))])
+            return
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            # Larger than the server will ever buffer (it names its limit), or options it cannot use
+            too_large = 'max-upload-bytes' in dict(tuple(e.trailing_metadata() or ()))
+            await _send_json(send, 413 if too_large else 400, {'error': e.details()})
+            return
+        await _send_json(send, 500, {'error': str(e)})
+        return
+    except Exception as e:
+        await _send_json(send, 500, {'error': str(e)})
+        return
+    
+    result = {
+        'job_id': response.job_id,
+        'status': response.status,
+        'message': response.message,
+        'download_url': response.download_url if response.download_url else ''
+    }
+    if response.HasField('metrics'):
+        result['metrics'] = http_proxy._metrics_to_dict(response.metrics)
+    await _send_json(send, 200, result)
+
+
+async def status(scope, receive, send, job_id: str) -> None:
+    """Check job status through the shared status micro-cache."""
+    auth_token = _auth_token(_headers(scope), _query(scope))
+    head = scope['method'] == 'HEAD'
+    
+    # Validate authentication
+    try:
+        http_proxy.auth_manager.require_auth(auth_token)
+    except PermissionError:
+        await _send_json(send, 401, {'error': 'Authentication failed'}, head=head)
+        return
+    
+    async def fetch_status():
+        request_msg = sales_pb2.JobStatusRequest(job_id=job_id, auth_token=auth_token)
+        return http_proxy._status_to_dict(await _get_stub().GetJobStatus(request_msg))
+    
+    try:
+        # Auth was checked above, so cached entries can be shared across callers
+        if http_proxy.status_cache is None:
+            result = await fetch_status()
+        else:
+            result = await http_proxy.status_cache.get_async(job_id, fetch_status)
+    except Exception as e:
+        await _send_json(send, 500, {'error': str(e)}, head=head)
+        return
+    await _send_json(send, 200, result, head=head)
+
+
+def _open_download(filename: str, accepts_gzip: bool):
+    """
+    Resolve and open a result file for download (runs in a worker thread).
+    
+    The file is opened before any response is sent, so an output evicted
+    mid-download is still served in full.
+    
+    Returns:
+        (open file, os.stat_result, ETag, content encoding or None)
+    
+    Raises:
+        PermissionError: If the name resolves outside PROCESSED_DIR
+        FileNotFoundError: If there is no such result
+    """
+    storage = http_proxy._get_storage()
+    file_path = storage.locate(filename) or os.path.join(http_proxy.PROCESSED_DIR, filename)
+    abs_file_path = os.path.abspath(file_path)
+    if not abs_file_path.startswith(os.path.abspath(http_proxy.PROCESSED_DIR)):
+        raise PermissionError(filename)
+    
+    # Prefer the precompressed sibling when the client accepts gzip
+    serve_path, content_encoding = abs_file_path, None
+    if accepts_gzip and os.path.isfile(abs_file_path + '.gz'):
+        serve_path, content_encoding = abs_file_path + '.gz', 'gzip'
+    
+    f = open(serve_path, 'rb')
+    try:
+        stat_result = os.fstat(f.fileno())
+        etag = http_proxy._file_etag(serve_path, stat_result)
+    except BaseException:
+        f.close()
+        raise
+    
+    # Downloads keep an output from being evicted as least recently used
+    try:
+        storage.touch(filename)
+    except Exception as e:
+        logger.warning(f"Could not record access to {filename}: {str(e)}")
+    return f, stat_result, etag, content_encoding
+
+
+async def download(scope, receive, send, filename: str) -> None:
+    """Serve a processed CSV file with the caching, range and gzip behaviour of the Flask proxy."""
+    if not filename.endswith('.csv'):
+        await _send_json(send, 400, {'error': 'Invalid file type'})
+        return
+    
+    headers = _headers(scope)
+    accepts_gzip = bool(parse_accept_header(headers.get('accept-encoding'))['gzip'])
+    try:
+        f, stat_result, etag, content_encoding = await asyncio.to_thread(_open_download, filename, accepts_gzip)
+    except PermissionError:
+        await _send_json(send, 403, {'error': 'Access denied'})
+        return
+    except FileNotFoundError:
+        # The output was evicted: stop serving cached statuses that link to it
+        if http_proxy.status_cache is not None:
+            http_proxy.status_cache.invalidate_download(f'/processed/{filename}')
+        await _send_json(send, 404, {'error': 'File not found'})
+        return
+    
+    try:
+        length = stat_result.st_size
+        response_headers = [
+            ('etag', f'"{etag}"'),
+            ('cache-control', f'public, max-age={http_proxy.DOWNLOAD_MAX_AGE}, immutable'),
+            ('last-modified', http_date(stat_result.st_mtime)),
+            ('vary', 'Accept-Encoding'),
+            ('access-control-allow-origin', '*')
+        ]
+        
+        # Conditional GET: the client's copy is current
+        if_none_match = headers.get('if-none-match')
+        if if_none_match and parse_etags(if_none_match).contains(etag):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': _encode(response_headers)})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        
+        start, stop, status_code = 0, length, 200
+        byte_range = parse_range_header(headers.get('range'))
+        if byte_range is not None:
+            bounds = byte_range.range_for_length(length)
+            if bounds is None:
+                response_headers.append(('content-range', f'bytes */{length}'))
+                await send({'type': 'http.response.start', 'status': 416, 'headers': _encode(response_headers)})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            start, stop = bounds
+            status_code = 206
+            response_headers.append(('content-range', f'bytes {start}-{stop - 1}/{length}'))
+        
+        response_headers += [
+            ('content-type', 'text/csv; charset=utf-8'),
+            ('content-length', str(stop - start)),
+            ('content-disposition', f'attachment; filename={filename}'),
+            ('accept-ranges', 'bytes')
+        ]
+        if content_encoding:
+            response_headers.append(('content-encoding', content_encoding))
+        await send({'type': 'http.response.start', 'status': status_code, 'headers': _encode(response_headers)})
+        
+        if scope['method'] == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        
+        # Reads happen off the event loop; each block is sent as soon as it is read
+        if start:
+            await asyncio.to_thread(f.seek, start)
+        remaining = stop - start
+        while remaining > 0:
+            block = await asyncio.to_thread(f.read, min(DOWNLOAD_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            await send({'type': 'http.response.body', 'body': block, 'more_body': remaining > 0})
+        if remaining > 0:
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def _encode(headers) -> list:
+    """Encode (name, value) header pairs for ASGI."""
+    return [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+async def _preflight(scope, send) -> None:
+    """Answer a CORS preflight request, allowing any origin like the Flask proxy."""
+    requested = _headers(scope).get('access-control-request-headers', '')
+    await send({'type': 'http.response.start', 'status': 200, 'headers': _encode([
+        ('access-control-allow-origin', '*'),
+        ('access-control-allow-methods', 'GET, HEAD, POST, OPTIONS'),
+        ('access-control-allow-headers', requested),
+        ('content-length', '0')
+    ])})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _lifespan(receive, send) -> None:
+    """Handle ASGI lifespan events; gRPC channels are closed on shutdown."""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_channels()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send) -> None:
+    """ASGI entry point routing to the upload, status and download handlers."""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    
+    path, method = scope['path'], scope['method']
+    if method == 'OPTIONS':
+        await _preflight(scope, send)
+        return
+    
+    if path == '/api/upload':
+        if method != 'POST':
+            await _send_json(send, 405, {'error': 'Method not allowed'}, [('allow', 'POST')])
+            return
+        await upload(scope, receive, send)
+        return
+    
+    for prefix, handler in (('/api/status/', status), ('/processed/', download)):
+        if path.startswith(prefix):
+            name = path[len(prefix):]
+            if not name or '/' in name:
+                break
+            if method not in ('GET', 'HEAD'):
+                await _send_json(send, 405, {'error': 'Method not allowed'}, [('allow', 'GET, HEAD')])
+                return
+            await handler(scope, receive, send, name)
+            return
+    
+    await _send_json(send, 404, {'error': 'Not found'})
+
+
+if __name__ == '__main__':
+    import uvicorn
+    
+    port = int(os.getenv('HTTP_PORT', '8000'))
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -0,0 +1,72 @@
+"""
+Benchmark repeat downloads of a processed result through the HTTP proxy.
+
+Compares a plain full fetch against conditional (If-None-Match) and
+gzip-encoded fetches, reporting bytes transferred and latency per request.
+
+Usage:
+    python benchmarks/bench_downloads.py [--departments 200000] [--requests 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.csv_processor import write_results_atomic
+
+
+def _measure(client, url, headers, requests):
+    """Return (avg bytes, avg ms) for repeated GETs of url."""
+    total_bytes = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(url, headers=headers)
+        total_bytes += len(response.data)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return total_bytes / requests, elapsed_ms / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--departments', type=int, default=200000, help='rows in the result file')
+    parser.add_argument('--requests', type=int, default=50, help='fetches per scenario')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as processed_dir:
+        os.environ['PROCESSED_DIR'] = processed_dir
+        import http_proxy
+        http_proxy.PROCESSED_DIR = processed_dir
+        
+        dept_counts = {f'Department {i:07d}': i * 7 for i in range(args.departments)}
+        result_path = os.path.join(processed_dir, 'result.csv')
+        write_results_atomic(dept_counts, result_path)
+        write_results_atomic(dept_counts, result_path + '.gz', compress=True)
+        
+        client = http_proxy.app.test_client()
+        url = '/processed/result.csv'
+        etag = client.get(url).headers['ETag']
+        gzip_etag = client.get(url, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        
+        scenarios = [
+            ('full fetch', {}),
+            ('gzip fetch', {'Accept-Encoding': 'gzip'}),
+            ('conditional (304)', {'If-None-Match': etag}),
+            ('conditional gzip (304)', {'Accept-Encoding': 'gzip', 'If-None-Match': gzip_etag}),
+            ('range 64 KB', {'Range': 'bytes=0-65535'}),
+        ]
+        
+        results = [(name, *_measure(client, url, headers, args.requests)) for name, headers in scenarios]
+        _, baseline_bytes, baseline_ms = results[0]
+        
+        print(f"Result file: {os.path.getsize(result_path)} bytes, {args.departments} departments")
+        print(f"{'scenario':<24}{'bytes/req':>12}{'ms/req':>10}{'bytes saved':>14}{'speedup':>10}")
+        for name, avg_bytes, avg_ms in results:
+            saved = 1 - avg_bytes / baseline_bytes if baseline_bytes else 0
+            print(f"{name:<24}{avg_bytes:>12.0f}{avg_ms:>10.2f}{saved:>13.1%}{baseline_ms / avg_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
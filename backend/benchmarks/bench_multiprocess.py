@@ -0,0 +1,119 @@
+"""
+Benchmark aggregate throughput of the multi-process server by worker count.
+
+For each worker count, starts server.py with GRPC_WORKERS set on a free
+loopback port, then runs --clients client processes, each on its own
+connection (so SO_REUSEPORT spreads them across workers), uploading
+--uploads files and polling GetJobStatus until every job completes.
+Throughput is bounded by the number of CPU cores available.
+
+Usage:
+    python benchmarks/bench_multiprocess.py [--workers 1 2 4] [--clients 8] [--uploads 4] [--size-mb 8]
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import grpc
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench_upload_chunks import generate_csv
+from proto import sales_pb2, sales_pb2_grpc
+from utils.streaming_upload import DEFAULT_CHUNK_SIZE
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, storage_dir: str) -> subprocess.Popen:
+    """Start server.py with the given worker count and wait until it accepts RPCs."""
+    env = dict(
+        os.environ,
+        GRPC_PORT=str(port),
+        GRPC_WORKERS=str(workers),
+        OUTPUT_DIR=os.path.join(storage_dir, 'processed'),
+        UPLOAD_SPOOL_DIR=os.path.join(storage_dir, 'uploads'),
+        DATASET_DIR=os.path.join(storage_dir, 'datasets'),
+        RESULT_INDEX_PATH=os.path.join(storage_dir, 'results.db'),
+        JOB_STATE_PATH=os.path.join(storage_dir, 'jobs.db')
+    )
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, 'server.py')],
+        env=env, cwd=storage_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    with grpc.insecure_channel(f'127.0.0.1:{port}') as channel:
+        grpc.channel_ready_future(channel).result(timeout=30)
+    # Give every worker time to bind before connections are spread across them
+    time.sleep(2)
+    return process
+
+
+def run_client(args) -> float:
+    """Upload and wait for `uploads` jobs on a dedicated connection; return elapsed seconds."""
+    port, data, uploads = args
+    options = [('grpc.use_local_subchannel_pool', 1)]
+    with grpc.insecure_channel(f'127.0.0.1:{port}', options=options) as channel:
+        stub = sales_pb2_grpc.SalesServiceStub(channel)
+        
+        def chunks():
+            for offset in range(0, len(data), DEFAULT_CHUNK_SIZE):
+                yield sales_pb2.UploadChunk(data=data[offset:offset + DEFAULT_CHUNK_SIZE], filename='bench.csv')
+        
+        start = time.perf_counter()
+        job_ids = [stub.UploadCSV(chunks()).job_id for _ in range(uploads)]
+        for job_id in job_ids:
+            while True:
+                status = stub.GetJobStatus(sales_pb2.JobStatusRequest(job_id=job_id)).status
+                if status not in ('processing', 'cancelling'):
+                    break
+                time.sleep(0.05)
+            if status != 'completed':
+                raise RuntimeError(f'Job {job_id} ended as {status}')
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='worker counts to compare')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent client processes')
+    parser.add_argument('--uploads', type=int, default=4, help='uploads per client')
+    parser.add_argument('--size-mb', type=int, default=8, help='size of each uploaded CSV')
+    args = parser.parse_args()
+    
+    data = generate_csv(args.size_mb * 1024 * 1024)
+    total_mb = len(data) * args.clients * args.uploads / 1024 / 1024
+    print(f"CPU cores: {os.cpu_count()}, {args.clients} clients x {args.uploads} uploads of "
+          f"{len(data) / 1024 / 1024:.1f} MB")
+    print(f"{'workers':>8}{'seconds':>10}{'jobs/s':>10}{'MB/s':>10}{'speedup':>10}")
+    
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as storage_dir:
+            port = free_port()
+            server = start_server(port, workers, storage_dir)
+            try:
+                # Clients time themselves so process start-up is not counted
+                with multiprocessing.get_context('spawn').Pool(args.clients) as pool:
+                    elapsed = max(pool.map(run_client, [(port, data, args.uploads)] * args.clients))
+            finally:
+                server.terminate()
+                server.wait(60)
+        
+        baseline = baseline or elapsed
+        jobs = args.clients * args.uploads
+        print(f"{workers:>8}{elapsed:>10.2f}{jobs / elapsed:>10.2f}{total_mb / elapsed:>10.1f}"
+              f"{baseline / elapsed:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
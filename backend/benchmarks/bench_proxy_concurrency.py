@@ -0,0 +1,248 @@
+"""
+Concurrency benchmark of the Flask proxy against the ASGI proxy.
+
+Starts server.py, the Flask proxy (werkzeug, one thread per connection) and
+asgi_proxy under uvicorn as separate processes on loopback ports, all in
+front of the same gRPC server and output directory. At each concurrency
+level, that many client threads issue a mix of status polls, result
+downloads and small uploads against one proxy for a fixed time. Reports
+requests per second, p50/p99 latency per operation and errors.
+
+Usage:
+    python benchmarks/bench_proxy_concurrency.py [--concurrency 16 64 256] [--seconds 10]
+"""
+import argparse
+import collections
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.bench_upload_chunks import generate_csv
+from benchmarks.loadgen import percentile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Serves http_proxy.app with werkzeug's threaded server, as `python http_proxy.py` does without debug
+FLASK_SERVER_CODE = (
+    "import logging, sys, http_proxy\n"
+    "from werkzeug.serving import make_server\n"
+    "logging.getLogger('werkzeug').setLevel(logging.ERROR)\n"
+    "make_server('127.0.0.1', int(sys.argv[1]), http_proxy.app, threaded=True).serve_forever()\n"
+)
+
+# Operation mix: (name, weight)
+OPERATIONS = (('status', 6), ('download', 3), ('upload', 1))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    """Block until something listens on port, or fail if the process exits first."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{process.args} exited with {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Nothing listening on port {port} after {timeout}s')
+
+
+def start_processes(storage_dir: str) -> dict:
+    """Start the gRPC server and both proxies; return {name: (process, port)}."""
+    grpc_port, flask_port, asgi_port = free_port(), free_port(), free_port()
+    processed_dir = os.path.join(storage_dir, 'processed')
+    env = {
+        **os.environ,
+        'GRPC_PORT': str(grpc_port),
+        'GRPC_SERVER': f'127.0.0.1:{grpc_port}',
+        'OUTPUT_DIR': processed_dir,
+        'PROCESSED_DIR': processed_dir,
+        'UPLOAD_SPOOL_DIR': os.path.join(storage_dir, 'uploads'),
+        'DATASET_DIR': os.path.join(storage_dir, 'datasets'),
+        'RESULT_INDEX_PATH': os.path.join(storage_dir, 'results.db'),
+        'JOB_STATE_PATH': os.path.join(storage_dir, 'jobs.db'),
+        'MAX_ACTIVE_JOBS': '0',
+        'MAX_INFLIGHT_MB': '0',
+        'AUTH_ENABLED': 'false'
+    }
+    commands = {
+        'grpc': ([sys.executable, 'server.py'], grpc_port),
+        'flask': ([sys.executable, '-c', FLASK_SERVER_CODE, str(flask_port)], flask_port),
+        'asgi': ([sys.executable, '-m', 'uvicorn', 'asgi_proxy:app', '--host', '127.0.0.1',
+                  '--port', str(asgi_port), '--log-level', 'warning', '--no-access-log'], asgi_port)
+    }
+    processes = {}
+    try:
+        for name, (command, port) in commands.items():
+            process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            processes[name] = (process, port)
+            wait_for_port(port, process)
+    except Exception:
+        stop_processes(processes)
+        raise
+    return processes
+
+
+def stop_processes(processes: dict) -> None:
+    for process, _ in processes.values():
+        process.terminate()
+    for process, _ in processes.values():
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class Client:
+    """One keep-alive connection to a proxy, reopened whenever the server closes it."""
+    
+    def __init__(self, port: int):
+        self.port = port
+        self.conn = None
+    
+    def request(self, method: str, path: str, body: bytes = None, headers=None) -> tuple:
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            self.conn.request(method, path, body=body, headers=headers or {})
+            response = self.conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+        if response.will_close:
+            self.conn.close()
+            self.conn = None
+        return response.status, payload
+
+
+def prepare_job(port: int, data: bytes) -> tuple:
+    """Upload one CSV and wait for it; return (job_id, download path)."""
+    client = Client(port)
+    _, payload = client.request('POST', '/api/upload', data, {'Content-Type': 'text/csv'})
+    job_id = json.loads(payload)['job_id']
+    while True:
+        _, payload = client.request('GET', f'/api/status/{job_id}')
+        result = json.loads(payload)
+        if result['status'] != 'processing':
+            return job_id, result['download_url']
+        time.sleep(0.05)
+
+
+def run_level(port: int, concurrency: int, seconds: float, job_id: str, download_path: str, data: bytes) -> dict:
+    """Drive one proxy with concurrency threads; return latency samples and errors per operation."""
+    latencies = {name: [] for name, _ in OPERATIONS}
+    errors = collections.Counter()
+    lock = threading.Lock()
+    names = [name for name, _ in OPERATIONS]
+    weights = [weight for _, weight in OPERATIONS]
+    deadline = time.monotonic() + seconds
+    
+    def worker():
+        client = Client(port)
+        local = {name: [] for name in names}
+        local_errors = collections.Counter()
+        while time.monotonic() < deadline:
+            name = random.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                if name == 'status':
+                    status, _ = client.request('GET', f'/api/status/{job_id}')
+                elif name == 'download':
+                    status, _ = client.request('GET', download_path)
+                else:
+                    status, _ = client.request('POST', '/api/upload', data, {'Content-Type': 'text/csv'})
+            except (OSError, http.client.HTTPException) as e:
+                local_errors[f'{name} {type(e).__name__}'] += 1
+                continue
+            if status != 200:
+                local_errors[f'{name} HTTP {status}'] += 1
+                continue
+            local[name].append(time.perf_counter() - start)
+        with lock:
+            for name in names:
+                latencies[name].extend(local[name])
+            errors.update(local_errors)
+    
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    
+    requests = sum(len(samples) for samples in latencies.values())
+    report = {'requests': requests, 'per_second': requests / elapsed, 'errors': dict(errors)}
+    for name in names:
+        samples = sorted(latencies[name])
+        report[f'{name}_p50_ms'] = percentile(samples, 50) * 1000
+        report[f'{name}_p99_ms'] = percentile(samples, 99) * 1000
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256], help='client threads per run')
+    parser.add_argument('--seconds', type=float, default=10.0, help='duration of each run')
+    parser.add_argument('--upload-kb', type=int, default=64, help='size of each uploaded CSV')
+    parser.add_argument('--result-departments', type=int, default=2000,
+                        help='departments in the downloaded result (sets its size)')
+    parser.add_argument('--json', action='store_true', help='print the reports as JSON')
+    args = parser.parse_args()
+    
+    upload_data = generate_csv(args.upload_kb * 1024)
+    # A result with many departments, so downloads move a realistic amount of data
+    result_data = ('Department Name,Date,Number of Sales\n' + ''.join(
+        f'Department {i},2024-01-01,{i}\n' for i in range(args.result_departments)
+    )).encode()
+    
+    reports = []
+    with tempfile.TemporaryDirectory() as storage_dir:
+        processes = start_processes(storage_dir)
+        try:
+            job_id, download_path = prepare_job(processes['flask'][1], result_data)
+            for name in ('flask', 'asgi'):
+                port = processes[name][1]
+                for concurrency in args.concurrency:
+                    report = run_level(port, concurrency, args.seconds, job_id, download_path, upload_data)
+                    reports.append({'proxy': name, 'concurrency': concurrency, **report})
+        finally:
+            stop_processes(processes)
+    
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    
+    print(f"{'proxy':<7}{'conc':>6}{'req/s':>9}{'errors':>8}"
+          + ''.join(f"{name + ' p50':>15}{name + ' p99':>15}" for name, _ in OPERATIONS))
+    for report in reports:
+        print(f"{report['proxy']:<7}{report['concurrency']:>6}{report['per_second']:>9.0f}"
+              f"{sum(report['errors'].values()):>8}"
+              + ''.join(f"{report[f'{name}_p50_ms']:>13.1f}ms{report[f'{name}_p99_ms']:>13.1f}ms"
+                        for name, _ in OPERATIONS))
+    for report in reports:
+        for reason, count in sorted(report['errors'].items()):
+            print(f"  {report['proxy']} x{report['concurrency']} error {reason}: {count}")
+
+
+if __name__ == '__main__':
+    main()
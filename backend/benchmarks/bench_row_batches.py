@@ -0,0 +1,122 @@
+"""
+Benchmark row batch uploads against CSV uploads of the same rows.
+
+Starts an in-process gRPC server on a loopback port, generates sales rows
+and uploads them once as CSV text and once as pre-parsed columnar row
+batches (UploadChunk.rows), timing from the first message until the job
+completes. Reports wire size, the server's processing time and rows per
+second for each format, best of --repeat runs.
+
+Usage:
+    python benchmarks/bench_row_batches.py [--rows 2000000] [--batch-rows 65536] [--repeat 3]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.bench_upload_chunks import DEPARTMENTS, start_server
+from proto import sales_pb2, sales_pb2_grpc
+from utils.csv_processor import day_number
+
+# CSV upload message size (the proxy's default UPLOAD_CHUNK_SIZE)
+CSV_CHUNK_SIZE = 256 * 1024
+
+
+def generate_rows(count: int) -> list:
+    """Generate (department, date, sales) rows like generate_csv()."""
+    return [
+        (DEPARTMENTS[i % len(DEPARTMENTS)], f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}', i % 1000)
+        for i in range(count)
+    ]
+
+
+def csv_chunks(rows: list) -> list:
+    """Encode rows as CSV text split into CSV_CHUNK_SIZE UploadChunk messages."""
+    data = ('Department Name,Date,Number of Sales\n' + ''.join(
+        f'{department},{date},{sales}\n' for department, date, sales in rows
+    )).encode('utf-8')
+    return [
+        sales_pb2.UploadChunk(data=data[offset:offset + CSV_CHUNK_SIZE], filename='bench.csv' if offset == 0 else '')
+        for offset in range(0, len(data), CSV_CHUNK_SIZE)
+    ]
+
+
+def row_batch_chunks(rows: list, batch_rows: int) -> list:
+    """Encode rows as batch_rows-row RowBatch messages, each with its own department dictionary."""
+    chunks = []
+    days = {}
+    for start in range(0, len(rows), batch_rows):
+        dictionary = {}
+        chunk = sales_pb2.UploadChunk(filename='bench.rows' if start == 0 else '')
+        batch = chunk.rows
+        batch.department_ids.extend(
+            dictionary.setdefault(department, len(dictionary)) for department, _, _ in rows[start:start + batch_rows]
+        )
+        batch.days.extend(
+            days[date] if date in days else days.setdefault(date, day_number(date))
+            for _, date, _ in rows[start:start + batch_rows]
+        )
+        batch.sales.extend(sales for _, _, sales in rows[start:start + batch_rows])
+        batch.departments.extend(dictionary)
+        chunks.append(chunk)
+    return chunks
+
+
+def upload(stub, chunks: list) -> tuple:
+    """Upload prepared chunks; return (seconds until the job completed, its metrics)."""
+    start = time.perf_counter()
+    response = stub.UploadCSV(iter(chunks))
+    if response.status != 'processing':
+        raise RuntimeError(f'Upload failed: {response.message}')
+    while True:
+        status = stub.GetJobStatus(sales_pb2.JobStatusRequest(job_id=response.job_id))
+        if status.status != 'processing':
+            break
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    if status.status != 'completed':
+        raise RuntimeError(f'Job {status.status}: {status.error_message}')
+    return elapsed, status.metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000000, help='rows per upload')
+    parser.add_argument('--batch-rows', type=int, default=65536, help='rows per RowBatch message')
+    parser.add_argument('--repeat', type=int, default=3, help='uploads per format (best is reported)')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.ERROR)
+    rows = generate_rows(args.rows)
+    formats = {
+        'csv': csv_chunks(rows),
+        'row batches': row_batch_chunks(rows, args.batch_rows)
+    }
+    
+    with tempfile.TemporaryDirectory() as output_dir:
+        server, address = start_server(output_dir)
+        try:
+            with grpc.insecure_channel(address) as channel:
+                stub = sales_pb2_grpc.SalesServiceStub(channel)
+                print(f"{args.rows} rows per upload")
+                print(f"{'format':<13}{'messages':>9}{'wire MB':>9}{'seconds':>9}{'processing ms':>15}{'rows/s':>12}")
+                for name, chunks in formats.items():
+                    elapsed, metrics = min((upload(stub, chunks) for _ in range(args.repeat)), key=lambda r: r[0])
+                    if metrics.rows_processed != args.rows:
+                        raise RuntimeError(f'{name}: processed {metrics.rows_processed} of {args.rows} rows')
+                    wire_mb = sum(chunk.ByteSize() for chunk in chunks) / 1024 / 1024
+                    print(f"{name:<13}{len(chunks):>9}{wire_mb:>9.1f}{elapsed:>9.3f}"
+                          f"{metrics.processing_time_ms:>15}{args.rows / elapsed:>12,.0f}")
+        finally:
+            server.stop(0)
+
+
+if __name__ == '__main__':
+    main()
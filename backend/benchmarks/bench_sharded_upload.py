@@ -0,0 +1,112 @@
+"""
+Benchmark sharded uploads against a server with a per-stream bandwidth cap.
+
+Simulates a high-latency link, where a single stream cannot fill the
+available bandwidth, by throttling each UploadCSV stream on the server to
+--stream-mbps. The same generated CSV is then uploaded with
+client.upload_sharded using an increasing number of parts, timing until the
+job's result is published. Throughput scales with the part count until
+the server's aggregation (CPU) becomes the bottleneck.
+
+Usage:
+    python benchmarks/bench_sharded_upload.py [--size-mb 8] [--stream-mbps 0.5] [--repeat 3]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent import futures
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.bench_upload_chunks import generate_csv
+from client import upload_sharded
+from proto import sales_pb2_grpc
+from services.sales_service import SalesService
+
+PART_COUNTS = [1, 2, 4, 8]
+
+
+class ThrottledSalesService(SalesService):
+    """SalesService whose upload streams are each limited to a fixed bandwidth."""
+    
+    def __init__(self, bytes_per_second: float, **kwargs):
+        super().__init__(**kwargs)
+        self.bytes_per_second = bytes_per_second
+    
+    def UploadCSV(self, request_iterator, context):
+        def throttled():
+            start = time.perf_counter()
+            received = 0
+            for chunk in request_iterator:
+                received += len(chunk.data)
+                delay = received / self.bytes_per_second - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+                yield chunk
+        
+        return super().UploadCSV(throttled(), context)
+
+
+def start_server(storage_dir: str, bytes_per_second: float):
+    """Start an in-process throttled gRPC server and return (server, address)."""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max(PART_COUNTS) + 2))
+    service = ThrottledSalesService(
+        bytes_per_second,
+        output_dir=os.path.join(storage_dir, 'processed'),
+        spool_dir=os.path.join(storage_dir, 'uploads'),
+        dataset_dir=os.path.join(storage_dir, 'datasets'),
+        index_path=os.path.join(storage_dir, 'results.db')
+    )
+    sales_pb2_grpc.add_SalesServiceServicer_to_server(service, server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    return server, f'127.0.0.1:{port}'
+
+
+def upload(stub, path: str, parts: int) -> float:
+    """Upload path in parts and return seconds until the job completed."""
+    start = time.perf_counter()
+    response = upload_sharded(stub, path, parts=parts)
+    elapsed = time.perf_counter() - start
+    if response.status != 'completed':
+        raise RuntimeError(f'Upload failed: {response.message}')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=8, help='size of the uploaded CSV')
+    parser.add_argument('--stream-mbps', type=float, default=0.5, help='bandwidth cap per stream in MB/s')
+    parser.add_argument('--repeat', type=int, default=3, help='uploads per part count (best is reported)')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.ERROR)
+    
+    with tempfile.TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, 'bench.csv')
+        with open(path, 'wb') as f:
+            f.write(generate_csv(args.size_mb * 1024 * 1024))
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        
+        server, address = start_server(output_dir, args.stream_mbps * 1024 * 1024)
+        try:
+            with grpc.insecure_channel(address) as channel:
+                stub = sales_pb2_grpc.SalesServiceStub(channel)
+                print(f"Upload size: {size_mb:.1f} MB, per-stream cap: {args.stream_mbps:.1f} MB/s")
+                print(f"{'parts':>8}{'seconds':>10}{'MB/s':>10}{'speedup':>10}")
+                baseline = None
+                for parts in PART_COUNTS:
+                    best = min(upload(stub, path, parts) for _ in range(args.repeat))
+                    baseline = baseline or best
+                    print(f"{parts:>8}{best:>10.3f}{size_mb / best:>10.1f}{baseline / best:>9.2f}x")
+        finally:
+            server.stop(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Polling load test for /api/status/<job_id> with and without the status cache.
+
+Starts an in-process gRPC server whose GetJobStatus calls are counted,
+uploads one long-running and one small job, then has many threads poll
+both through the proxy. Reports request rate, backend RPCs and cache stats.
+
+Usage:
+    python benchmarks/bench_status_polling.py [--pollers 100] [--seconds 5]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import http_proxy
+from proto import sales_pb2_grpc
+from services.sales_service import SalesService
+from utils.status_cache import StatusCache
+from benchmarks.bench_upload_chunks import generate_csv
+
+
+class CountingSalesService(SalesService):
+    """SalesService that counts GetJobStatus RPCs."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.status_calls = 0
+        self._count_lock = threading.Lock()
+    
+    def GetJobStatus(self, request, context):
+        with self._count_lock:
+            self.status_calls += 1
+        return super().GetJobStatus(request, context)
+
+
+def upload(client, data: bytes) -> str:
+    response = client.post('/api/upload', data=data, content_type='text/csv')
+    return response.get_json()['job_id']
+
+
+def poll(job_ids, pollers: int, seconds: float) -> int:
+    """Poll the given jobs from many threads; return the number of requests made."""
+    deadline = time.monotonic() + seconds
+    counts = [0] * pollers
+    
+    def worker(index):
+        client = http_proxy.app.test_client()
+        while time.monotonic() < deadline:
+            client.get(f'/api/status/{job_ids[index % len(job_ids)]}')
+            counts[index] += 1
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(pollers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pollers', type=int, default=100, help='concurrent polling threads')
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration of each run')
+    parser.add_argument('--size-mb', type=int, default=32, help='size of the long-running upload')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.ERROR)
+    big_csv = generate_csv(args.size_mb * 1024 * 1024)
+    small_csv = generate_csv(1024)
+    
+    with tempfile.TemporaryDirectory() as storage_dir:
+        service = CountingSalesService(
+            output_dir=os.path.join(storage_dir, 'processed'),
+            spool_dir=os.path.join(storage_dir, 'uploads'),
+            dataset_dir=os.path.join(storage_dir, 'datasets'),
+            index_path=os.path.join(storage_dir, 'results.db')
+        )
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=32))
+        sales_pb2_grpc.add_SalesServiceServicer_to_server(service, server)
+        port = server.add_insecure_port('127.0.0.1:0')
+        server.start()
+        http_proxy.GRPC_SERVER = f'127.0.0.1:{port}'
+        client = http_proxy.app.test_client()
+        
+        print(f"{'mode':<10}{'requests':>10}{'req/s':>10}{'backend RPCs':>14}{'RPCs/req':>10}{'hit rate':>10}")
+        for mode in ('no cache', 'cache'):
+            http_proxy.status_cache = StatusCache() if mode == 'cache' else None
+            job_ids = [upload(client, big_csv), upload(client, small_csv)]
+            service.status_calls = 0
+            
+            requests = poll(job_ids, args.pollers, args.seconds)
+            
+            hit_rate = http_proxy.status_cache.stats()['hit_rate'] if http_proxy.status_cache else 0.0
+            print(f"{mode:<10}{requests:>10}{requests / args.seconds:>10.0f}{service.status_calls:>14}"
+                  f"{service.status_calls / requests:>10.3f}{hit_rate:>10.1%}")
+        
+        server.stop(0)
+
+
+if __name__ == '__main__':
+    main()
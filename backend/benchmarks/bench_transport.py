@@ -0,0 +1,224 @@
+"""
+Benchmark matrix of gRPC transport profiles over a simulated network.
+
+For each profile in utils.grpc_transport.PROFILES and each --latency-ms
+value, starts an in-process gRPC server with the profile's server settings
+behind a loopback TCP relay that delays every forwarded segment by the
+one-way latency and optionally caps bandwidth at --bandwidth-mbit. A
+client with the same profile then uploads a generated CSV (best of
+--repeat, timed until the upload is accepted) and issues sequential
+GetJobStatus calls. Reports upload MB/s, bytes on the wire (after call
+compression) and status p50/p99 latency.
+
+Usage:
+    python benchmarks/bench_transport.py [--latency-ms 0 20] [--bandwidth-mbit 100] [--size-mb 32]
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent import futures
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.bench_upload_chunks import generate_csv, wait_for_job
+from benchmarks.loadgen import percentile
+from proto import sales_pb2, sales_pb2_grpc
+from services.sales_service import SalesService
+from utils.grpc_transport import PROFILES, TransportProfile
+
+# Upload message size; below the default profile's 4 MB message limit
+CHUNK_SIZE = 1024 * 1024
+
+
+class LinkRelay:
+    """
+    TCP relay on a loopback port simulating a network link to target.
+    
+    Data read in either direction is delivered latency seconds later,
+    paced to bandwidth bytes per second when set. Counts the bytes sent
+    towards the target (upstream) and back (downstream).
+    """
+    
+    def __init__(self, target_port: int, latency: float, bandwidth: float = 0):
+        self.target_port = target_port
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.upstream_bytes = 0
+        self.downstream_bytes = 0
+        self._lock = threading.Lock()
+        self._listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self._listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+    
+    def close(self) -> None:
+        self._listener.close()
+    
+    def _accept(self) -> None:
+        while True:
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            server = socket.create_connection(('127.0.0.1', self.target_port))
+            for sock in (client, server):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(client, server, upstream=True)
+            self._pipe(server, client, upstream=False)
+    
+    def _pipe(self, source: socket.socket, destination: socket.socket, upstream: bool) -> None:
+        """Forward source to destination through a delay line (reader and writer threads)."""
+        pending = queue.Queue()
+        
+        def read():
+            while True:
+                try:
+                    data = source.recv(65536)
+                except OSError:
+                    data = b''
+                pending.put((time.monotonic() + self.latency, data))
+                if not data:
+                    return
+        
+        def write():
+            sent_until = 0.0
+            while True:
+                due, data = pending.get()
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                if not data:
+                    break
+                if self.bandwidth:
+                    # Serialize on the link: this segment starts after the previous one finished
+                    sent_until = max(sent_until, time.monotonic()) + len(data) / self.bandwidth
+                    delay = sent_until - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                try:
+                    destination.sendall(data)
+                except OSError:
+                    break
+                with self._lock:
+                    if upstream:
+                        self.upstream_bytes += len(data)
+                    else:
+                        self.downstream_bytes += len(data)
+            for sock in (source, destination):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+
+def start_server(profile: TransportProfile, storage_dir: str):
+    """Start an in-process server with the profile's settings; return (server, service, port)."""
+    service = SalesService(
+        output_dir=os.path.join(storage_dir, 'processed'),
+        spool_dir=os.path.join(storage_dir, 'uploads'),
+        dataset_dir=os.path.join(storage_dir, 'datasets'),
+        index_path=os.path.join(storage_dir, 'results.db')
+    )
+    server = profile.server(futures.ThreadPoolExecutor(max_workers=10))
+    sales_pb2_grpc.add_SalesServiceServicer_to_server(service, server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    return server, service, port
+
+
+def upload(stub, data: bytes) -> tuple:
+    """Stream data in CHUNK_SIZE messages; return (seconds until accepted, job id)."""
+    def generate_chunks():
+        for offset in range(0, len(data), CHUNK_SIZE):
+            yield sales_pb2.UploadChunk(data=data[offset:offset + CHUNK_SIZE],
+                                        filename='bench.csv' if offset == 0 else '')
+    
+    start = time.perf_counter()
+    response = stub.UploadCSV(generate_chunks())
+    elapsed = time.perf_counter() - start
+    if response.status != 'processing':
+        raise RuntimeError(f'Upload failed: {response.message}')
+    return elapsed, response.job_id
+
+
+def run_case(profile: TransportProfile, latency_ms: float, args, data: bytes) -> dict:
+    """Measure uploads and status calls for one profile and latency."""
+    with tempfile.TemporaryDirectory() as storage_dir:
+        server, service, port = start_server(profile, storage_dir)
+        relay = LinkRelay(port, latency_ms / 1000, args.bandwidth_mbit * 1000 * 1000 / 8)
+        try:
+            with profile.insecure_channel(f'127.0.0.1:{relay.port}') as channel:
+                stub = sales_pb2_grpc.SalesServiceStub(channel)
+                uploads = []
+                for _ in range(args.repeat):
+                    before = relay.upstream_bytes
+                    elapsed, job_id = upload(stub, data)
+                    uploads.append((elapsed, relay.upstream_bytes - before))
+                    wait_for_job(stub, job_id)
+                elapsed, wire_bytes = min(uploads)
+                
+                request = sales_pb2.JobStatusRequest(job_id=job_id)
+                samples = []
+                for _ in range(args.status_calls):
+                    start = time.perf_counter()
+                    stub.GetJobStatus(request)
+                    samples.append(time.perf_counter() - start)
+                samples.sort()
+        finally:
+            relay.close()
+            server.stop(0)
+            service.result_index.close()
+    
+    return {
+        'profile': profile.name,
+        'latency_ms': latency_ms,
+        'upload_mb_per_s': len(data) / 1024 / 1024 / elapsed,
+        'wire_mb': wire_bytes / 1024 / 1024,
+        'status_p50_ms': percentile(samples, 50) * 1000,
+        'status_p99_ms': percentile(samples, 99) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES),
+                        help='transport profiles to compare')
+    parser.add_argument('--latency-ms', type=float, nargs='+', default=[0, 20], help='one-way link latencies')
+    parser.add_argument('--bandwidth-mbit', type=float, default=0, help='link bandwidth cap (0 = unlimited)')
+    parser.add_argument('--size-mb', type=int, default=32, help='size of each uploaded CSV')
+    parser.add_argument('--repeat', type=int, default=3, help='uploads per case (best is reported)')
+    parser.add_argument('--status-calls', type=int, default=200, help='GetJobStatus calls per case')
+    parser.add_argument('--json', action='store_true', help='print the reports as JSON')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.ERROR)
+    data = generate_csv(args.size_mb * 1024 * 1024)
+    reports = [
+        run_case(PROFILES[name], latency_ms, args, data)
+        for latency_ms in args.latency_ms
+        for name in args.profiles
+    ]
+    
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    
+    bandwidth = f'{args.bandwidth_mbit:g} Mbit/s' if args.bandwidth_mbit else 'unlimited bandwidth'
+    print(f"{args.size_mb} MB uploads, {bandwidth}")
+    print(f"{'profile':<13}{'latency':>9}{'upload MB/s':>13}{'wire MB':>9}{'status p50':>12}{'status p99':>12}")
+    for report in reports:
+        print(f"{report['profile']:<13}{report['latency_ms']:>7g}ms{report['upload_mb_per_s']:>13.1f}"
+              f"{report['wire_mb']:>9.1f}{report['status_p50_ms']:>10.2f}ms{report['status_p99_ms']:>10.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
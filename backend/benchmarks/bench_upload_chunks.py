@@ -0,0 +1,115 @@
+"""
+Benchmark UploadCSV receive throughput for different gRPC chunk sizes.
+
+Starts an in-process gRPC server on a loopback port and streams the same
+generated CSV with each chunk size, timing until the upload is accepted.
+Used to pick the proxy's default UPLOAD_CHUNK_SIZE.
+
+Usage:
+    python benchmarks/bench_upload_chunks.py [--size-mb 64] [--repeat 3]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent import futures
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from proto import sales_pb2, sales_pb2_grpc
+from services.sales_service import SalesService
+
+CHUNK_SIZES = [8 * 1024, 32 * 1024, 64 * 1024, 128 * 1024, 256 * 1024, 512 * 1024, 1024 * 1024, 2 * 1024 * 1024]
+
+DEPARTMENTS = ['Electronics', 'Clothing', 'Books', 'Furniture', 'Groceries', 'Toys', 'Garden', 'Sports']
+
+
+def generate_csv(size_bytes: int) -> bytes:
+    """Generate a valid sales CSV of roughly size_bytes."""
+    lines = ['Department Name,Date,Number of Sales\n']
+    total = len(lines[0])
+    i = 0
+    while total < size_bytes:
+        line = f'{DEPARTMENTS[i % len(DEPARTMENTS)]},2024-{i % 12 + 1:02d}-{i % 28 + 1:02d},{i % 1000}\n'
+        lines.append(line)
+        total += len(line)
+        i += 1
+    return ''.join(lines).encode('utf-8')
+
+
+def start_server(storage_dir: str):
+    """Start an in-process gRPC server and return (server, address)."""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    service = SalesService(
+        output_dir=os.path.join(storage_dir, 'processed'),
+        spool_dir=os.path.join(storage_dir, 'uploads'),
+        dataset_dir=os.path.join(storage_dir, 'datasets'),
+        index_path=os.path.join(storage_dir, 'results.db')
+    )
+    sales_pb2_grpc.add_SalesServiceServicer_to_server(service, server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    return server, f'127.0.0.1:{port}'
+
+
+def wait_for_job(stub, job_id: str) -> None:
+    """Poll until the job leaves the processing state."""
+    while stub.GetJobStatus(sales_pb2.JobStatusRequest(job_id=job_id)).status == 'processing':
+        time.sleep(0.05)
+
+
+def upload(stub, data: bytes, chunk_size: int) -> float:
+    """
+    Upload data in chunk_size messages and return seconds until accepted.
+    
+    Waits for background processing to finish afterwards so it does not
+    compete with the next measured upload.
+    """
+    def generate_chunks():
+        view = memoryview(data)
+        for offset in range(0, len(data), chunk_size):
+            chunk = sales_pb2.UploadChunk(data=bytes(view[offset:offset + chunk_size]))
+            if offset == 0:
+                chunk.filename = 'bench.csv'
+            yield chunk
+    
+    start = time.perf_counter()
+    response = stub.UploadCSV(generate_chunks())
+    elapsed = time.perf_counter() - start
+    if response.status != 'processing':
+        raise RuntimeError(f'Upload failed: {response.message}')
+    wait_for_job(stub, response.job_id)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=64, help='size of the uploaded CSV')
+    parser.add_argument('--repeat', type=int, default=3, help='uploads per chunk size (best is reported)')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.ERROR)
+    data = generate_csv(args.size_mb * 1024 * 1024)
+    
+    with tempfile.TemporaryDirectory() as output_dir:
+        server, address = start_server(output_dir)
+        try:
+            with grpc.insecure_channel(address) as channel:
+                stub = sales_pb2_grpc.SalesServiceStub(channel)
+                print(f"Upload size: {len(data) / 1024 / 1024:.1f} MB")
+                print(f"{'chunk size':>12}{'messages':>10}{'seconds':>10}{'MB/s':>10}")
+                for chunk_size in CHUNK_SIZES:
+                    best = min(upload(stub, data, chunk_size) for _ in range(args.repeat))
+                    messages = -(-len(data) // chunk_size)
+                    print(f"{chunk_size // 1024:>10} K{messages:>10}{best:>10.3f}"
+                          f"{len(data) / 1024 / 1024 / best:>10.1f}")
+        finally:
+            server.stop(0)
+
+
+if __name__ == '__main__':
+    main()
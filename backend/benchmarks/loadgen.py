@@ -0,0 +1,344 @@
+"""
+Load generator for SalesService, driven over gRPC or through the HTTP proxy.
+
+Starts an in-process gRPC server on a loopback port (and with --via http
+also the Flask proxy in front of it), or targets an already running local
+server with --target. --uploaders threads each stream generated CSV
+uploads and poll their job until it finishes, while --pollers threads
+keep polling GetJobStatus for recently accepted jobs, as dashboards do.
+Reports throughput, error rates and p50/p95/p99 latency of upload
+acceptance, time to completion and status calls.
+
+Usage:
+    python benchmarks/loadgen.py [--via grpc|http] [--uploaders 4] [--pollers 8]
+                                 [--size-kb 1024] [--chunk-kb 256] [--seconds 20]
+"""
+import argparse
+import collections
+import http.client
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.bench_upload_chunks import generate_csv
+from proto import sales_pb2, sales_pb2_grpc
+from services.sales_service import SalesService
+
+# Job statuses that are still changing
+ACTIVE_STATUSES = ('processing', 'cancelling')
+
+# Reported operations, in report order
+OPERATIONS = ('upload_accept', 'time_to_complete', 'status')
+
+# Recently accepted jobs the status pollers pick from
+RECENT_JOBS = 1000
+
+
+class RequestFailed(Exception):
+    """A call failed; reason is the gRPC code, HTTP status or job status."""
+    
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class GrpcClient:
+    """Calls SalesService directly over one shared channel."""
+    
+    def __init__(self, address: str, chunk_size: int, token: str = ''):
+        self.channel = grpc.insecure_channel(address)
+        self.stub = sales_pb2_grpc.SalesServiceStub(self.channel)
+        self.chunk_size = chunk_size
+        self.token = token
+    
+    def upload(self, data: bytes) -> str:
+        def chunks():
+            view = memoryview(data)
+            for offset in range(0, len(data), self.chunk_size):
+                chunk = sales_pb2.UploadChunk(data=bytes(view[offset:offset + self.chunk_size]))
+                if offset == 0:
+                    chunk.filename = 'loadgen.csv'
+                    chunk.auth_token = self.token
+                yield chunk
+        
+        try:
+            response = self.stub.UploadCSV(chunks())
+        except grpc.RpcError as e:
+            raise RequestFailed(e.code().name)
+        if response.status != 'processing':
+            raise RequestFailed(response.status or 'error')
+        return response.job_id
+    
+    def status(self, job_id: str) -> str:
+        try:
+            return self.stub.GetJobStatus(sales_pb2.JobStatusRequest(job_id=job_id, auth_token=self.token)).status
+        except grpc.RpcError as e:
+            raise RequestFailed(e.code().name)
+    
+    def close(self) -> None:
+        self.channel.close()
+
+
+class HttpClient:
+    """Calls the HTTP proxy, one keep-alive connection per thread."""
+    
+    def __init__(self, host: str, port: int, token: str = ''):
+        self.host = host
+        self.port = port
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+        self._local = threading.local()
+    
+    def _request(self, method: str, path: str, body: bytes = None, headers=None) -> dict:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=300)
+        try:
+            conn.request(method, path, body=body, headers={**self.headers, **(headers or {})})
+            response = conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            self._local.conn = None
+            raise RequestFailed(type(e).__name__)
+        if response.status != 200:
+            raise RequestFailed(f'HTTP {response.status}')
+        return json.loads(payload)
+    
+    def upload(self, data: bytes) -> str:
+        result = self._request('POST', '/api/upload?filename=loadgen.csv', data, {'Content-Type': 'text/csv'})
+        if result.get('status') != 'processing':
+            raise RequestFailed(result.get('status') or 'error')
+        return result['job_id']
+    
+    def status(self, job_id: str) -> str:
+        return self._request('GET', f'/api/status/{job_id}')['status']
+    
+    def close(self) -> None:
+        pass
+
+
+class Stats:
+    """Thread-safe latency samples and error counts per operation."""
+    
+    def __init__(self):
+        self.latencies = {op: [] for op in OPERATIONS}
+        self.errors = {op: collections.Counter() for op in OPERATIONS}
+        self.bytes_accepted = 0
+        self._lock = threading.Lock()
+    
+    def record(self, op: str, seconds: float) -> None:
+        with self._lock:
+            self.latencies[op].append(seconds)
+    
+    def fail(self, op: str, reason: str) -> None:
+        with self._lock:
+            self.errors[op][reason] += 1
+    
+    def add_bytes(self, nbytes: int) -> None:
+        with self._lock:
+            self.bytes_accepted += nbytes
+    
+    def report(self, elapsed: float) -> dict:
+        """Summarize the run as a JSON-serializable dict."""
+        operations = {}
+        for op in OPERATIONS:
+            samples = sorted(self.latencies[op])
+            errors = sum(self.errors[op].values())
+            total = len(samples) + errors
+            operations[op] = {
+                'count': total,
+                'errors': errors,
+                'error_rate': errors / total if total else 0.0,
+                'per_second': total / elapsed,
+                'p50_ms': percentile(samples, 50) * 1000,
+                'p95_ms': percentile(samples, 95) * 1000,
+                'p99_ms': percentile(samples, 99) * 1000,
+                'max_ms': samples[-1] * 1000 if samples else 0.0,
+                'error_reasons': dict(self.errors[op])
+            }
+        return {
+            'elapsed_s': elapsed,
+            'upload_mb_per_s': self.bytes_accepted / 1024 / 1024 / elapsed,
+            'operations': operations
+        }
+
+
+def percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile of sorted samples (0 if there are none)."""
+    if not samples:
+        return 0.0
+    return samples[max(0, math.ceil(pct / 100 * len(samples)) - 1)]
+
+
+def run_uploader(client, data: bytes, stats: Stats, recent_jobs, deadline: float, poll_interval: float) -> None:
+    """Upload and follow jobs to completion until the deadline."""
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            job_id = client.upload(data)
+        except RequestFailed as e:
+            stats.fail('upload_accept', e.reason)
+            # Back off as a well-behaved client would after a rejection
+            time.sleep(poll_interval)
+            continue
+        stats.record('upload_accept', time.perf_counter() - start)
+        stats.add_bytes(len(data))
+        recent_jobs.append(job_id)
+        
+        status = 'processing'
+        while status in ACTIVE_STATUSES:
+            time.sleep(poll_interval)
+            call_start = time.perf_counter()
+            try:
+                status = client.status(job_id)
+            except RequestFailed as e:
+                stats.fail('status', e.reason)
+                continue
+            stats.record('status', time.perf_counter() - call_start)
+        
+        if status == 'completed':
+            stats.record('time_to_complete', time.perf_counter() - start)
+        else:
+            stats.fail('time_to_complete', status)
+
+
+def run_poller(client, stats: Stats, recent_jobs, deadline: float, poll_interval: float) -> None:
+    """Poll the status of random recent jobs until the deadline."""
+    while time.monotonic() < deadline:
+        if not recent_jobs:
+            time.sleep(poll_interval)
+            continue
+        job_id = random.choice(recent_jobs)
+        start = time.perf_counter()
+        try:
+            client.status(job_id)
+        except RequestFailed as e:
+            stats.fail('status', e.reason)
+        else:
+            stats.record('status', time.perf_counter() - start)
+        time.sleep(poll_interval)
+
+
+def start_grpc_server(storage_dir: str, args) -> tuple:
+    """Start an in-process gRPC server and return (server, address)."""
+    service = SalesService(
+        output_dir=os.path.join(storage_dir, 'processed'),
+        spool_dir=os.path.join(storage_dir, 'uploads'),
+        dataset_dir=os.path.join(storage_dir, 'datasets'),
+        index_path=os.path.join(storage_dir, 'results.db'),
+        max_inflight_bytes=args.max_inflight_mb * 1024 * 1024,
+        max_active_jobs=args.max_active_jobs
+    )
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=args.server_threads))
+    sales_pb2_grpc.add_SalesServiceServicer_to_server(service, server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    return server, f'127.0.0.1:{port}'
+
+
+def start_http_proxy(grpc_address: str, chunk_size: int):
+    """Serve the Flask proxy on a loopback port in a background thread; return the WSGI server."""
+    from werkzeug.serving import make_server
+    import http_proxy
+    
+    http_proxy.GRPC_SERVER = grpc_address
+    http_proxy.UPLOAD_CHUNK_SIZE = chunk_size
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    proxy = make_server('127.0.0.1', 0, http_proxy.app, threaded=True)
+    thread = threading.Thread(target=proxy.serve_forever, daemon=True)
+    thread.start()
+    return proxy
+
+
+def print_report(report: dict, args, size: int) -> None:
+    print(f"via {args.via}: {args.uploaders} uploaders of {size / 1024:.0f} KB in {args.chunk_kb} KB chunks, "
+          f"{args.pollers} pollers, {report['elapsed_s']:.1f}s, {report['upload_mb_per_s']:.1f} MB/s accepted")
+    print(f"{'operation':<18}{'count':>8}{'errors':>8}{'err %':>8}{'ops/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for op, row in report['operations'].items():
+        print(f"{op:<18}{row['count']:>8}{row['errors']:>8}{row['error_rate']:>8.1%}{row['per_second']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}")
+    for op, row in report['operations'].items():
+        for reason, count in sorted(row['error_reasons'].items()):
+            print(f"  {op} error {reason}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--via', choices=('grpc', 'http'), default='grpc', help='call gRPC directly or the HTTP proxy')
+    parser.add_argument('--target', help='existing local server (host:port) instead of starting one; '
+                                         'a gRPC server with --via grpc, the proxy with --via http')
+    parser.add_argument('--uploaders', type=int, default=4, help='concurrent upload streams')
+    parser.add_argument('--pollers', type=int, default=8, help='threads polling recent jobs')
+    parser.add_argument('--poll-interval', type=float, default=0.1, help='seconds between status calls per thread')
+    parser.add_argument('--size-kb', type=int, default=1024, help='size of each uploaded CSV')
+    parser.add_argument('--chunk-kb', type=int, default=256, help='gRPC message size for upload data')
+    parser.add_argument('--seconds', type=float, default=20.0, help='duration of the run')
+    parser.add_argument('--token', default='', help='auth token for AUTH_ENABLED servers')
+    parser.add_argument('--server-threads', type=int, default=10, help='gRPC worker threads of a started server')
+    parser.add_argument('--max-active-jobs', type=int, default=0, help='admission limit of a started server')
+    parser.add_argument('--max-inflight-mb', type=int, default=0, help='admission limit of a started server')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.ERROR)
+    data = generate_csv(args.size_kb * 1024)
+    chunk_size = args.chunk_kb * 1024
+    
+    with tempfile.TemporaryDirectory() as storage_dir:
+        server = proxy = grpc_address = None
+        address = args.target
+        if address is None:
+            server, grpc_address = start_grpc_server(storage_dir, args)
+        if args.via == 'grpc':
+            client = GrpcClient(address or grpc_address, chunk_size, args.token)
+        else:
+            if address is None:
+                proxy = start_http_proxy(grpc_address, chunk_size)
+                address = f'127.0.0.1:{proxy.server_port}'
+            host, port = address.rsplit(':', 1)
+            client = HttpClient(host, int(port), args.token)
+        
+        stats = Stats()
+        recent_jobs = collections.deque(maxlen=RECENT_JOBS)
+        start = time.monotonic()
+        deadline = start + args.seconds
+        threads = [
+            threading.Thread(target=run_uploader, args=(client, data, stats, recent_jobs, deadline, args.poll_interval))
+            for _ in range(args.uploaders)
+        ] + [
+            threading.Thread(target=run_poller, args=(client, stats, recent_jobs, deadline, args.poll_interval))
+            for _ in range(args.pollers)
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            client.close()
+            if proxy is not None:
+                proxy.shutdown()
+            if server is not None:
+                server.stop(0)
+        
+        report = stats.report(time.monotonic() - start)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_report(report, args, len(data))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+Python client helpers for the SalesService gRPC API.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+import logging
+
+import grpc
+
+from proto import sales_pb2, sales_pb2_grpc
+from utils.grpc_transport import TransportProfile, from_env as transport_from_env
+from utils.streaming_upload import DEFAULT_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def connect(target: str,
+            profile: Optional[TransportProfile] = None) -> Tuple[grpc.Channel, sales_pb2_grpc.SalesServiceStub]:
+    """
+    Open a channel to a SalesService server with tuned transport settings.
+    
+    Args:
+        target: Server address (host:port)
+        profile: Transport settings; defaults to GRPC_TRANSPORT_PROFILE and its
+            GRPC_* overrides, as used by the server
+    
+    Returns:
+        (channel, stub); close the channel when done
+    """
+    channel = (profile or transport_from_env()).insecure_channel(target)
+    return channel, sales_pb2_grpc.SalesServiceStub(channel)
+
+
+def _session_chunks(path: str, session_id: str, offset: int, chunk_size: int,
+                    auth_token: str) -> Iterator[sales_pb2.UploadChunk]:
+    """Yield offset-tagged chunks of a file starting at offset."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        first_chunk = True
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            chunk = sales_pb2.UploadChunk(data=data, session_id=session_id, offset=offset)
+            if first_chunk:
+                chunk.auth_token = auth_token
+                first_chunk = False
+            offset += len(data)
+            yield chunk
+
+
+def upload_resumable(stub, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, auth_token: str = '',
+                     max_attempts: int = 5, retry_delay: float = 1.0) -> sales_pb2.UploadResponse:
+    """
+    Upload a file through a resumable session, continuing from the last committed byte on failure.
+    
+    Args:
+        stub: SalesServiceStub
+        path: CSV file to upload
+        chunk_size: Bytes per UploadChunk
+        auth_token: Optional authentication token
+        max_attempts: Upload streams to try before giving up
+        retry_delay: Seconds to wait before resuming after a failed stream
+    
+    Returns:
+        The UploadResponse of the stream that completed the upload
+    """
+    total_size = os.path.getsize(path)
+    session = stub.BeginUpload(sales_pb2.BeginUploadRequest(
+        filename=os.path.basename(path),
+        auth_token=auth_token,
+        total_size=total_size
+    ))
+    if session.status != 'receiving':
+        raise RuntimeError(f"Could not open upload session: {session.status}")
+    
+    offset = 0
+    for attempt in range(1, max_attempts + 1):
+        try:
+            response = stub.UploadCSV(_session_chunks(path, session.session_id, offset, chunk_size, auth_token))
+            if response.status != 'receiving':
+                return response
+            offset = response.committed_offset
+            continue
+        except grpc.RpcError as e:
+            if attempt == max_attempts:
+                raise
+            logger.warning(f"Upload stream failed at attempt {attempt}: {e}; resuming")
+            time.sleep(retry_delay)
+        
+        status = stub.ResumeUpload(sales_pb2.UploadSessionRequest(
+            session_id=session.session_id,
+            auth_token=auth_token
+        ))
+        if status.status == 'completed':
+            return sales_pb2.UploadResponse(job_id=status.job_id, status='processing',
+                                            committed_offset=status.committed_offset)
+        offset = status.committed_offset
+    
+    raise RuntimeError(f"Upload did not complete after {max_attempts} attempts")
+
+
+def shard_boundaries(path: str, parts: int) -> List[Tuple[int, int]]:
+    """
+    Split a file into up to parts newline-aligned (start, end) byte ranges.
+    
+    Each boundary is moved forward to just after the next newline, so no row
+    straddles two parts. Empty ranges are dropped. Quote state is not
+    tracked, so files with newlines inside quoted fields should be uploaded
+    in one stream.
+    """
+    size = os.path.getsize(path)
+    cuts = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, parts):
+            target = max(size * i // parts, cuts[-1])
+            f.seek(target)
+            f.readline()
+            cuts.append(min(f.tell(), size))
+    cuts.append(size)
+    return [(start, end) for start, end in zip(cuts, cuts[1:]) if end > start]
+
+
+def _part_chunks(path: str, job_id: str, part_index: int, start: int, end: int, chunk_size: int,
+                 auth_token: str) -> Iterator[sales_pb2.UploadChunk]:
+    """Yield the chunks of one part of a sharded upload."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        first_chunk = True
+        while remaining > 0 or first_chunk:
+            data = f.read(min(chunk_size, remaining))
+            remaining -= len(data)
+            chunk = sales_pb2.UploadChunk(data=data, job_id=job_id, part_index=part_index)
+            if first_chunk:
+                chunk.auth_token = auth_token
+                first_chunk = False
+            yield chunk
+
+
+def upload_sharded(stub, path: str, parts: int = 4, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   auth_token: str = '') -> sales_pb2.UploadResponse:
+    """
+    Upload a file as several newline-aligned parts over concurrent streams.
+    
+    The server aggregates each part as it arrives and merges the partial
+    totals when the last one lands, so the result is available as soon as
+    the final stream closes.
+    
+    Args:
+        stub: SalesServiceStub
+        path: CSV file to upload
+        parts: Number of concurrent part streams
+        chunk_size: Bytes per UploadChunk
+        auth_token: Optional authentication token
+    
+    Returns:
+        The UploadResponse of the part that completed the job, or the first failed part
+    """
+    ranges = shard_boundaries(path, parts) or [(0, 0)]
+    job = stub.BeginShardedUpload(sales_pb2.BeginShardedUploadRequest(
+        filename=os.path.basename(path),
+        auth_token=auth_token,
+        part_count=len(ranges)
+    ))
+    if job.status != 'processing':
+        raise RuntimeError(f"Could not start sharded upload: {job.message}")
+    
+    def upload_part(part_index: int) -> sales_pb2.UploadResponse:
+        start, end = ranges[part_index]
+        return stub.UploadCSV(_part_chunks(path, job.job_id, part_index, start, end, chunk_size, auth_token))
+    
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        responses = list(executor.map(upload_part, range(len(ranges))))
+    
+    for response in responses:
+        if response.status != 'processing':
+            return response
+    return responses[-1]
+
+
+def _batch_chunks(paths: List[str], chunk_size: int, auth_token: str) -> Iterator[sales_pb2.BatchChunk]:
+    """Yield the chunks of several files, each tagged with its file_index."""
+    for file_index, path in enumerate(paths):
+        with open(path, 'rb') as f:
+            first_chunk = True
+            while True:
+                data = f.read(chunk_size)
+                if not data and not first_chunk:
+                    break
+                chunk = sales_pb2.BatchChunk(data=data, file_index=file_index)
+                if first_chunk:
+                    chunk.filename = os.path.basename(path)
+                    if file_index == 0:
+                        chunk.auth_token = auth_token
+                    first_chunk = False
+                yield chunk
+
+
+def upload_batch(stub, paths: List[str], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 auth_token: str = '') -> sales_pb2.BatchUploadResponse:
+    """
+    Upload several files in one UploadBatch stream and get back their combined result.
+    
+    Args:
+        stub: SalesServiceStub
+        paths: CSV files to aggregate together
+        chunk_size: Bytes per BatchChunk
+        auth_token: Optional authentication token
+    
+    Returns:
+        BatchUploadResponse with the combined download URL and per-file results
+    """
+    return stub.UploadBatch(_batch_chunks(paths, chunk_size, auth_token))
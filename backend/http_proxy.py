@@ -1,22 +1,79 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import grpc
 import sys
 import os
+import hashlib
+import io
+import json
+import math
+import pstats
+import threading
+import uuid
+from datetime import datetime, timezone
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from proto import sales_pb2, sales_pb2_grpc
 from utils.auth import get_auth_manager
+from utils.grpc_transport import from_env as transport_from_env
+from utils.job_profiler import profile_filename
+from utils.streaming_upload import DEFAULT_CHUNK_SIZE, MultipartFileReader, iter_raw_body
+from utils.status_cache import StatusCache
+from utils.storage_manager import StorageManager
 
 app = Flask(__name__)
 CORS(app)
 
 GRPC_SERVER = os.getenv('GRPC_SERVER', 'localhost:50051')
 PROCESSED_DIR = os.getenv('PROCESSED_DIR', 'storage/processed')
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(DEFAULT_CHUNK_SIZE)))
+
+# Raw (non-multipart) upload bodies accepted by /api/upload
+RAW_UPLOAD_MIMETYPES = ('text/csv', 'application/octet-stream')
 
 auth_manager = get_auth_manager()
 
+# Status micro-cache: terminal states cached for STATUS_CACHE_TERMINAL_TTL_S, processing states for
+# STATUS_CACHE_TTL_MS
+STATUS_CACHE_ENABLED = os.getenv('STATUS_CACHE_ENABLED', 'true').lower() == 'true'
+status_cache = StatusCache(
+    processing_ttl=int(os.getenv('STATUS_CACHE_TTL_MS', '500')) / 1000,
+    max_entries=int(os.getenv('STATUS_CACHE_MAX_ENTRIES', '10000')),
+    terminal_ttl=float(os.getenv('STATUS_CACHE_TERMINAL_TTL_S', '60'))
+) if STATUS_CACHE_ENABLED else None
+
+# Message limits, compression, flow control and keepalive of gRPC channels
+# (GRPC_TRANSPORT_PROFILE plus GRPC_* overrides, as for the server)
+TRANSPORT = transport_from_env()
+
+# Optionally spread calls over every address GRPC_SERVER resolves to, skipping
+# backends whose gRPC health status is NOT_SERVING (overloaded or draining)
+GRPC_HEALTH_CHECK = os.getenv('GRPC_HEALTH_CHECK', 'false').lower() == 'true'
+HEALTH_CHECK_SERVICE_CONFIG = json.dumps({
+    'loadBalancingConfig': [{'round_robin': {}}],
+    'healthCheckConfig': {'serviceName': sales_pb2.DESCRIPTOR.services_by_name['SalesService'].full_name}
+})
+
+# Persistent gRPC channels, one per target, shared by all requests
+_channels = {}
+_channels_lock = threading.Lock()
+
+# Storage managers of the sharded output directory, one per PROCESSED_DIR
+_storages = {}
+_storages_lock = threading.Lock()
+
+# Functions listed by /api/profile/<job_id>?format=text
+PROFILE_REPORT_LINES = 40
+
+# Processed results never change once published, so downloads can be cached for a year
+DOWNLOAD_MAX_AGE = 365 * 24 * 3600
+
+# Content-hash ETags keyed by (path, size, mtime); bounded so it cannot grow without limit
+_ETAG_CACHE_MAX_ENTRIES = 10000
+_etag_cache = {}
+_etag_cache_lock = threading.Lock()
+
 
 def _get_auth_token() -> str:
     """Extract auth token from request headers or query params."""
@@ -29,43 +86,138 @@ def _get_auth_token() -> str:
     return request.args.get('token', '')
 
 
+def _get_stub() -> sales_pb2_grpc.SalesServiceStub:
+    """Return a stub on the shared, persistent channel to GRPC_SERVER."""
+    channel = _channels.get(GRPC_SERVER)
+    if channel is None:
+        with _channels_lock:
+            channel = _channels.get(GRPC_SERVER)
+            if channel is None:
+                options = [('grpc.service_config', HEALTH_CHECK_SERVICE_CONFIG)] if GRPC_HEALTH_CHECK else []
+                channel = _channels[GRPC_SERVER] = TRANSPORT.insecure_channel(GRPC_SERVER, options)
+    return sales_pb2_grpc.SalesServiceStub(channel)
+
+
+def _get_storage() -> StorageManager:
+    """Return the storage manager of PROCESSED_DIR (shared with the gRPC server)."""
+    storage = _storages.get(PROCESSED_DIR)
+    if storage is None:
+        with _storages_lock:
+            storage = _storages.get(PROCESSED_DIR)
+            if storage is None:
+                storage = _storages[PROCESSED_DIR] = StorageManager(PROCESSED_DIR)
+    return storage
+
+
+def _metrics_to_dict(metrics: sales_pb2.ProcessingMetrics) -> dict:
+    """Convert ProcessingMetrics to a JSON-serializable dict."""
+    return {
+        'processing_time_ms': metrics.processing_time_ms,
+        'rows_processed': metrics.rows_processed,
+        'rows_skipped': metrics.rows_skipped,
+        'rows_filtered': metrics.rows_filtered,
+        'departments_count': metrics.departments_count,
+        'peak_memory_mb': metrics.peak_memory_mb,
+        'phases': [{'phase': p.phase, 'duration_ms': p.duration_ms} for p in metrics.phases],
+        'hot_functions': [
+            {
+                'function': f.function,
+                'calls': f.calls,
+                'self_ms': f.self_ms,
+                'cumulative_ms': f.cumulative_ms
+            }
+            for f in metrics.hot_functions
+        ]
+    }
+
+
+def _column_mapping_from_args(args) -> sales_pb2.ColumnMapping:
+    """Build the upload's ColumnMapping from <field>_column query parameters."""
+    columns = sales_pb2.ColumnMapping()
+    for field in ('department', 'date', 'sales'):
+        value = args.get(f'{field}_column', '')
+        if value.isdigit():
+            getattr(columns, field).index = int(value)
+        elif value:
+            getattr(columns, field).name = value
+    return columns
+
+
+def _row_filter_from_args(args) -> sales_pb2.RowFilter:
+    """Build the upload's RowFilter from date_from/date_to and repeatable department parameters."""
+    return sales_pb2.RowFilter(
+        date_from=args.get('date_from', ''),
+        date_to=args.get('date_to', ''),
+        include_departments=args.getlist('department'),
+        exclude_departments=args.getlist('exclude_department')
+    )
+
+
 @app.route('/api/upload', methods=['POST'])
 def upload():
-    """HTTP endpoint that proxies to gRPC."""
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
+    """
+    HTTP endpoint that streams the request body to gRPC as it arrives.
     
+    Accepts multipart/form-data with a 'file' field, or a raw text/csv or
+    application/octet-stream body named by the X-Filename header or the
+    'filename' query parameter. The body is never spooled to disk. An
+    optional 'dataset' query parameter merges the upload into that dataset,
+    and 'profile=1' profiles the job's processing (see /api/profile/<job_id>).
+    'department_column', 'date_column' and 'sales_column' locate the fields
+    in wide files by header name, or by 0-based index if numeric.
+    'date_from'/'date_to' (inclusive YYYY-MM-DD) and repeatable 'department'
+    / 'exclude_department' parameters restrict the rows aggregated.
+    """
     # Get auth token
     auth_token = _get_auth_token()
     
-    # Validate authentication
+    # Validate authentication before reading any of the body
     try:
         auth_manager.require_auth(auth_token)
     except PermissionError as e:
         return jsonify({'error': 'Authentication failed'}), 401
     
-    # Connect to gRPC server
-    # Note: For production, consider using connection pooling or persistent channels
-    channel = grpc.insecure_channel(GRPC_SERVER)
-    stub = sales_pb2_grpc.SalesServiceStub(channel)
+    if request.mimetype == 'multipart/form-data':
+        boundary = request.mimetype_params.get('boundary')
+        if not boundary:
+            return jsonify({'error': 'Missing multipart boundary'}), 400
+        
+        reader = MultipartFileReader(request.stream, boundary.encode('latin-1'))
+        try:
+            filename = reader.open()
+        except ValueError:
+            return jsonify({'error': 'Malformed multipart body'}), 400
+        
+        if filename is None:
+            return jsonify({'error': 'No file provided'}), 400
+        if filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        data_chunks = reader.iter_chunks(UPLOAD_CHUNK_SIZE)
+    elif request.mimetype in RAW_UPLOAD_MIMETYPES:
+        filename = request.headers.get('X-Filename') or request.args.get('filename', 'upload.csv')
+        data_chunks = iter_raw_body(request.stream, UPLOAD_CHUNK_SIZE)
+    else:
+        return jsonify({'error': f'Unsupported content type: {request.mimetype}'}), 415
     
-    # Stream file chunks to gRPC
+    dataset = request.args.get('dataset', '')
+    profile = request.args.get('profile', '').lower() in ('1', 'true', 'yes')
+    columns = _column_mapping_from_args(request.args)
+    filters = _row_filter_from_args(request.args)
+    stub = _get_stub()
+    
+    # Forward body chunks to gRPC as they are read
     def generate_chunks():
-        chunk_size = 8192  # 8KB chunks seems reasonable
         first_chunk = True
-        while True:
-            chunk_data = file.read(chunk_size)
-            if not chunk_data:
-                break
-            
+        for chunk_data in data_chunks:
             chunk = sales_pb2.UploadChunk(data=chunk_data)
             if first_chunk:
-                chunk.filename = file.filename
+                chunk.filename = filename
                 chunk.auth_token = auth_token
+                chunk.dataset = dataset
+                chunk.profile = profile
+                chunk.columns.CopyFrom(columns)
+                chunk.row_filter.CopyFrom(filters)
                 first_chunk = False
             
             yield chunk
@@ -83,20 +235,62 @@ def upload():
         
         # Add metrics if available
         if response.HasField('metrics'):
-            metrics = response.metrics
-            result['metrics'] = {
-                'processing_time_ms': metrics.processing_time_ms,
-                'rows_processed': metrics.rows_processed,
-                'rows_skipped': metrics.rows_skipped,
-                'departments_count': metrics.departments_count,
-                'peak_memory_mb': metrics.peak_memory_mb
-            }
+            result['metrics'] = _metrics_to_dict(response.metrics)
         
         return jsonify(result)
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            # Server at capacity: pass its retry hint on to the HTTP client
+            retry_after_ms = dict(e.trailing_metadata() or ()).get('retry-after-ms', '1000')
+            retry_after = max(1, math.ceil(int(retry_after_ms) / 1000))
+            return jsonify({'error': e.details()}), 503, {'Retry-After': str(retry_after)}
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            # Larger than the server will ever buffer (it names its limit), or options it cannot use
+            too_large = 'max-upload-bytes' in dict(e.trailing_metadata() or ())
+            return jsonify({'error': e.details()}), 413 if too_large else 400
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        channel.close()
+
+
+def _status_to_dict(response: sales_pb2.JobStatusResponse) -> dict:
+    """Convert a JobStatusResponse to a JSON-serializable dict."""
+    result = {
+        'job_id': response.job_id,
+        'status': response.status,
+        'download_url': response.download_url,
+        'error_message': response.error_message
+    }
+    
+    # Add metrics if available
+    if response.HasField('metrics'):
+        result['metrics'] = _metrics_to_dict(response.metrics)
+        if response.metrics.hot_functions:
+            result['profile_url'] = f'/api/profile/{response.job_id}'
+    
+    # Early estimate while a large job is still processing
+    if response.HasField('preview'):
+        result['preview'] = {
+            'sampled_fraction': response.preview.sampled_fraction,
+            'confidence': response.preview.confidence,
+            'rows_sampled': response.preview.rows_sampled,
+            'departments': [
+                {
+                    'department': d.department,
+                    'estimated_total': d.estimated_total,
+                    'sampled_total': d.sampled_total
+                }
+                for d in response.preview.departments
+            ]
+        }
+    
+    return result
+
+
+def _fetch_status(job_id: str, auth_token: str) -> dict:
+    """Fetch job status from the gRPC server as a JSON-serializable dict."""
+    request_msg = sales_pb2.JobStatusRequest(job_id=job_id, auth_token=auth_token)
+    return _status_to_dict(_get_stub().GetJobStatus(request_msg))
 
 
 @app.route('/api/status/<job_id>', methods=['GET'])
@@ -110,36 +304,204 @@ def status(job_id):
     except PermissionError as e:
         return jsonify({'error': 'Authentication failed'}), 401
     
-    channel = grpc.insecure_channel(GRPC_SERVER)
-    stub = sales_pb2_grpc.SalesServiceStub(channel)
+    try:
+        # Auth was checked above, so cached entries can be shared across callers
+        if status_cache is None:
+            result = _fetch_status(job_id, auth_token)
+        else:
+            result = status_cache.get(job_id, lambda: _fetch_status(job_id, auth_token))
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/cancel/<job_id>', methods=['POST'])
+def cancel(job_id):
+    """Cancel a running job."""
+    auth_token = _get_auth_token()
     
+    # Validate authentication
     try:
-        request_msg = sales_pb2.JobStatusRequest(job_id=job_id, auth_token=auth_token)
-        response = stub.GetJobStatus(request_msg)
+        auth_manager.require_auth(auth_token)
+    except PermissionError as e:
+        return jsonify({'error': 'Authentication failed'}), 401
+    
+    try:
+        request_msg = sales_pb2.CancelJobRequest(job_id=job_id, auth_token=auth_token)
+        result = _status_to_dict(_get_stub().CancelJob(request_msg))
+        if status_cache is not None:
+            status_cache.invalidate(job_id)
         
+        if result['status'] == 'not_found':
+            return jsonify(result), 404
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/datasets/<name>', methods=['GET'])
+def dataset(name):
+    """Report a dataset's running totals and the download URL of its current output."""
+    auth_token = _get_auth_token()
+    
+    # Validate authentication
+    try:
+        auth_manager.require_auth(auth_token)
+    except PermissionError as e:
+        return jsonify({'error': 'Authentication failed'}), 401
+    
+    try:
+        response = _get_stub().GetDataset(sales_pb2.DatasetRequest(name=name, auth_token=auth_token))
         result = {
-            'job_id': response.job_id,
+            'name': response.name,
             'status': response.status,
             'download_url': response.download_url,
-            'error_message': response.error_message
+            'version': response.version,
+            'uploads': response.uploads,
+            'error_message': response.error_message,
+            'metrics': _metrics_to_dict(response.metrics)
         }
         
-        # Add metrics if available
-        if response.HasField('metrics'):
-            metrics = response.metrics
-            result['metrics'] = {
-                'processing_time_ms': metrics.processing_time_ms,
-                'rows_processed': metrics.rows_processed,
-                'rows_skipped': metrics.rows_skipped,
-                'departments_count': metrics.departments_count,
-                'peak_memory_mb': metrics.peak_memory_mb
-            }
-        
+        if response.status == 'not_found':
+            return jsonify(result), 404
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        channel.close()
+
+
+@app.route('/api/profile/<job_id>', methods=['GET'])
+def profile(job_id):
+    """
+    Serve a profiled job's cProfile data.
+    
+    Returns the pstats file as a download, or with ?format=text a report of
+    the PROFILE_REPORT_LINES functions with the most cumulative time.
+    """
+    from flask import abort
+    
+    # Validate authentication
+    try:
+        auth_manager.require_auth(_get_auth_token())
+    except PermissionError as e:
+        return jsonify({'error': 'Authentication failed'}), 401
+    
+    # Job ids are UUIDs; anything else could name a path outside PROCESSED_DIR
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        abort(400, 'Invalid job id')
+    
+    profile_path = _get_storage().locate(profile_filename(job_id))
+    if profile_path is None:
+        return jsonify({'error': 'No profile for this job'}), 404
+    
+    if request.args.get('format') == 'text':
+        report = io.StringIO()
+        pstats.Stats(profile_path, stream=report).sort_stats('cumulative').print_stats(PROFILE_REPORT_LINES)
+        return report.getvalue(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    
+    return send_file(
+        profile_path,
+        mimetype='application/octet-stream',
+        as_attachment=True,
+        download_name=f'{job_id}.prof'
+    )
+
+
+def _parse_time(value: str) -> float:
+    """Parse a Unix timestamp or ISO 8601 date/datetime (UTC if no offset) query parameter."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+@app.route('/api/totals', methods=['GET'])
+def totals():
+    """
+    Sum department totals across completed jobs from the result index.
+    
+    Query parameters (all optional, repeatable where plural): department,
+    job_id, since and until (Unix time or ISO 8601).
+    """
+    auth_token = _get_auth_token()
+    
+    # Validate authentication
+    try:
+        auth_manager.require_auth(auth_token)
+    except PermissionError as e:
+        return jsonify({'error': 'Authentication failed'}), 401
+    
+    try:
+        since = _parse_time(request.args['since']) if request.args.get('since') else 0
+        until = _parse_time(request.args['until']) if request.args.get('until') else 0
+    except ValueError:
+        return jsonify({'error': 'since/until must be a Unix timestamp or ISO 8601 date'}), 400
+    
+    try:
+        response = _get_stub().QueryTotals(sales_pb2.QueryTotalsRequest(
+            auth_token=auth_token,
+            departments=request.args.getlist('department'),
+            job_ids=request.args.getlist('job_id'),
+            since=since,
+            until=until
+        ))
+        if response.status != 'ok':
+            return jsonify({'error': response.error_message or response.status}), 500
+        
+        return jsonify({
+            'jobs_matched': response.jobs_matched,
+            'totals': [
+                {'department': t.department, 'total': t.total, 'job_count': t.job_count}
+                for t in response.totals
+            ]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/storage', methods=['GET'])
+def storage_usage():
+    """Report processed output storage usage and eviction totals."""
+    # Validate authentication
+    try:
+        auth_manager.require_auth(_get_auth_token())
+    except PermissionError as e:
+        return jsonify({'error': 'Authentication failed'}), 401
+    
+    return jsonify(_get_storage().usage())
+
+
+@app.route('/api/cache/status', methods=['GET'])
+def status_cache_stats():
+    """Report status cache hit rates."""
+    if status_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **status_cache.stats()})
+
+
+def _file_etag(path: str, stat_result: os.stat_result) -> str:
+    """Return a strong ETag (SHA-256 of the content) for an immutable result file."""
+    key = (path, stat_result.st_size, stat_result.st_mtime_ns)
+    etag = _etag_cache.get(key)
+    if etag is not None:
+        return etag
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    etag = digest.hexdigest()
+    
+    with _etag_cache_lock:
+        if len(_etag_cache) >= _ETAG_CACHE_MAX_ENTRIES:
+            _etag_cache.clear()
+        _etag_cache[key] = etag
+    return etag
 
 
 @app.route('/processed/<filename>')
@@ -151,8 +513,9 @@ def download_file(filename):
     if not filename.endswith('.csv'):
         abort(400, 'Invalid file type')
     
-    # Resolve absolute path
-    file_path = os.path.join(PROCESSED_DIR, filename)
+    # Resolve the sharded path (or the flat path of older and dataset outputs)
+    storage = _get_storage()
+    file_path = storage.locate(filename) or os.path.join(PROCESSED_DIR, filename)
     abs_file_path = os.path.abspath(file_path)
     
     # Security check: ensure file is within PROCESSED_DIR
@@ -160,18 +523,44 @@ def download_file(filename):
     if not abs_file_path.startswith(abs_processed_dir):
         abort(403, 'Access denied')
     
-    # Check if file exists
-    if not os.path.exists(abs_file_path):
+    # Prefer the precompressed sibling when the client accepts gzip
+    serve_path = abs_file_path
+    content_encoding = None
+    if request.accept_encodings['gzip'] and os.path.isfile(abs_file_path + '.gz'):
+        serve_path = abs_file_path + '.gz'
+        content_encoding = 'gzip'
+    
+    try:
+        stat_result = os.stat(serve_path)
+    except FileNotFoundError:
         app.logger.error(f"File not found: {abs_file_path} (PROCESSED_DIR: {PROCESSED_DIR})")
+        # The output was evicted: stop serving cached statuses that link to it
+        if status_cache is not None:
+            status_cache.invalidate_download(f'/processed/{filename}')
         abort(404, 'File not found')
     
-    # Return file with proper content type
-    return send_from_directory(
-        PROCESSED_DIR, 
-        filename,
+    # Downloads keep an output from being evicted as least recently used
+    try:
+        storage.touch(filename)
+    except Exception as e:
+        app.logger.warning(f"Could not record access to {filename}: {str(e)}")
+    
+    # Conditional GET (If-None-Match -> 304) and Range requests are handled by send_file
+    response = send_file(
+        serve_path,
+        mimetype='text/csv',
         as_attachment=True,
-        mimetype='text/csv'
+        download_name=filename,
+        etag=_file_etag(serve_path, stat_result),
+        conditional=True,
+        max_age=DOWNLOAD_MAX_AGE
     )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    return response
 
 
 if __name__ == '__main__':
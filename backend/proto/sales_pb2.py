@@ -24,23 +24,65 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0bsales.proto\x12\x05sales\"A\n\x0bUploadChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\x12\x12\n\nauth_token\x18\x03 \x01(\t\"\x82\x01\n\x0eUploadResponse\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\x14\n\x0c\x64ownload_url\x18\x04 \x01(\t\x12)\n\x07metrics\x18\x05 \x01(\x0b\x32\x18.sales.ProcessingMetrics\"6\n\x10JobStatusRequest\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\x12\n\nauth_token\x18\x02 \x01(\t\"\x8b\x01\n\x11JobStatusResponse\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x14\n\x0c\x64ownload_url\x18\x03 \x01(\t\x12\x15\n\rerror_message\x18\x04 \x01(\t\x12)\n\x07metrics\x18\x05 \x01(\x0b\x32\x18.sales.ProcessingMetrics\"\x90\x01\n\x11ProcessingMetrics\x12\x1a\n\x12processing_time_ms\x18\x01 \x01(\x03\x12\x16\n\x0erows_processed\x18\x02 \x01(\x03\x12\x14\n\x0crows_skipped\x18\x03 \x01(\x03\x12\x19\n\x11\x64\x65partments_count\x18\x04 \x01(\x03\x12\x16\n\x0epeak_memory_mb\x18\x05 \x01(\x03\x32\x8b\x01\n\x0cSalesService\x12\x38\n\tUploadCSV\x12\x12.sales.UploadChunk\x1a\x15.sales.UploadResponse(\x01\x12\x41\n\x0cGetJobStatus\x12\x17.sales.JobStatusRequest\x1a\x18.sales.JobStatusResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0bsales.proto\x12\x05sales\"\x97\x02\n\x0bUploadChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\x12\x12\n\nauth_token\x18\x03 \x01(\t\x12\x12\n\nsession_id\x18\x04 \x01(\t\x12\x0e\n\x06offset\x18\x05 \x01(\x03\x12\x0e\n\x06job_id\x18\x06 \x01(\t\x12\x12\n\npart_index\x18\x07 \x01(\x05\x12\x0f\n\x07\x64\x61taset\x18\x08 \x01(\t\x12\x0f\n\x07profile\x18\t \x01(\x08\x12%\n\x07\x63olumns\x18\n \x01(\x0b\x32\x14.sales.ColumnMapping\x12$\n\nrow_filter\x18\x0b \x01(\x0b\x32\x10.sales.RowFilter\x12\x1d\n\x04rows\x18\x0c \x01(\x0b\x32\x0f.sales.RowBatch\"T\n\x08RowBatch\x12\x13\n\x0b\x64\x65partments\x18\x01 \x03(\t\x12\x16\n\x0e\x64\x65partment_ids\x18\x02 \x03(\r\x12\x0c\n\x04\x64\x61ys\x18\x03 \x03(\x05\x12\r\n\x05sales\x18\x04 \x03(\x03\"i\n\tRowFilter\x12\x11\n\tdate_from\x18\x01 \x01(\t\x12\x0f\n\x07\x64\x61te_to\x18\x02 \x01(\t\x12\x1b\n\x13include_departments\x18\x03 \x03(\t\x12\x1b\n\x13\x65xclude_departments\x18\x04 \x03(\t\"3\n\tColumnRef\x12\x0e\n\x04name\x18\x01 \x01(\tH\x00\x12\x0f\n\x05index\x18\x02 \x01(\x05H\x00\x42\x05\n\x03ref\"v\n\rColumnMapping\x12$\n\ndepartment\x18\x01 \x01(\x0b\x32\x10.sales.ColumnRef\x12\x1e\n\x04\x64\x61te\x18\x02 \x01(\x0b\x32\x10.sales.ColumnRef\x12\x1f\n\x05sales\x18\x03 \x01(\x0b\x32\x10.sales.ColumnRef\"\x9c\x01\n\x0eUploadResponse\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\x14\n\x0c\x64ownload_url\x18\x04 \x01(\t\x12)\n\x07metrics\x18\x05 \x01(\x0b\x32\x18.sales.ProcessingMetrics\x12\x18\n\x10\x63ommitted_offset\x18\x06 \x01(\x03\"T\n\nBatchChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\x12\n\nfile_index\x18\x02 \x01(\x05\x12\x10\n\x08\x66ilename\x18\x03 \x01(\t\x12\x12\n\nauth_token\x18\x04 \x01(\t\"\x84\x01\n\nFileResult\x12\x12\n\nfile_index\x18\x01 \x01(\x05\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\x12\x0e\n\x06status\x18\x03 \x01(\t\x12\x15\n\rerror_message\x18\x04 \x01(\t\x12)\n\x07metrics\x18\x05 \x01(\x0b\x32\x18.sales.ProcessingMetrics\"\xa9\x01\n\x13\x42\x61tchUploadResponse\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\x14\n\x0c\x64ownload_url\x18\x04 \x01(\t\x12)\n\x07metrics\x18\x05 \x01(\x0b\x32\x18.sales.ProcessingMetrics\x12 \n\x05\x66iles\x18\x06 \x03(\x0b\x32\x11.sales.FileResult\"2\n\x0e\x44\x61tasetRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x12\n\nauth_token\x18\x02 \x01(\t\"\xa9\x01\n\x0f\x44\x61tasetResponse\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x14\n\x0c\x64ownload_url\x18\x03 \x01(\t\x12)\n\x07metrics\x18\x04 \x01(\x0b\x32\x18.sales.ProcessingMetrics\x12\x0f\n\x07version\x18\x05 \x01(\x03\x12\x0f\n\x07uploads\x18\x06 \x01(\x03\x12\x15\n\rerror_message\x18\x07 \x01(\t\"l\n\x12QueryTotalsRequest\x12\x12\n\nauth_token\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65partments\x18\x02 \x03(\t\x12\x0f\n\x07job_ids\x18\x03 \x03(\t\x12\r\n\x05since\x18\x04 \x01(\x01\x12\r\n\x05until\x18\x05 \x01(\x01\"G\n\x0f\x44\x65partmentTotal\x12\x12\n\ndepartment\x18\x01 \x01(\t\x12\r\n\x05total\x18\x02 \x01(\x03\x12\x11\n\tjob_count\x18\x03 \x01(\x03\"z\n\x13QueryTotalsResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x15\n\rerror_message\x18\x02 \x01(\t\x12&\n\x06totals\x18\x03 \x03(\x0b\x32\x16.sales.DepartmentTotal\x12\x14\n\x0cjobs_matched\x18\x04 \x01(\x03\"N\n\x12\x42\x65ginUploadRequest\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x12\n\nauth_token\x18\x02 \x01(\t\x12\x12\n\ntotal_size\x18\x03 \x01(\x03\"U\n\x19\x42\x65ginShardedUploadRequest\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x12\n\nauth_token\x18\x02 \x01(\t\x12\x12\n\npart_count\x18\x03 \x01(\x05\">\n\x14UploadSessionRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x12\n\nauth_token\x18\x02 \x01(\t\"w\n\x13UploadSessionStatus\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x18\n\x10\x63ommitted_offset\x18\x03 \x01(\x03\x12\x12\n\ntotal_size\x18\x04 \x01(\x03\x12\x0e\n\x06job_id\x18\x05 \x01(\t\"6\n\x10JobStatusRequest\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\x12\n\nauth_token\x18\x02 \x01(\t\"6\n\x10\x43\x61ncelJobRequest\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\x12\n\nauth_token\x18\x02 \x01(\t\"\xaf\x01\n\x11JobStatusResponse\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x14\n\x0c\x64ownload_url\x18\x03 \x01(\t\x12\x15\n\rerror_message\x18\x04 \x01(\t\x12)\n\x07metrics\x18\x05 \x01(\x0b\x32\x18.sales.ProcessingMetrics\x12\"\n\x07preview\x18\x06 \x01(\x0b\x32\x11.sales.JobPreview\"X\n\x12\x44\x65partmentEstimate\x12\x12\n\ndepartment\x18\x01 \x01(\t\x12\x17\n\x0f\x65stimated_total\x18\x02 \x01(\x03\x12\x15\n\rsampled_total\x18\x03 \x01(\x03\"\x80\x01\n\nJobPreview\x12.\n\x0b\x64\x65partments\x18\x01 \x03(\x0b\x32\x19.sales.DepartmentEstimate\x12\x18\n\x10sampled_fraction\x18\x02 \x01(\x01\x12\x12\n\nconfidence\x18\x03 \x01(\t\x12\x14\n\x0crows_sampled\x18\x04 \x01(\x03\"\xf6\x01\n\x11ProcessingMetrics\x12\x1a\n\x12processing_time_ms\x18\x01 \x01(\x03\x12\x16\n\x0erows_processed\x18\x02 \x01(\x03\x12\x14\n\x0crows_skipped\x18\x03 \x01(\x03\x12\x19\n\x11\x64\x65partments_count\x18\x04 \x01(\x03\x12\x16\n\x0epeak_memory_mb\x18\x05 \x01(\x03\x12\"\n\x06phases\x18\x06 \x03(\x0b\x32\x12.sales.PhaseTiming\x12)\n\rhot_functions\x18\x07 \x03(\x0b\x32\x12.sales.HotFunction\x12\x15\n\rrows_filtered\x18\x08 \x01(\x03\"V\n\x0bHotFunction\x12\x10\n\x08\x66unction\x18\x01 \x01(\t\x12\r\n\x05\x63\x61lls\x18\x02 \x01(\x03\x12\x0f\n\x07self_ms\x18\x03 \x01(\x01\x12\x15\n\rcumulative_ms\x18\x04 \x01(\x01\"1\n\x0bPhaseTiming\x12\r\n\x05phase\x18\x01 \x01(\t\x12\x13\n\x0b\x64uration_ms\x18\x02 \x01(\x01\x32\xec\x04\n\x0cSalesService\x12\x38\n\tUploadCSV\x12\x12.sales.UploadChunk\x1a\x15.sales.UploadResponse(\x01\x12\x41\n\x0cGetJobStatus\x12\x17.sales.JobStatusRequest\x1a\x18.sales.JobStatusResponse\x12>\n\tCancelJob\x12\x17.sales.CancelJobRequest\x1a\x18.sales.JobStatusResponse\x12\x44\n\x0b\x42\x65ginUpload\x12\x19.sales.BeginUploadRequest\x1a\x1a.sales.UploadSessionStatus\x12G\n\x0cResumeUpload\x12\x1b.sales.UploadSessionRequest\x1a\x1a.sales.UploadSessionStatus\x12M\n\x12\x42\x65ginShardedUpload\x12 .sales.BeginShardedUploadRequest\x1a\x15.sales.UploadResponse\x12>\n\x0bUploadBatch\x12\x11.sales.BatchChunk\x1a\x1a.sales.BatchUploadResponse(\x01\x12;\n\nGetDataset\x12\x15.sales.DatasetRequest\x1a\x16.sales.DatasetResponse\x12\x44\n\x0bQueryTotals\x12\x19.sales.QueryTotalsRequest\x1a\x1a.sales.QueryTotalsResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'sales_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_UPLOADCHUNK']._serialized_start=22
-  _globals['_UPLOADCHUNK']._serialized_end=87
-  _globals['_UPLOADRESPONSE']._serialized_start=90
-  _globals['_UPLOADRESPONSE']._serialized_end=220
-  _globals['_JOBSTATUSREQUEST']._serialized_start=222
-  _globals['_JOBSTATUSREQUEST']._serialized_end=276
-  _globals['_JOBSTATUSRESPONSE']._serialized_start=279
-  _globals['_JOBSTATUSRESPONSE']._serialized_end=418
-  _globals['_PROCESSINGMETRICS']._serialized_start=421
-  _globals['_PROCESSINGMETRICS']._serialized_end=565
-  _globals['_SALESSERVICE']._serialized_start=568
-  _globals['_SALESSERVICE']._serialized_end=707
+  _globals['_UPLOADCHUNK']._serialized_start=23
+  _globals['_UPLOADCHUNK']._serialized_end=302
+  _globals['_ROWBATCH']._serialized_start=304
+  _globals['_ROWBATCH']._serialized_end=388
+  _globals['_ROWFILTER']._serialized_start=390
+  _globals['_ROWFILTER']._serialized_end=495
+  _globals['_COLUMNREF']._serialized_start=497
+  _globals['_COLUMNREF']._serialized_end=548
+  _globals['_COLUMNMAPPING']._serialized_start=550
+  _globals['_COLUMNMAPPING']._serialized_end=668
+  _globals['_UPLOADRESPONSE']._serialized_start=671
+  _globals['_UPLOADRESPONSE']._serialized_end=827
+  _globals['_BATCHCHUNK']._serialized_start=829
+  _globals['_BATCHCHUNK']._serialized_end=913
+  _globals['_FILERESULT']._serialized_start=916
+  _globals['_FILERESULT']._serialized_end=1048
+  _globals['_BATCHUPLOADRESPONSE']._serialized_start=1051
+  _globals['_BATCHUPLOADRESPONSE']._serialized_end=1220
+  _globals['_DATASETREQUEST']._serialized_start=1222
+  _globals['_DATASETREQUEST']._serialized_end=1272
+  _globals['_DATASETRESPONSE']._serialized_start=1275
+  _globals['_DATASETRESPONSE']._serialized_end=1444
+  _globals['_QUERYTOTALSREQUEST']._serialized_start=1446
+  _globals['_QUERYTOTALSREQUEST']._serialized_end=1554
+  _globals['_DEPARTMENTTOTAL']._serialized_start=1556
+  _globals['_DEPARTMENTTOTAL']._serialized_end=1627
+  _globals['_QUERYTOTALSRESPONSE']._serialized_start=1629
+  _globals['_QUERYTOTALSRESPONSE']._serialized_end=1751
+  _globals['_BEGINUPLOADREQUEST']._serialized_start=1753
+  _globals['_BEGINUPLOADREQUEST']._serialized_end=1831
+  _globals['_BEGINSHARDEDUPLOADREQUEST']._serialized_start=1833
+  _globals['_BEGINSHARDEDUPLOADREQUEST']._serialized_end=1918
+  _globals['_UPLOADSESSIONREQUEST']._serialized_start=1920
+  _globals['_UPLOADSESSIONREQUEST']._serialized_end=1982
+  _globals['_UPLOADSESSIONSTATUS']._serialized_start=1984
+  _globals['_UPLOADSESSIONSTATUS']._serialized_end=2103
+  _globals['_JOBSTATUSREQUEST']._serialized_start=2105
+  _globals['_JOBSTATUSREQUEST']._serialized_end=2159
+  _globals['_CANCELJOBREQUEST']._serialized_start=2161
+  _globals['_CANCELJOBREQUEST']._serialized_end=2215
+  _globals['_JOBSTATUSRESPONSE']._serialized_start=2218
+  _globals['_JOBSTATUSRESPONSE']._serialized_end=2393
+  _globals['_DEPARTMENTESTIMATE']._serialized_start=2395
+  _globals['_DEPARTMENTESTIMATE']._serialized_end=2483
+  _globals['_JOBPREVIEW']._serialized_start=2486
+  _globals['_JOBPREVIEW']._serialized_end=2614
+  _globals['_PROCESSINGMETRICS']._serialized_start=2617
+  _globals['_PROCESSINGMETRICS']._serialized_end=2863
+  _globals['_HOTFUNCTION']._serialized_start=2865
+  _globals['_HOTFUNCTION']._serialized_end=2951
+  _globals['_PHASETIMING']._serialized_start=2953
+  _globals['_PHASETIMING']._serialized_end=3002
+  _globals['_SALESSERVICE']._serialized_start=3005
+  _globals['_SALESSERVICE']._serialized_end=3625
 # @@protoc_insertion_point(module_scope)
@@ -44,13 +44,48 @@ class SalesServiceStub(object):
                 request_serializer=sales__pb2.JobStatusRequest.SerializeToString,
                 response_deserializer=sales__pb2.JobStatusResponse.FromString,
                 _registered_method=True)
+        self.CancelJob = channel.unary_unary(
+                '/sales.SalesService/CancelJob',
+                request_serializer=sales__pb2.CancelJobRequest.SerializeToString,
+                response_deserializer=sales__pb2.JobStatusResponse.FromString,
+                _registered_method=True)
+        self.BeginUpload = channel.unary_unary(
+                '/sales.SalesService/BeginUpload',
+                request_serializer=sales__pb2.BeginUploadRequest.SerializeToString,
+                response_deserializer=sales__pb2.UploadSessionStatus.FromString,
+                _registered_method=True)
+        self.ResumeUpload = channel.unary_unary(
+                '/sales.SalesService/ResumeUpload',
+                request_serializer=sales__pb2.UploadSessionRequest.SerializeToString,
+                response_deserializer=sales__pb2.UploadSessionStatus.FromString,
+                _registered_method=True)
+        self.BeginShardedUpload = channel.unary_unary(
+                '/sales.SalesService/BeginShardedUpload',
+                request_serializer=sales__pb2.BeginShardedUploadRequest.SerializeToString,
+                response_deserializer=sales__pb2.UploadResponse.FromString,
+                _registered_method=True)
+        self.UploadBatch = channel.stream_unary(
+                '/sales.SalesService/UploadBatch',
+                request_serializer=sales__pb2.BatchChunk.SerializeToString,
+                response_deserializer=sales__pb2.BatchUploadResponse.FromString,
+                _registered_method=True)
+        self.GetDataset = channel.unary_unary(
+                '/sales.SalesService/GetDataset',
+                request_serializer=sales__pb2.DatasetRequest.SerializeToString,
+                response_deserializer=sales__pb2.DatasetResponse.FromString,
+                _registered_method=True)
+        self.QueryTotals = channel.unary_unary(
+                '/sales.SalesService/QueryTotals',
+                request_serializer=sales__pb2.QueryTotalsRequest.SerializeToString,
+                response_deserializer=sales__pb2.QueryTotalsResponse.FromString,
+                _registered_method=True)
 
 
 class SalesServiceServicer(object):
     """Missing associated documentation comment in .proto file."""
 
     def UploadCSV(self, request_iterator, context):
-        """Client-streaming: upload CSV file chunk by chunk
+        """Client-streaming: upload CSV file chunk by chunk, or pre-parsed row batches (UploadChunk.rows)
         """
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
@@ -63,6 +98,55 @@ class SalesServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def CancelJob(self, request, context):
+        """Cancel a running job; processing stops at the next checkpoint
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BeginUpload(self, request, context):
+        """Open a resumable upload session; UploadCSV chunks then carry session_id and offset
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ResumeUpload(self, request, context):
+        """Report the committed offset of a session so an interrupted upload can continue
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BeginShardedUpload(self, request, context):
+        """Start a job whose file arrives as part_count concurrent UploadCSV streams
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def UploadBatch(self, request_iterator, context):
+        """Aggregate many files, delimited by file_index, into one combined result
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetDataset(self, request, context):
+        """Report a dataset's running totals, materializing its current output CSV
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def QueryTotals(self, request, context):
+        """Sum department totals across completed jobs from the result index
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_SalesServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -76,6 +160,41 @@ def add_SalesServiceServicer_to_server(servicer, server):
                     request_deserializer=sales__pb2.JobStatusRequest.FromString,
                     response_serializer=sales__pb2.JobStatusResponse.SerializeToString,
             ),
+            'CancelJob': grpc.unary_unary_rpc_method_handler(
+                    servicer.CancelJob,
+                    request_deserializer=sales__pb2.CancelJobRequest.FromString,
+                    response_serializer=sales__pb2.JobStatusResponse.SerializeToString,
+            ),
+            'BeginUpload': grpc.unary_unary_rpc_method_handler(
+                    servicer.BeginUpload,
+                    request_deserializer=sales__pb2.BeginUploadRequest.FromString,
+                    response_serializer=sales__pb2.UploadSessionStatus.SerializeToString,
+            ),
+            'ResumeUpload': grpc.unary_unary_rpc_method_handler(
+                    servicer.ResumeUpload,
+                    request_deserializer=sales__pb2.UploadSessionRequest.FromString,
+                    response_serializer=sales__pb2.UploadSessionStatus.SerializeToString,
+            ),
+            'BeginShardedUpload': grpc.unary_unary_rpc_method_handler(
+                    servicer.BeginShardedUpload,
+                    request_deserializer=sales__pb2.BeginShardedUploadRequest.FromString,
+                    response_serializer=sales__pb2.UploadResponse.SerializeToString,
+            ),
+            'UploadBatch': grpc.stream_unary_rpc_method_handler(
+                    servicer.UploadBatch,
+                    request_deserializer=sales__pb2.BatchChunk.FromString,
+                    response_serializer=sales__pb2.BatchUploadResponse.SerializeToString,
+            ),
+            'GetDataset': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetDataset,
+                    request_deserializer=sales__pb2.DatasetRequest.FromString,
+                    response_serializer=sales__pb2.DatasetResponse.SerializeToString,
+            ),
+            'QueryTotals': grpc.unary_unary_rpc_method_handler(
+                    servicer.QueryTotals,
+                    request_deserializer=sales__pb2.QueryTotalsRequest.FromString,
+                    response_serializer=sales__pb2.QueryTotalsResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'sales.SalesService', rpc_method_handlers)
@@ -140,3 +259,192 @@ class SalesService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def CancelJob(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sales.SalesService/CancelJob',
+            sales__pb2.CancelJobRequest.SerializeToString,
+            sales__pb2.JobStatusResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BeginUpload(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sales.SalesService/BeginUpload',
+            sales__pb2.BeginUploadRequest.SerializeToString,
+            sales__pb2.UploadSessionStatus.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ResumeUpload(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sales.SalesService/ResumeUpload',
+            sales__pb2.UploadSessionRequest.SerializeToString,
+            sales__pb2.UploadSessionStatus.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BeginShardedUpload(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sales.SalesService/BeginShardedUpload',
+            sales__pb2.BeginShardedUploadRequest.SerializeToString,
+            sales__pb2.UploadResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def UploadBatch(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/sales.SalesService/UploadBatch',
+            sales__pb2.BatchChunk.SerializeToString,
+            sales__pb2.BatchUploadResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetDataset(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sales.SalesService/GetDataset',
+            sales__pb2.DatasetRequest.SerializeToString,
+            sales__pb2.DatasetResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def QueryTotals(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sales.SalesService/QueryTotals',
+            sales__pb2.QueryTotalsRequest.SerializeToString,
+            sales__pb2.QueryTotalsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
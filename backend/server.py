@@ -1,7 +1,13 @@
 import grpc
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
 from concurrent import futures
+import multiprocessing
 import os
+import signal
 import sys
+import threading
+import time
+import uuid
 import logging
 
 # Configure logging
@@ -13,35 +19,217 @@ logging.basicConfig(
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from proto import sales_pb2_grpc
+from proto import sales_pb2, sales_pb2_grpc
 from services.sales_service import SalesService
+from services.shared_jobs import SharedJobStore
+from utils.grpc_transport import from_env as transport_from_env
+
+logger = logging.getLogger(__name__)
+
+# Seconds a stopping worker gives in-flight RPCs and background jobs to finish
+SHUTDOWN_GRACE = float(os.getenv('SHUTDOWN_GRACE', '30'))
+
+# Minimum seconds between restarts of a crashing worker slot
+RESTART_BACKOFF = 1.0
+
+# Names the health service reports on: the whole server and the sales service
+HEALTH_SERVICE_NAMES = ('', sales_pb2.DESCRIPTOR.services_by_name['SalesService'].full_name)
+
+
+def _build_service(shared_state_path=None, worker_id=None) -> SalesService:
+    """Create the SalesService configured from environment variables."""
+    return SalesService(
+        output_dir=os.getenv('OUTPUT_DIR', 'storage/processed'),
+        compress_output=os.getenv('OUTPUT_GZIP', 'false').lower() == 'true',
+        spool_dir=os.getenv('UPLOAD_SPOOL_DIR', 'storage/uploads'),
+        dataset_dir=os.getenv('DATASET_DIR', 'storage/datasets'),
+        index_path=os.getenv('RESULT_INDEX_PATH', 'storage/results.db'),
+        shared_state_path=shared_state_path,
+        worker_id=worker_id,
+        max_inflight_bytes=int(float(os.getenv('MAX_INFLIGHT_MB', '0')) * 1024 * 1024),
+        max_active_jobs=int(os.getenv('MAX_ACTIVE_JOBS', '0')),
+        retry_after_ms=int(os.getenv('RETRY_AFTER_MS', '1000')),
+        profile_jobs=os.getenv('PROFILE_JOBS', 'false').lower() == 'true',
+        storage_max_bytes=int(float(os.getenv('STORAGE_MAX_MB', '0')) * 1024 * 1024),
+        storage_max_age=float(os.getenv('STORAGE_MAX_AGE_HOURS', '0')) * 3600,
+        storage_sweep_interval=float(os.getenv('STORAGE_SWEEP_INTERVAL', '60')),
+        session_ttl=float(os.getenv('UPLOAD_SESSION_TTL_HOURS', '24')) * 3600,
+        sharded_idle_timeout=float(os.getenv('SHARDED_IDLE_TIMEOUT', '3600'))
+    )
+
+
+def _add_health_service(server: grpc.Server, service: SalesService) -> health.HealthServicer:
+    """
+    Register the standard gRPC health service, tracking the service's admission state.
+    
+    The status is NOT_SERVING while the server rejects new uploads, so
+    health-checking clients and load balancers send work elsewhere.
+    """
+    health_servicer = health.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
+    
+    def update(overloaded: bool) -> None:
+        status = health_pb2.HealthCheckResponse.NOT_SERVING if overloaded else health_pb2.HealthCheckResponse.SERVING
+        for name in HEALTH_SERVICE_NAMES:
+            health_servicer.set(name, status)
+        if overloaded:
+            logger.warning("Server overloaded, health status set to NOT_SERVING")
+        else:
+            logger.info("Server accepting uploads, health status set to SERVING")
+    
+    service.admission.add_listener(update)
+    for name in HEALTH_SERVICE_NAMES:
+        health_servicer.set(name, health_pb2.HealthCheckResponse.SERVING)
+    return health_servicer
 
 
 def serve():
-    """Start gRPC server."""
+    """Start gRPC server (one process, or GRPC_WORKERS processes sharing the port)."""
     port = os.getenv('GRPC_PORT', '50051')
+    workers = int(os.getenv('GRPC_WORKERS', '1'))
+    if workers > 1:
+        serve_multiprocess(port, workers)
+        return
+    
     output_dir = os.getenv('OUTPUT_DIR', 'storage/processed')
     
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    sales_pb2_grpc.add_SalesServiceServicer_to_server(
-        SalesService(output_dir=output_dir),
-        server
-    )
+    service = _build_service()
+    transport = transport_from_env()
+    server = transport.server(futures.ThreadPoolExecutor(max_workers=10))
+    sales_pb2_grpc.add_SalesServiceServicer_to_server(service, server)
+    health_servicer = _add_health_service(server, service)
     
     server.add_insecure_port(f'[::]:{port}')
     server.start()
     
-    logger = logging.getLogger(__name__)
-    logger.info(f"gRPC server started on port {port}")
+    logger.info(f"gRPC server started on port {port} (transport profile {transport.name})")
     logger.info(f"Output directory: {output_dir}")
     
     try:
         server.wait_for_termination()
     except KeyboardInterrupt:
         logger.info("Shutting down server...")
+        health_servicer.enter_graceful_shutdown()
         server.stop(0)
 
 
+def run_worker(port: str, shared_state_path: str, ready=None, worker_id=None) -> None:
+    """
+    Serve on a port shared with sibling workers via SO_REUSEPORT until SIGTERM.
+    
+    On SIGTERM the worker stops accepting RPCs, lets in-flight ones and its
+    background jobs finish (up to SHUTDOWN_GRACE seconds), then exits. Its
+    jobs are owned by worker_id, the generation id the supervisor assigned.
+    """
+    service = _build_service(shared_state_path, worker_id)
+    
+    server = transport_from_env().server(
+        futures.ThreadPoolExecutor(max_workers=10),
+        extra_options=[('grpc.so_reuseport', 1)]
+    )
+    sales_pb2_grpc.add_SalesServiceServicer_to_server(service, server)
+    health_servicer = _add_health_service(server, service)
+    server.add_insecure_port(f'[::]:{port}')
+    server.start()
+    logger.info(f"Worker {os.getpid()} serving on port {port}")
+    
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    # Ctrl-C reaches the whole process group; the supervisor decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if ready is not None:
+        ready.set()
+    stop.wait()
+    
+    logger.info(f"Worker {os.getpid()} draining")
+    health_servicer.enter_graceful_shutdown()
+    server.stop(SHUTDOWN_GRACE).wait()
+    if not service.wait_for_jobs(SHUTDOWN_GRACE):
+        logger.warning(f"Worker {os.getpid()} exiting with jobs still running")
+
+
+def serve_multiprocess(port: str, workers: int) -> None:
+    """
+    Supervise worker processes bound to the same port.
+    
+    Crashed workers are restarted. SIGHUP performs a rolling restart (each
+    worker is replaced only after its successor is serving); SIGTERM and
+    SIGINT drain and stop all workers. Job state is shared through
+    JOB_STATE_PATH so any worker can answer for any job; jobs a worker
+    leaves unfinished when it exits, crashes or is killed are marked failed.
+    """
+    shared_state_path = os.getenv('JOB_STATE_PATH', 'storage/jobs.db')
+    job_store = SharedJobStore(shared_state_path)
+    # Spawned (not forked) children, so no gRPC state is inherited across fork
+    context = multiprocessing.get_context('spawn')
+    
+    def start_worker():
+        ready = context.Event()
+        # A fresh generation per worker start, so a restarted worker never inherits jobs
+        worker_id = uuid.uuid4().hex
+        process = context.Process(target=run_worker, args=(port, shared_state_path, ready, worker_id),
+                                  daemon=False)
+        process.start()
+        return {'process': process, 'ready': ready, 'worker_id': worker_id, 'started': time.time()}
+    
+    def reap_worker(worker):
+        """Fail the jobs an exited worker left behind so clients stop polling them."""
+        process = worker['process']
+        failed = job_store.fail_owner(
+            worker['worker_id'], f"Worker exited with code {process.exitcode} before the job finished"
+        )
+        if failed:
+            logger.warning(f"Marked {failed} unfinished jobs of worker {process.pid} as failed")
+    
+    def stop_worker(worker):
+        process = worker['process']
+        process.terminate()
+        process.join(SHUTDOWN_GRACE * 2 + 5)
+        if process.is_alive():
+            logger.warning(f"Worker {process.pid} did not drain in time, killing it")
+            process.kill()
+            process.join()
+        reap_worker(worker)
+    
+    # Each slot keeps its worker's ready event alive until the child has unpickled it
+    slots = [start_worker() for _ in range(workers)]
+    logger.info(f"Supervisor {os.getpid()} started {workers} workers on port {port}")
+    
+    signals = {'stop': False, 'restart': False}
+    signal.signal(signal.SIGTERM, lambda signum, frame: signals.update(stop=True))
+    signal.signal(signal.SIGINT, lambda signum, frame: signals.update(stop=True))
+    signal.signal(signal.SIGHUP, lambda signum, frame: signals.update(restart=True))
+    
+    while not signals['stop']:
+        if signals['restart']:
+            signals['restart'] = False
+            logger.info("Rolling restart of workers")
+            for index, slot in enumerate(slots):
+                replacement = start_worker()
+                if not replacement['ready'].wait(30):
+                    logger.error(f"Replacement worker {replacement['process'].pid} did not start, "
+                                 f"keeping {slot['process'].pid}")
+                    stop_worker(replacement)
+                    continue
+                stop_worker(slot)
+                slots[index] = replacement
+        
+        for index, slot in enumerate(slots):
+            process = slot['process']
+            if process.is_alive() or time.time() - slot['started'] < RESTART_BACKOFF:
+                continue
+            logger.warning(f"Worker {process.pid} exited with code {process.exitcode}, restarting")
+            reap_worker(slot)
+            slots[index] = start_worker()
+        
+        time.sleep(0.2)
+    
+    logger.info("Stopping workers...")
+    for slot in slots:
+        slot['process'].terminate()
+    for slot in slots:
+        stop_worker(slot)
+
+
 if __name__ == '__main__':
     serve()
-
@@ -0,0 +1,162 @@
+"""
+Lock-striped registry of immutable job records.
+
+Each job is stored as a frozen JobRecord that is replaced wholesale on every
+state transition. Writers serialize per stripe; readers never take a lock and
+get the JobStatusResponse that was built once when the record was created.
+With a shared store (multi-process servers), every snapshot is also written
+through to it and lookups of jobs owned by other workers fall back to it.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Iterator, Optional
+
+from proto import sales_pb2
+
+DEFAULT_STRIPES = 16
+
+
+@dataclass(frozen=True)
+class JobRecord:
+    """Snapshot of a job's state; never mutated once published."""
+    job_id: str
+    status: str
+    filename: Optional[str] = None
+    start_time: Optional[float] = None
+    download_url: str = ''
+    error: str = ''
+    metrics: Optional[sales_pb2.ProcessingMetrics] = None
+    rows_processed: int = 0
+    rows_skipped: int = 0
+    departments_count: int = 0
+    # Early estimate published while processing; dropped when the exact result replaces it
+    preview: Optional[sales_pb2.JobPreview] = field(default=None, repr=False, compare=False)
+    # Shared with the processing thread; set to request cooperative cancellation
+    cancel_event: Optional[threading.Event] = field(default=None, repr=False, compare=False)
+    response: sales_pb2.JobStatusResponse = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, 'response', self._build_response())
+    
+    def _build_response(self) -> sales_pb2.JobStatusResponse:
+        """Build the JobStatusResponse served for this snapshot."""
+        response = sales_pb2.JobStatusResponse(
+            job_id=self.job_id,
+            status=self.status,
+            download_url=self.download_url,
+            error_message=self.error
+        )
+        # Always include metrics (zeros until the job completes)
+        response.metrics.SetInParent()
+        if self.metrics is not None:
+            response.metrics.CopyFrom(self.metrics)
+        if self.preview is not None:
+            response.preview.CopyFrom(self.preview)
+        return response
+
+
+class JobRegistry:
+    """Job table split into independently locked stripes."""
+    
+    def __init__(self, stripes: int = DEFAULT_STRIPES, shared_store=None):
+        """
+        Initialize job registry.
+        
+        Args:
+            stripes: Number of independently locked partitions
+            shared_store: Optional SharedJobStore mirroring snapshots across processes
+        """
+        self._stripes = [{} for _ in range(stripes)]
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self.shared_store = shared_store
+        # Seconds each thread has spent waiting for contended stripe locks
+        self._waits = threading.local()
+    
+    def _index(self, job_id: str) -> int:
+        return hash(job_id) % len(self._stripes)
+    
+    @contextmanager
+    def _locked(self, index: int) -> Iterator[None]:
+        """Hold a stripe lock, timing the wait only when it is contended."""
+        lock = self._locks[index]
+        if not lock.acquire(blocking=False):
+            start = time.perf_counter()
+            lock.acquire()
+            self._waits.seconds = getattr(self._waits, 'seconds', 0.0) + time.perf_counter() - start
+        try:
+            yield
+        finally:
+            lock.release()
+    
+    def take_lock_wait(self) -> float:
+        """Return and reset the seconds the calling thread has waited for stripe locks."""
+        seconds = getattr(self._waits, 'seconds', 0.0)
+        self._waits.seconds = 0.0
+        return seconds
+    
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        """Return the current snapshot for job_id without locking."""
+        record = self._stripes[self._index(job_id)].get(job_id)
+        if record is None and self.shared_store is not None:
+            return self.shared_store.load(job_id)
+        return record
+    
+    def get_local(self, job_id: str) -> Optional[JobRecord]:
+        """Return the snapshot of a job owned by this process only."""
+        return self._stripes[self._index(job_id)].get(job_id)
+    
+    def put(self, record: JobRecord) -> None:
+        """Publish a new snapshot, replacing any existing one."""
+        index = self._index(record.job_id)
+        with self._locked(index):
+            self._stripes[index][record.job_id] = record
+            if self.shared_store is not None:
+                self.shared_store.save(record)
+    
+    def update(self, job_id: str, require_status: Optional[str] = None, **changes) -> Optional[JobRecord]:
+        """
+        Atomically replace a job's snapshot with a copy carrying changes.
+        
+        Args:
+            job_id: Job to update
+            require_status: Only apply the update if the job is currently in this status
+            **changes: JobRecord fields to change
+        
+        Returns:
+            The new snapshot, or None if the job does not exist or is in another status
+        """
+        index = self._index(job_id)
+        with self._locked(index):
+            current = self._stripes[index].get(job_id)
+            if current is None:
+                return None
+            if require_status is not None and current.status != require_status:
+                return None
+            record = replace(current, **changes)
+            self._stripes[index][job_id] = record
+            if self.shared_store is not None:
+                self.shared_store.save(record)
+            return record
+    
+    def pop(self, job_id: str) -> Optional[JobRecord]:
+        """Remove and return a job's snapshot."""
+        index = self._index(job_id)
+        with self._locked(index):
+            if self.shared_store is not None:
+                self.shared_store.delete(job_id)
+            return self._stripes[index].pop(job_id, None)
+    
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+    
+    # Size and iteration cover this process's jobs only
+    def __len__(self) -> int:
+        return sum(len(stripe) for stripe in self._stripes)
+    
+    def __iter__(self) -> Iterator[JobRecord]:
+        for index, stripe in enumerate(self._stripes):
+            with self._locks[index]:
+                records = list(stripe.values())
+            yield from records
@@ -1,58 +1,268 @@
 import os
-import io
+import heapq
+import itertools
 import threading
 import time
-from typing import Iterator, Dict, Optional
-from collections import defaultdict
-import csv
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 from uuid import uuid4
-from datetime import datetime
+import grpc
 import logging
 import psutil
 import sys
 
 from proto import sales_pb2, sales_pb2_grpc
+from utils.admission import DEFAULT_RETRY_AFTER_MS, AdmissionController, AdmissionRejected, UploadTooLarge
 from utils.auth import get_auth_manager
+from utils.csv_processor import JobCancelled, RowFilter, SalesAggregator, write_results_atomic
+from utils.dataset_store import DatasetStore, valid_dataset_name
+from utils.job_profiler import JobProfiler, profile_filename
+from utils.phase_timing import PhaseTimings
+from utils.result_index import ResultIndex
+from utils.storage_manager import StorageManager
+from utils.upload_spool import UploadSpool
+from services.job_registry import JobRecord, JobRegistry
+from services.shared_jobs import SharedJobStore
+from services.sharded_upload import MAX_UPLOAD_PARTS, ShardedUpload
 
 logger = logging.getLogger(__name__)
 
+# Statuses a job can no longer leave
+TERMINAL_STATUSES = frozenset({'completed', 'cancelled', 'error'})
+
+# Files of one UploadBatch aggregated concurrently; twice as many may be buffered
+BATCH_WORKERS = 4
+
+# Uploads of at least twice this size get a preview after this many bytes,
+# refreshed each time the processed share doubles
+PREVIEW_BYTES = 4 * 1024 * 1024
+
+# Departments included in a preview
+PREVIEW_TOP_DEPARTMENTS = 10
+
+# Seconds between checks for cancellations requested by other worker processes
+CANCEL_POLL_INTERVAL = 0.5
+
+# Seconds between sweeps for outputs to evict, when storage limits are set
+STORAGE_SWEEP_INTERVAL = 60.0
+
+# Seconds without part activity after which an incomplete sharded job fails
+SHARDED_IDLE_TIMEOUT = 3600.0
+
+
+def build_preview(aggregator: SalesAggregator, total_bytes: int,
+                  top_n: int = PREVIEW_TOP_DEPARTMENTS) -> sales_pb2.JobPreview:
+    """
+    Extrapolate the top departments' totals from the processed share of an upload.
+    
+    Args:
+        aggregator: Aggregator that has consumed a prefix of the upload
+        total_bytes: Size of the whole upload in bytes
+        top_n: Number of departments to include
+    
+    Returns:
+        JobPreview with estimated totals and a confidence indicator
+    """
+    fraction = min(1.0, aggregator.bytes_received / total_bytes) if total_bytes else 1.0
+    scale = 1 / fraction if fraction else 0
+    
+    preview = sales_pb2.JobPreview(
+        sampled_fraction=fraction,
+        confidence='low' if fraction < 0.1 else 'medium' if fraction < 0.5 else 'high',
+        rows_sampled=aggregator.rows_processed
+    )
+    for dept, total in heapq.nlargest(top_n, aggregator.dept_counts.items(), key=lambda item: item[1]):
+        preview.departments.add(department=dept, estimated_total=round(total * scale), sampled_total=total)
+    return preview
+
+
+def column_mapping(columns: sales_pb2.ColumnMapping) -> Optional[Dict[str, object]]:
+    """
+    Convert an upload's ColumnMapping to the form SalesAggregator takes.
+    
+    Returns:
+        {field: header name or index} for the fields that are set, or None if none are
+    
+    Raises:
+        ValueError: If an index is negative
+    """
+    mapping = {}
+    for field in ('department', 'date', 'sales'):
+        ref = getattr(columns, field)
+        kind = ref.WhichOneof('ref')
+        if kind == 'name':
+            mapping[field] = ref.name
+        elif kind == 'index':
+            if ref.index < 0:
+                raise ValueError(f"Column index for {field} must not be negative")
+            mapping[field] = ref.index
+    return mapping or None
+
+
+class InvalidUploadOptions(ValueError):
+    """An upload's first chunk names a dataset, column mapping or row filter that cannot be used."""
+
+
+def row_filter(predicates: sales_pb2.RowFilter) -> Optional[RowFilter]:
+    """
+    Convert an upload's RowFilter message to the form SalesAggregator takes.
+    
+    Returns:
+        RowFilter, or None if the message sets no predicate
+    
+    Raises:
+        ValueError: If a date bound is malformed or the range is empty
+    """
+    result = RowFilter(predicates.date_from, predicates.date_to,
+                       predicates.include_departments, predicates.exclude_departments)
+    return result if result else None
+
 
 class SalesService(sales_pb2_grpc.SalesServiceServicer):
     """gRPC service for processing CSV sales data with background processing and metrics."""
     
-    def __init__(self, output_dir: str = "storage/processed"):
+    def __init__(self, output_dir: str = "storage/processed", compress_output: bool = False,
+                 spool_dir: Optional[str] = None, dataset_dir: Optional[str] = None,
+                 index_path: Optional[str] = None, preview_bytes: int = PREVIEW_BYTES,
+                 shared_state_path: Optional[str] = None, worker_id: Optional[str] = None,
+                 max_inflight_bytes: int = 0,
+                 max_active_jobs: int = 0, retry_after_ms: int = DEFAULT_RETRY_AFTER_MS,
+                 profile_jobs: bool = False, storage_max_bytes: int = 0, storage_max_age: float = 0,
+                 storage_sweep_interval: float = STORAGE_SWEEP_INTERVAL, session_ttl: float = 0,
+                 sharded_idle_timeout: float = SHARDED_IDLE_TIMEOUT):
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
         
-        # In-memory job tracking
-        self.jobs: Dict[str, Dict] = {}
-        self.jobs_lock = threading.Lock()
+        # State not passed explicitly lives below output_dir, never in the working directory
+        spool_dir = spool_dir or os.path.join(output_dir, '.uploads')
+        dataset_dir = dataset_dir or os.path.join(output_dir, '.datasets')
+        index_path = index_path or os.path.join(output_dir, '.results.db')
+        
+        # Job results and profiles, sharded below output_dir and evicted past the limits
+        self.storage = StorageManager(output_dir, max_bytes=storage_max_bytes, max_age=storage_max_age)
+        
+        # Resumable upload sessions, persisted on local disk
+        self.upload_spool = UploadSpool(spool_dir)
+        
+        # Named datasets whose running totals persist across uploads
+        self.datasets = DatasetStore(dataset_dir)
+        
+        # Queryable totals of every completed job
+        self.result_index = ResultIndex(index_path)
+        
+        # Bytes processed before a large upload's first preview (0 disables previews)
+        self.preview_bytes = preview_bytes
+        
+        # Also publish a precompressed .csv.gz sibling next to each result
+        self.compress_output = compress_output
+        
+        # Profile every job's processing, not only those whose upload asks for it
+        self.profile_jobs = profile_jobs
+        
+        # Limits on uploads buffered in memory; past them new uploads are rejected
+        self.admission = AdmissionController(max_inflight_bytes, max_active_jobs, retry_after_ms)
+        
+        # In-memory job tracking (lock-striped, readers never block); in multi-process
+        # mode also mirrored to a store shared by all workers, owned by this worker's generation id
+        shared_store = SharedJobStore(shared_state_path, owner=worker_id) if shared_state_path else None
+        self.jobs = JobRegistry(shared_store=shared_store)
+        
+        # Sharded jobs still receiving parts, keyed by job id; failed once idle for sharded_idle_timeout
+        self._sharded: Dict[str, ShardedUpload] = {}
+        self._sharded_lock = threading.Lock()
+        self.sharded_idle_timeout = sharded_idle_timeout
+        self._sharded_sweeper_started = False
         
         # Auth manager
         self.auth_manager = get_auth_manager()
+        
+        # Apply cancellations requested through other worker processes
+        if shared_store is not None:
+            watcher = threading.Thread(target=self._watch_cancel_requests, name='cancel-watcher')
+            watcher.daemon = True
+            watcher.start()
+        
+        # Evict outputs by age and total size, dropping evicted jobs from the job table
+        if storage_max_bytes or storage_max_age:
+            sweeper = threading.Thread(
+                target=self.storage.run_sweeper,
+                args=(storage_sweep_interval, self._on_output_evicted),
+                name='storage-sweeper'
+            )
+            sweeper.daemon = True
+            sweeper.start()
+        
+        # Delete resumable upload sessions idle for longer than session_ttl seconds
+        if session_ttl:
+            session_sweeper = threading.Thread(
+                target=self.upload_spool.run_sweeper,
+                args=(storage_sweep_interval, session_ttl),
+                name='session-sweeper'
+            )
+            session_sweeper.daemon = True
+            session_sweeper.start()
     
     def UploadCSV(self, request_iterator: Iterator[sales_pb2.UploadChunk], context) -> sales_pb2.UploadResponse:
         """Handle streaming CSV upload with authentication."""
         job_id = str(uuid4())
+        timings = PhaseTimings()
         chunks = []
         filename = None
         auth_token = None
+        dataset = ''
+        profile = False
+        columns = None
+        filters = None
         first_chunk = True
+        admitted = False
+        buffered_bytes = 0
+        handed_off = False
         
         try:
             # Collect chunks and extract metadata
             try:
                 for chunk in request_iterator:
                     if first_chunk:
+                        # Resumable session: append to the spool instead of buffering in memory
+                        if chunk.session_id:
+                            return self._upload_to_session(chunk, request_iterator, context)
+                        # Part of a sharded job: aggregate this stream on its own
+                        if chunk.job_id:
+                            return self._upload_part(chunk, request_iterator, context)
+                        # Pre-parsed row batches instead of CSV text
+                        if chunk.HasField('rows'):
+                            return self._upload_rows(chunk, request_iterator, context)
                         if chunk.filename:
                             filename = chunk.filename
                         if hasattr(chunk, 'auth_token') and chunk.auth_token:
                             auth_token = chunk.auth_token
+                        dataset = chunk.dataset
+                        profile = chunk.profile
+                        columns, filters = self._upload_options(chunk)
                         first_chunk = False
+                        
+                        # Turn the upload away before buffering any of it if the server is full
+                        if not self.admission.try_acquire():
+                            raise AdmissionRejected('Server is at capacity, retry later')
+                        admitted = True
                     
                     if chunk.data:
+                        self._admit_bytes(buffered_bytes, len(chunk.data))
+                        buffered_bytes += len(chunk.data)
                         chunks.append(chunk.data)
+            except (AdmissionRejected, UploadTooLarge, InvalidUploadOptions):
+                raise
             except Exception as iter_error:
+                # Drop whatever was buffered before the stream broke
+                chunks.clear()
+                if context is not None and not context.is_active():
+                    logger.warning(f"Upload for job {job_id} aborted by client, discarded buffered data")
+                    self.jobs.put(JobRecord(job_id=job_id, status='cancelled', error='Upload aborted by client'))
+                    return sales_pb2.UploadResponse(
+                        job_id=job_id,
+                        status='cancelled',
+                        message='Upload aborted by client'
+                    )
                 logger.error(f"Error iterating request chunks for job {job_id}: {str(iter_error)}", exc_info=True)
                 raise ValueError(f"Failed to receive file data: {str(iter_error)}")
             
@@ -82,21 +292,25 @@ class SalesService(sales_pb2_grpc.SalesServiceServicer):
                 return response
             
             # Mark as processing immediately
-            with self.jobs_lock:
-                self.jobs[job_id] = {
-                    'status': 'processing',
-                    'filename': filename,
-                    'start_time': time.time(),
-                    'metrics': None
-                }
+            cancel_event = threading.Event()
+            self.jobs.put(JobRecord(
+                job_id=job_id,
+                status='processing',
+                filename=filename,
+                start_time=time.time(),
+                cancel_event=cancel_event
+            ))
             
             # Process in background thread
+            timings.lap('receive')
             thread = threading.Thread(
-                target=self._process_csv_background,
-                args=(chunks, job_id, filename)
+                target=self._process_admitted,
+                args=(chunks, job_id, filename, cancel_event, dataset, buffered_bytes, timings, profile, columns,
+                      filters)
             )
             thread.daemon = True
             thread.start()
+            handed_off = True
             
             # Return immediately with job ID
             response = sales_pb2.UploadResponse(
@@ -117,13 +331,17 @@ class SalesService(sales_pb2_grpc.SalesServiceServicer):
                 pass
             return response
             
+        except AdmissionRejected as e:
+            chunks.clear()
+            return self._reject_overloaded(context, str(e))
+        except UploadTooLarge as e:
+            chunks.clear()
+            return self._reject_too_large(context, str(e))
+        except InvalidUploadOptions as e:
+            return self._reject_invalid(context, str(e))
         except Exception as e:
             logger.error(f"Error accepting CSV upload for job {job_id}: {str(e)}", exc_info=True)
-            with self.jobs_lock:
-                self.jobs[job_id] = {
-                    'status': 'error',
-                    'error': str(e)
-                }
+            self.jobs.put(JobRecord(job_id=job_id, status='error', error=str(e)))
             response = sales_pb2.UploadResponse(
                 job_id=job_id,
                 status='error',
@@ -140,6 +358,728 @@ class SalesService(sales_pb2_grpc.SalesServiceServicer):
                 # Metrics field not available - proto files need regeneration
                 pass
             return response
+        finally:
+            # The background job releases the admission once it has processed the data
+            if admitted and not handed_off:
+                self.admission.release(buffered_bytes)
+    
+    def _check_upload_size(self, nbytes: int) -> None:
+        """
+        Reject an upload that could never be held in memory, however idle the server.
+        
+        Raises:
+            UploadTooLarge: If nbytes held by one upload would exceed the in-flight byte limit
+        """
+        if self.admission.exceeds_limit(nbytes):
+            raise UploadTooLarge(f'Upload exceeds the {self.admission.max_inflight_bytes}-byte in-memory limit, '
+                                 f'use a resumable upload instead')
+    
+    def _admit_bytes(self, held: int, nbytes: int) -> None:
+        """
+        Account for nbytes more data of an admitted upload already holding held bytes.
+        
+        Raises:
+            UploadTooLarge: If the upload alone would exceed the in-flight byte limit
+            AdmissionRejected: If other uploads leave no room for the data right now
+        """
+        self._check_upload_size(held + nbytes)
+        if not self.admission.add_bytes(nbytes):
+            raise AdmissionRejected('Server has too much upload data in flight, retry later')
+    
+    @staticmethod
+    def _upload_options(chunk: sales_pb2.UploadChunk) -> tuple:
+        """
+        Validate the dataset name, column mapping and row filter on an upload's first chunk.
+        
+        Returns:
+            (column mapping, RowFilter), each None when the chunk sets none
+        
+        Raises:
+            InvalidUploadOptions: If any of them cannot be used
+        """
+        try:
+            if chunk.dataset and not valid_dataset_name(chunk.dataset):
+                raise ValueError(f"Invalid dataset name: {chunk.dataset!r}")
+            return column_mapping(chunk.columns), row_filter(chunk.row_filter)
+        except ValueError as e:
+            raise InvalidUploadOptions(str(e)) from e
+    
+    def _reject_invalid(self, context, message: str) -> sales_pb2.UploadResponse:
+        """
+        Turn away an upload that cannot succeed as sent with INVALID_ARGUMENT and no retry hint.
+        
+        Without a gRPC context (direct calls) an 'error' response is returned instead.
+        """
+        logger.warning(f"Rejecting upload: {message}")
+        if context is not None:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, message)
+        return sales_pb2.UploadResponse(status='error', message=message)
+    
+    def _reject_too_large(self, context, message: str) -> sales_pb2.UploadResponse:
+        """
+        Turn away an upload that can never fit, naming the byte limit in the
+        'max-upload-bytes' trailing metadata so proxies can answer 413.
+        """
+        if context is not None:
+            context.set_trailing_metadata((('max-upload-bytes', str(self.admission.max_inflight_bytes)),))
+        return self._reject_invalid(context, message)
+    
+    def _reject_overloaded(self, context, message: str) -> sales_pb2.UploadResponse:
+        """
+        Turn an upload away with RESOURCE_EXHAUSTED and a retry-after hint.
+        
+        Without a gRPC context (direct calls) a 'rejected' response is returned instead.
+        """
+        retry_after_ms = self.admission.retry_after_ms
+        logger.warning(f"Rejecting upload: {message} (retry after {retry_after_ms}ms)")
+        if context is not None:
+            context.set_trailing_metadata((('retry-after-ms', str(retry_after_ms)),))
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, message)
+        return sales_pb2.UploadResponse(status='rejected', message=message)
+    
+    def _upload_to_session(self, first_chunk: sales_pb2.UploadChunk,
+                           request_iterator: Iterator[sales_pb2.UploadChunk], context) -> sales_pb2.UploadResponse:
+        """Append a stream of offset-tagged chunks to a resumable session's spool."""
+        session_id = first_chunk.session_id
+        
+        # Validate authentication
+        try:
+            self.auth_manager.require_auth(first_chunk.auth_token)
+        except PermissionError as e:
+            logger.warning(f"Unauthorized upload attempt for session {session_id}: {str(e)}")
+            return sales_pb2.UploadResponse(status='error', message='Authentication failed')
+        
+        session = self.upload_spool.metadata(session_id)
+        if session is None:
+            return sales_pb2.UploadResponse(status='error', message=f'Unknown upload session {session_id}')
+        if session['status'] != 'receiving':
+            return sales_pb2.UploadResponse(
+                job_id=session['job_id'],
+                status='error',
+                message='Upload session already completed'
+            )
+        if not self.upload_spool.acquire(session_id):
+            return sales_pb2.UploadResponse(status='error', message='Upload session is busy in another stream')
+        
+        # The claim holds across worker processes until the session is handed off, so
+        # concurrent streams can neither interleave appends nor both start a job
+        try:
+            session = self.upload_spool.metadata(session_id)
+            if session is None or session['status'] != 'receiving':
+                return sales_pb2.UploadResponse(
+                    job_id=session['job_id'] if session else '',
+                    status='error',
+                    message='Upload session already completed'
+                )
+            with self.upload_spool.open_data(session_id) as f:
+                committed = f.tell()
+                try:
+                    for chunk in itertools.chain([first_chunk], request_iterator):
+                        if chunk.data:
+                            committed = self.upload_spool.append(session_id, chunk.offset, chunk.data, f)
+                except ValueError as e:
+                    return sales_pb2.UploadResponse(
+                        status='error',
+                        message=str(e),
+                        committed_offset=committed
+                    )
+                except Exception as iter_error:
+                    # Stream dropped: keep what was received so the client can resume
+                    logger.warning(f"Upload session {session_id} interrupted at offset {committed}: {str(iter_error)}")
+                    return sales_pb2.UploadResponse(
+                        status='receiving',
+                        message='Upload interrupted, resume from committed offset',
+                        committed_offset=committed
+                    )
+            
+            total_size = session['total_size']
+            if total_size and committed < total_size:
+                return sales_pb2.UploadResponse(
+                    status='receiving',
+                    message=f'Received {committed} of {total_size} bytes',
+                    committed_offset=committed
+                )
+            if committed == 0:
+                return sales_pb2.UploadResponse(status='error', message='No file data received')
+            
+            # Upload complete: hand the spooled data to a background job
+            job_id = str(uuid4())
+            filename = session['filename']
+            self.upload_spool.complete(session_id, job_id, committed)
+        finally:
+            self.upload_spool.release(session_id)
+        
+        cancel_event = threading.Event()
+        self.jobs.put(JobRecord(
+            job_id=job_id,
+            status='processing',
+            filename=filename,
+            start_time=time.time(),
+            cancel_event=cancel_event
+        ))
+        
+        thread = threading.Thread(
+            target=self._process_session_background,
+            args=(session_id, job_id, filename, cancel_event, PhaseTimings())
+        )
+        thread.daemon = True
+        thread.start()
+        
+        return sales_pb2.UploadResponse(
+            job_id=job_id,
+            status='processing',
+            message='File upload accepted, processing in background',
+            committed_offset=committed
+        )
+    
+    def _upload_rows(self, first_chunk: sales_pb2.UploadChunk,
+                     request_iterator: Iterator[sales_pb2.UploadChunk], context) -> sales_pb2.UploadResponse:
+        """
+        Accept an upload of pre-parsed row batches and aggregate it in the background.
+        
+        Batches are buffered as received messages, whose packed columns take
+        a few bytes per row, and count against admission by their encoded
+        size like CSV data. Each is aggregated without text parsing (see
+        SalesAggregator.feed_rows).
+        """
+        job_id = str(uuid4())
+        timings = PhaseTimings()
+        batches = []
+        admitted = False
+        buffered_bytes = 0
+        handed_off = False
+        
+        # Validate authentication before buffering any of the upload
+        try:
+            self.auth_manager.require_auth(first_chunk.auth_token)
+        except PermissionError as e:
+            logger.warning(f"Unauthorized row batch upload for job {job_id}: {str(e)}")
+            return sales_pb2.UploadResponse(job_id=job_id, status='error', message='Authentication failed')
+        
+        try:
+            _, filters = self._upload_options(first_chunk)
+            
+            # Turn the upload away before buffering any of it if the server is full
+            if not self.admission.try_acquire():
+                raise AdmissionRejected('Server is at capacity, retry later')
+            admitted = True
+            
+            try:
+                for chunk in itertools.chain([first_chunk], request_iterator):
+                    if chunk.data:
+                        raise ValueError("An upload cannot mix CSV data and row batches")
+                    size = chunk.rows.ByteSize()
+                    self._admit_bytes(buffered_bytes, size)
+                    buffered_bytes += size
+                    batches.append(chunk.rows)
+            except (AdmissionRejected, UploadTooLarge, ValueError):
+                raise
+            except Exception as iter_error:
+                # Drop whatever was buffered before the stream broke
+                batches.clear()
+                if context is not None and not context.is_active():
+                    logger.warning(f"Upload for job {job_id} aborted by client, discarded buffered batches")
+                    self.jobs.put(JobRecord(job_id=job_id, status='cancelled', error='Upload aborted by client'))
+                    return sales_pb2.UploadResponse(job_id=job_id, status='cancelled',
+                                                    message='Upload aborted by client')
+                logger.error(f"Error iterating row batches for job {job_id}: {str(iter_error)}", exc_info=True)
+                raise ValueError(f"Failed to receive row batches: {str(iter_error)}")
+            
+            if not any(batch.department_ids or batch.days or batch.sales for batch in batches):
+                raise ValueError("No rows received")
+            
+            cancel_event = threading.Event()
+            self.jobs.put(JobRecord(
+                job_id=job_id,
+                status='processing',
+                filename=first_chunk.filename or None,
+                start_time=time.time(),
+                cancel_event=cancel_event
+            ))
+            
+            timings.lap('receive')
+            thread = threading.Thread(
+                target=self._process_admitted,
+                args=(batches, job_id, first_chunk.filename or None, cancel_event, first_chunk.dataset,
+                      buffered_bytes, timings, first_chunk.profile, None, filters, True)
+            )
+            thread.daemon = True
+            thread.start()
+            handed_off = True
+            
+            return sales_pb2.UploadResponse(
+                job_id=job_id,
+                status='processing',
+                message='Row batches accepted, processing in background'
+            )
+        except AdmissionRejected as e:
+            batches.clear()
+            return self._reject_overloaded(context, str(e))
+        except UploadTooLarge as e:
+            batches.clear()
+            return self._reject_too_large(context, str(e))
+        except InvalidUploadOptions as e:
+            return self._reject_invalid(context, str(e))
+        except Exception as e:
+            logger.error(f"Error accepting row batch upload for job {job_id}: {str(e)}")
+            self.jobs.put(JobRecord(job_id=job_id, status='error', error=str(e)))
+            return sales_pb2.UploadResponse(job_id=job_id, status='error', message=f'Upload failed: {str(e)}')
+        finally:
+            # The background job releases the admission once it has processed the data
+            if admitted and not handed_off:
+                self.admission.release(buffered_bytes)
+    
+    def _upload_part(self, first_chunk: sales_pb2.UploadChunk,
+                     request_iterator: Iterator[sales_pb2.UploadChunk], context) -> sales_pb2.UploadResponse:
+        """Aggregate one part of a sharded job as it streams in; the last part publishes the result."""
+        job_id = first_chunk.job_id
+        part_index = first_chunk.part_index
+        
+        # Validate authentication
+        try:
+            self.auth_manager.require_auth(first_chunk.auth_token)
+        except PermissionError as e:
+            logger.warning(f"Unauthorized part upload for job {job_id}: {str(e)}")
+            return sales_pb2.UploadResponse(job_id=job_id, status='error', message='Authentication failed')
+        
+        with self._sharded_lock:
+            upload = self._sharded.get(job_id)
+        if upload is None:
+            job = self.jobs.get(job_id)
+            if job is None:
+                message = f'Unknown sharded job {job_id}'
+            elif job.status == 'processing':
+                # Known through the shared job store: another worker holds the parts
+                message = (f'Job {job_id} is receiving parts on another worker; '
+                           f'send all parts over one connection')
+            else:
+                message = f'Job {job_id} is {job.status}'
+            return sales_pb2.UploadResponse(job_id=job_id, status='error', message=message)
+        
+        claim_error = upload.claim(part_index)
+        if claim_error:
+            return sales_pb2.UploadResponse(job_id=job_id, status='error', message=claim_error)
+        
+        job = self.jobs.get(job_id)
+        aggregator = SalesAggregator(has_header=part_index == 0, cancel_event=job.cancel_event,
+                                     timings=PhaseTimings())
+        try:
+            try:
+                for chunk in itertools.chain([first_chunk], request_iterator):
+                    aggregator.feed(chunk.data)
+            except (JobCancelled, ValueError):
+                raise
+            except Exception as iter_error:
+                # Partial totals are dropped; the part can be uploaded again
+                upload.release(part_index)
+                logger.warning(f"Part {part_index} of job {job_id} interrupted: {str(iter_error)}")
+                return sales_pb2.UploadResponse(
+                    job_id=job_id,
+                    status='receiving',
+                    message=f'Part {part_index} interrupted, upload it again'
+                )
+            aggregator.finish()
+        except JobCancelled:
+            upload.release(part_index)
+            return sales_pb2.UploadResponse(job_id=job_id, status='cancelled', message='Job cancelled')
+        except ValueError as e:
+            # Malformed data fails the whole job
+            with self._sharded_lock:
+                self._sharded.pop(job_id, None)
+            logger.error(f"Error processing part {part_index} of job {job_id}: {str(e)}")
+            self.jobs.put(JobRecord(job_id=job_id, status='error', error=str(e)))
+            return sales_pb2.UploadResponse(job_id=job_id, status='error', message=f'Upload failed: {str(e)}')
+        
+        if job.cancel_event.is_set():
+            return sales_pb2.UploadResponse(job_id=job_id, status='cancelled', message='Job cancelled')
+        
+        if not upload.add(part_index, aggregator):
+            return sales_pb2.UploadResponse(
+                job_id=job_id,
+                status='processing',
+                message=f'Part {part_index} of {upload.part_count} received'
+            )
+        
+        # Last part: the merged totals are the job's result
+        with self._sharded_lock:
+            if self._sharded.pop(job_id, None) is None:
+                # Cancelled while this part was being merged
+                return sales_pb2.UploadResponse(job_id=job_id, status='cancelled', message='Job cancelled')
+        
+        merged = upload.merged
+        try:
+            output_filename = self._write_output(merged.dept_counts, merged.timings, job_id)
+        except Exception as e:
+            logger.error(f"Error writing output for job {job_id}: {str(e)}", exc_info=True)
+            self.jobs.put(JobRecord(job_id=job_id, status='error', error=str(e)))
+            return sales_pb2.UploadResponse(job_id=job_id, status='error', message=f'Upload failed: {str(e)}')
+        
+        metrics = sales_pb2.ProcessingMetrics()
+        metrics.processing_time_ms = int((time.time() - upload.start_time) * 1000)
+        metrics.rows_processed = merged.rows_processed
+        metrics.rows_skipped = merged.rows_skipped
+        metrics.departments_count = len(merged.dept_counts)
+        merged.timings.fill(metrics)
+        
+        download_url = self._publish_completed(job_id, upload.filename, output_filename,
+                                               merged.dept_counts, metrics)
+        logger.info(f"Sharded job {job_id} completed from {upload.part_count} parts "
+                    f"in {metrics.processing_time_ms}ms")
+        
+        response = sales_pb2.UploadResponse(
+            job_id=job_id,
+            status='completed',
+            message=f'All {upload.part_count} parts received',
+            download_url=download_url
+        )
+        response.metrics.CopyFrom(metrics)
+        return response
+    
+    def BeginShardedUpload(self, request: sales_pb2.BeginShardedUploadRequest, context) -> sales_pb2.UploadResponse:
+        """Start a job whose file is uploaded as several concurrent parts, with authentication."""
+        try:
+            self.auth_manager.require_auth(request.auth_token)
+        except PermissionError as e:
+            logger.warning(f"Unauthorized sharded upload request: {str(e)}")
+            return sales_pb2.UploadResponse(status='error', message='Authentication failed')
+        
+        if not 1 <= request.part_count <= MAX_UPLOAD_PARTS:
+            return sales_pb2.UploadResponse(
+                status='error',
+                message=f'part_count must be between 1 and {MAX_UPLOAD_PARTS}'
+            )
+        
+        job_id = str(uuid4())
+        with self._sharded_lock:
+            self._sharded[job_id] = ShardedUpload(job_id, request.filename, request.part_count)
+            # Started with the first sharded job, so services that never see one run no thread
+            if self.sharded_idle_timeout and not self._sharded_sweeper_started:
+                self._sharded_sweeper_started = True
+                sweeper = threading.Thread(target=self._sweep_sharded, name='sharded-sweeper')
+                sweeper.daemon = True
+                sweeper.start()
+        self.jobs.put(JobRecord(
+            job_id=job_id,
+            status='processing',
+            filename=request.filename,
+            start_time=time.time(),
+            cancel_event=threading.Event()
+        ))
+        logger.info(f"Opened sharded job {job_id} for {request.filename} in {request.part_count} parts")
+        return sales_pb2.UploadResponse(
+            job_id=job_id,
+            status='processing',
+            message=f'Upload {request.part_count} parts with this job_id'
+        )
+    
+    def UploadBatch(self, request_iterator: Iterator[sales_pb2.BatchChunk], context) -> sales_pb2.BatchUploadResponse:
+        """
+        Aggregate a stream of several files into one combined result with authentication.
+        
+        Each file is aggregated on a worker as soon as its last chunk arrives,
+        overlapping with receipt of the next file. A file that fails is
+        reported in its FileResult and left out of the combined output.
+        
+        The batch is admitted like a single upload; files count against the
+        in-flight byte limit from receipt until they are aggregated.
+        """
+        job_id = str(uuid4())
+        first_chunk = next(request_iterator, None)
+        if first_chunk is None:
+            return sales_pb2.BatchUploadResponse(job_id=job_id, status='error', message='No file data received')
+        
+        # Validate authentication
+        try:
+            self.auth_manager.require_auth(first_chunk.auth_token)
+        except PermissionError as e:
+            logger.warning(f"Unauthorized batch upload attempt for job {job_id}: {str(e)}")
+            return sales_pb2.BatchUploadResponse(job_id=job_id, status='error', message='Authentication failed')
+        
+        if not self.admission.try_acquire():
+            rejected = self._reject_overloaded(context, 'Server is at capacity, retry later')
+            return sales_pb2.BatchUploadResponse(job_id=job_id, status=rejected.status, message=rejected.message)
+        try:
+            return self._upload_batch(job_id, first_chunk, request_iterator, context)
+        finally:
+            self.admission.release(0)
+    
+    def _upload_batch(self, job_id: str, first_chunk: sales_pb2.BatchChunk,
+                      request_iterator: Iterator[sales_pb2.BatchChunk], context) -> sales_pb2.BatchUploadResponse:
+        """Receive and aggregate an admitted batch; see UploadBatch."""
+        process = psutil.Process(os.getpid())
+        initial_memory = process.memory_info().rss / 1024 / 1024  # MB
+        start_time = time.time()
+        
+        cancel_event = threading.Event()
+        self.jobs.put(JobRecord(
+            job_id=job_id,
+            status='processing',
+            filename=first_chunk.filename,
+            start_time=start_time,
+            cancel_event=cancel_event
+        ))
+        
+        # Bounds the files buffered in memory; receipt waits when workers fall behind
+        slots = threading.BoundedSemaphore(BATCH_WORKERS * 2)
+        files = []
+        # Bytes received and not yet aggregated, as counted by admission control
+        held_bytes = 0
+        held_changed = threading.Condition()
+        
+        def release_file(nbytes):
+            nonlocal held_bytes
+            with held_changed:
+                held_bytes -= nbytes
+                self.admission.release_bytes(nbytes)
+                held_changed.notify_all()
+        
+        def submit(file_index, filename, chunks, nbytes):
+            slots.acquire()
+            future = executor.submit(self._aggregate_batch_file, chunks, cancel_event, slots)
+            future.add_done_callback(lambda _: release_file(nbytes))
+            files.append((file_index, filename, future))
+        
+        executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix=f'batch-{job_id[:8]}')
+        try:
+            file_index, filename, chunks, file_bytes = first_chunk.file_index, first_chunk.filename, [], 0
+            try:
+                for chunk in itertools.chain([first_chunk], request_iterator):
+                    if cancel_event.is_set():
+                        break
+                    if chunk.file_index != file_index:
+                        if chunk.file_index < file_index:
+                            raise ValueError(f"file_index went from {file_index} back to {chunk.file_index}")
+                        submit(file_index, filename, chunks, file_bytes)
+                        file_index, filename, chunks, file_bytes = chunk.file_index, chunk.filename, [], 0
+                    if chunk.data:
+                        # Only a single file bigger than the limit can never fit
+                        self._check_upload_size(file_bytes + len(chunk.data))
+                        with held_changed:
+                            # Wait for this batch's earlier files to be aggregated before turning it away
+                            while not self.admission.add_bytes(len(chunk.data)):
+                                if held_bytes == file_bytes:
+                                    raise AdmissionRejected('Server has too much upload data in flight, retry later')
+                                held_changed.wait()
+                            held_bytes += len(chunk.data)
+                        file_bytes += len(chunk.data)
+                        chunks.append(chunk.data)
+                submit(file_index, filename, chunks, file_bytes)
+            except (AdmissionRejected, UploadTooLarge) as e:
+                # Stop the workers and return the unsubmitted file's bytes
+                cancel_event.set()
+                chunks.clear()
+                release_file(file_bytes)
+                self.jobs.put(JobRecord(job_id=job_id, status='error', error=str(e)))
+                if isinstance(e, UploadTooLarge):
+                    rejected = self._reject_too_large(context, str(e))
+                else:
+                    rejected = self._reject_overloaded(context, str(e))
+                return sales_pb2.BatchUploadResponse(job_id=job_id, status=rejected.status, message=rejected.message)
+            except Exception as iter_error:
+                # Stop the workers; nothing is published for a partial batch
+                cancel_event.set()
+                chunks.clear()
+                release_file(file_bytes)
+                if context is not None and not context.is_active():
+                    logger.warning(f"Batch upload for job {job_id} aborted by client")
+                    self.jobs.put(JobRecord(job_id=job_id, status='cancelled', error='Upload aborted by client'))
+                    return sales_pb2.BatchUploadResponse(
+                        job_id=job_id,
+                        status='cancelled',
+                        message='Upload aborted by client'
+                    )
+                logger.error(f"Error receiving batch for job {job_id}: {str(iter_error)}", exc_info=True)
+                self.jobs.put(JobRecord(job_id=job_id, status='error', error=str(iter_error)))
+                return sales_pb2.BatchUploadResponse(
+                    job_id=job_id,
+                    status='error',
+                    message=f'Upload failed: {str(iter_error)}'
+                )
+            
+            response = sales_pb2.BatchUploadResponse(job_id=job_id)
+            # Phase times of the combined metrics are summed over files aggregated in parallel
+            merged = SalesAggregator(has_header=False, timings=PhaseTimings())
+            cancelled = False
+            for file_index, filename, future in files:
+                result = response.files.add(file_index=file_index, filename=filename)
+                try:
+                    aggregator, elapsed_ms = future.result()
+                except JobCancelled:
+                    cancelled = True
+                    continue
+                except Exception as e:
+                    result.status = 'error'
+                    result.error_message = str(e)
+                    logger.warning(f"Job {job_id}: file {file_index} ({filename}) failed: {str(e)}")
+                    continue
+                result.status = 'completed'
+                result.metrics.processing_time_ms = elapsed_ms
+                result.metrics.rows_processed = aggregator.rows_processed
+                result.metrics.rows_skipped = aggregator.rows_skipped
+                result.metrics.departments_count = len(aggregator.dept_counts)
+                aggregator.timings.fill(result.metrics)
+                merged.merge(aggregator)
+        finally:
+            executor.shutdown(wait=False)
+        
+        if cancelled or cancel_event.is_set():
+            self.jobs.put(JobRecord(job_id=job_id, status='cancelled', error='Job cancelled'))
+            response.status = 'cancelled'
+            response.message = 'Job cancelled'
+            return response
+        
+        completed = sum(1 for result in response.files if result.status == 'completed')
+        if not completed:
+            self.jobs.put(JobRecord(job_id=job_id, status='error', error='No file in the batch could be processed'))
+            response.status = 'error'
+            response.message = 'No file in the batch could be processed'
+            return response
+        
+        try:
+            output_filename = self._write_output(merged.dept_counts, merged.timings, job_id)
+        except Exception as e:
+            logger.error(f"Error writing output for job {job_id}: {str(e)}", exc_info=True)
+            self.jobs.put(JobRecord(job_id=job_id, status='error', error=str(e)))
+            response.status = 'error'
+            response.message = f'Upload failed: {str(e)}'
+            return response
+        
+        metrics = response.metrics
+        metrics.processing_time_ms = int((time.time() - start_time) * 1000)
+        metrics.rows_processed = merged.rows_processed
+        metrics.rows_skipped = merged.rows_skipped
+        metrics.departments_count = len(merged.dept_counts)
+        metrics.peak_memory_mb = max(0, int(process.memory_info().rss / 1024 / 1024 - initial_memory))
+        merged.timings.fill(metrics)
+        
+        download_url = self._publish_completed(job_id, first_chunk.filename, output_filename,
+                                               merged.dept_counts, metrics)
+        logger.info(f"Batch job {job_id} completed: {completed} of {len(response.files)} files "
+                    f"in {metrics.processing_time_ms}ms")
+        
+        response.status = 'completed'
+        response.message = f'{completed} of {len(response.files)} files processed'
+        response.download_url = download_url
+        return response
+    
+    @staticmethod
+    def _aggregate_batch_file(chunks: list, cancel_event: threading.Event, slots: threading.BoundedSemaphore):
+        """Aggregate one file of a batch and return (aggregator, elapsed ms); frees its buffer slot."""
+        try:
+            start = time.time()
+            aggregator = SalesAggregator(cancel_event=cancel_event, timings=PhaseTimings())
+            for index, chunk in enumerate(chunks):
+                chunks[index] = None
+                aggregator.feed(chunk)
+            aggregator.finish()
+            return aggregator, int((time.time() - start) * 1000)
+        finally:
+            chunks.clear()
+            slots.release()
+    
+    def GetDataset(self, request: sales_pb2.DatasetRequest, context) -> sales_pb2.DatasetResponse:
+        """Report a dataset's running totals with authentication, materializing its output on demand."""
+        name = request.name
+        
+        try:
+            self.auth_manager.require_auth(request.auth_token)
+        except PermissionError as e:
+            logger.warning(f"Unauthorized dataset request for {name}: {str(e)}")
+            return sales_pb2.DatasetResponse(name=name, status='unauthorized', error_message='Authentication failed')
+        
+        if not valid_dataset_name(name):
+            return sales_pb2.DatasetResponse(name=name, status='not_found')
+        
+        try:
+            result = self.datasets.materialize(name, self.output_dir)
+        except Exception as e:
+            logger.error(f"Error materializing dataset {name}: {str(e)}", exc_info=True)
+            return sales_pb2.DatasetResponse(name=name, status='error', error_message=str(e))
+        if result is None:
+            return sales_pb2.DatasetResponse(name=name, status='not_found')
+        
+        state, output_filename = result
+        response = sales_pb2.DatasetResponse(
+            name=name,
+            status='ok',
+            download_url=f"/processed/{output_filename}",
+            version=state['version'],
+            uploads=state['uploads']
+        )
+        response.metrics.rows_processed = state['rows_processed']
+        response.metrics.rows_skipped = state['rows_skipped']
+        response.metrics.rows_filtered = state.get('rows_filtered', 0)
+        response.metrics.departments_count = len(state['dept_counts'])
+        return response
+    
+    def QueryTotals(self, request: sales_pb2.QueryTotalsRequest, context) -> sales_pb2.QueryTotalsResponse:
+        """Sum department totals across completed jobs from the result index, with authentication."""
+        try:
+            self.auth_manager.require_auth(request.auth_token)
+        except PermissionError as e:
+            logger.warning(f"Unauthorized totals query: {str(e)}")
+            return sales_pb2.QueryTotalsResponse(status='unauthorized', error_message='Authentication failed')
+        
+        try:
+            rows, jobs_matched = self.result_index.query_totals(
+                departments=request.departments,
+                job_ids=request.job_ids,
+                since=request.since or None,
+                until=request.until or None
+            )
+        except Exception as e:
+            logger.error(f"Error querying result index: {str(e)}", exc_info=True)
+            return sales_pb2.QueryTotalsResponse(status='error', error_message=str(e))
+        
+        response = sales_pb2.QueryTotalsResponse(status='ok', jobs_matched=jobs_matched)
+        for department, total, job_count in rows:
+            response.totals.add(department=department, total=total, job_count=job_count)
+        return response
+    
+    def BeginUpload(self, request: sales_pb2.BeginUploadRequest, context) -> sales_pb2.UploadSessionStatus:
+        """Open a resumable upload session with authentication."""
+        try:
+            self.auth_manager.require_auth(request.auth_token)
+        except PermissionError as e:
+            logger.warning(f"Unauthorized upload session request: {str(e)}")
+            return sales_pb2.UploadSessionStatus(status='unauthorized')
+        
+        session_id = self.upload_spool.create(request.filename, request.total_size)
+        logger.info(f"Opened upload session {session_id} for {request.filename}")
+        return sales_pb2.UploadSessionStatus(
+            session_id=session_id,
+            status='receiving',
+            committed_offset=0,
+            total_size=request.total_size
+        )
+    
+    def ResumeUpload(self, request: sales_pb2.UploadSessionRequest, context) -> sales_pb2.UploadSessionStatus:
+        """Report a session's committed offset with authentication."""
+        session_id = request.session_id
+        
+        try:
+            self.auth_manager.require_auth(request.auth_token)
+        except PermissionError as e:
+            logger.warning(f"Unauthorized upload session status request for {session_id}: {str(e)}")
+            return sales_pb2.UploadSessionStatus(session_id=session_id, status='unauthorized')
+        
+        session = self.upload_spool.metadata(session_id)
+        if session is None:
+            return sales_pb2.UploadSessionStatus(session_id=session_id, status='not_found')
+        
+        # Spooled data is discarded after processing; completed sessions report their final size
+        if session['status'] == 'completed':
+            committed = session['size']
+        else:
+            committed = self.upload_spool.committed_offset(session_id)
+        
+        return sales_pb2.UploadSessionStatus(
+            session_id=session_id,
+            status=session['status'],
+            committed_offset=committed,
+            total_size=session['total_size'],
+            job_id=session['job_id']
+        )
     
     def GetJobStatus(self, request: sales_pb2.JobStatusRequest, context) -> sales_pb2.JobStatusResponse:
         """Get status of a processing job with authentication."""
@@ -157,190 +1097,427 @@ class SalesService(sales_pb2_grpc.SalesServiceServicer):
                 error_message='Authentication failed'
             )
         
-        with self.jobs_lock:
-            if job_id not in self.jobs:
-                return sales_pb2.JobStatusResponse(
-                    job_id=job_id,
-                    status='not_found'
-                )
-            
-            job = self.jobs[job_id]
-            
-            # Build response with metrics if available
-            response = sales_pb2.JobStatusResponse(
+        # Lock-free read of the job's current snapshot and its prebuilt response
+        job = self.jobs.get(job_id)
+        if job is None:
+            return sales_pb2.JobStatusResponse(
                 job_id=job_id,
-                status=job['status'],
-                download_url=job.get('download_url', ''),
-                error_message=job.get('error', '')
+                status='not_found'
             )
-            
-            # Initialize metrics (if field exists)
+        
+        return job.response
+    
+    def CancelJob(self, request: sales_pb2.CancelJobRequest, context) -> sales_pb2.JobStatusResponse:
+        """Request cancellation of a running job with authentication."""
+        job_id = request.job_id
+        
+        # Validate authentication
+        try:
+            self.auth_manager.require_auth(request.auth_token)
+        except PermissionError as e:
+            logger.warning(f"Unauthorized cancel attempt for job {job_id}: {str(e)}")
+            return sales_pb2.JobStatusResponse(
+                job_id=job_id,
+                status='unauthorized',
+                error_message='Authentication failed'
+            )
+        
+        job = self.jobs.get(job_id)
+        if job is None:
+            return sales_pb2.JobStatusResponse(
+                job_id=job_id,
+                status='not_found'
+            )
+        
+        # Finished jobs are reported as-is
+        if job.status in TERMINAL_STATUSES:
+            return job.response
+        
+        # Owned by another worker process: its watcher picks the request up from the shared store
+        if self.jobs.shared_store is not None and self.jobs.get_local(job_id) is None:
+            self.jobs.shared_store.request_cancel(job_id)
+            logger.info(f"Cancellation of job {job_id} forwarded to its owning worker")
+            return self.jobs.get(job_id).response
+        
+        if job.cancel_event is None:
+            return job.response
+        return self._cancel_local(job).response
+    
+    def _cancel_local(self, job: JobRecord) -> JobRecord:
+        """Signal cancellation of a job owned by this process and return its new snapshot."""
+        job_id = job.job_id
+        
+        # Processing thread notices at its next checkpoint and publishes 'cancelled'
+        job.cancel_event.set()
+        
+        # Sharded jobs have no processing thread; stop accepting parts and publish now
+        with self._sharded_lock:
+            upload = self._sharded.pop(job_id, None)
+        if upload is not None:
+            self.jobs.put(JobRecord(
+                job_id=job_id,
+                status='cancelled',
+                filename=upload.filename,
+                error='Job cancelled'
+            ))
+            logger.info(f"Sharded job {job_id} cancelled")
+            return self.jobs.get(job_id)
+        
+        logger.info(f"Cancellation requested for job {job_id}")
+        updated = self.jobs.update(job_id, require_status='processing', status='cancelling')
+        return updated or self.jobs.get(job_id)
+    
+    def _on_output_evicted(self, filename: str, job_id: str) -> None:
+        """Forget a job once its result has been evicted, so its status cannot point at a missing file."""
+        if job_id and self.jobs.pop(job_id) is not None:
+            logger.info(f"Job {job_id} expired with its result {filename}")
+    
+    def expire_sharded(self, now: Optional[float] = None) -> int:
+        """
+        Fail sharded jobs whose parts stopped arriving and free their partial totals.
+        
+        Returns:
+            Number of jobs failed
+        """
+        timeout = self.sharded_idle_timeout
+        with self._sharded_lock:
+            expired = [upload for upload in self._sharded.values() if upload.idle(timeout, now)]
+            for upload in expired:
+                del self._sharded[upload.job_id]
+        for upload in expired:
+            error = (f'Only {upload.received_count} of {upload.part_count} parts arrived '
+                     f'within {timeout:g}s of the previous part')
+            self.jobs.put(JobRecord(job_id=upload.job_id, status='error', filename=upload.filename, error=error))
+            logger.warning(f"Sharded job {upload.job_id} expired: {error}")
+        return len(expired)
+    
+    def _sweep_sharded(self) -> None:
+        """Expire idle sharded jobs, checking several times per timeout."""
+        interval = min(self.sharded_idle_timeout / 4, STORAGE_SWEEP_INTERVAL)
+        while True:
+            time.sleep(interval)
             try:
-                response.metrics.processing_time_ms = 0
-                response.metrics.rows_processed = 0
-                response.metrics.rows_skipped = 0
-                response.metrics.departments_count = 0
-                response.metrics.peak_memory_mb = 0
-                
-                # Add metrics if available
-                if job.get('metrics'):
-                    metrics = job['metrics']
-                    if isinstance(metrics, sales_pb2.ProcessingMetrics):
-                        response.metrics.CopyFrom(metrics)
-            except AttributeError:
-                # Metrics field not available - proto files need regeneration
-                pass
-            
-            return response
+                self.expire_sharded()
+            except Exception as e:
+                logger.warning(f"Sharded job sweep failed: {str(e)}")
     
-    def _process_csv_background(self, chunks: list, job_id: str, filename: Optional[str]) -> None:
-        """Process CSV in background thread with metrics tracking."""
+    def _watch_cancel_requests(self) -> None:
+        """Apply cancellations that other worker processes requested for this worker's jobs."""
+        while True:
+            time.sleep(CANCEL_POLL_INTERVAL)
+            try:
+                job_ids = self.jobs.shared_store.take_cancel_requests()
+            except Exception as e:
+                logger.warning(f"Could not read cancellation requests: {str(e)}")
+                continue
+            for job_id in job_ids:
+                job = self.jobs.get_local(job_id)
+                if job is not None and job.cancel_event is not None and job.status not in TERMINAL_STATUSES:
+                    self._cancel_local(job)
+    
+    def wait_for_jobs(self, timeout: float) -> bool:
+        """
+        Wait until no job accepted by this process is still running.
+        
+        Returns:
+            True if all jobs finished, False if the timeout expired first
+        """
+        deadline = time.time() + timeout
+        while any(job.status not in TERMINAL_STATUSES for job in self.jobs):
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+    
+    def _process_csv_background(self, chunks: list, job_id: str, filename: Optional[str],
+                                cancel_event: Optional[threading.Event] = None, dataset: str = '',
+                                timings: Optional[PhaseTimings] = None, profile: bool = False,
+                                columns: Optional[Dict[str, object]] = None,
+                                filters: Optional[RowFilter] = None, row_batches: bool = False,
+                                total_bytes: Optional[int] = None) -> None:
+        """
+        Process CSV in background thread with metrics tracking.
+        
+        timings, if given, already holds the receive phase; the time since it
+        was last charged counts as queue wait. With profile (or profile_jobs
+        set on the service) processing runs under cProfile; the profile is
+        saved in sharded storage whatever the outcome and its hot functions are
+        added to the metrics. columns maps fields to header names or indices
+        and filters selects the rows to aggregate (see SalesAggregator). With
+        row_batches, chunks holds RowBatch messages instead of CSV bytes. With
+        total_bytes, chunks may be any iterable of that many bytes (see _process_csv).
+        """
+        if timings is None:
+            timings = PhaseTimings()
+        else:
+            timings.lap('queue_wait')
+        self.jobs.take_lock_wait()
+        
         process = psutil.Process(os.getpid())
         initial_memory = process.memory_info().rss / 1024 / 1024  # MB
         
         start_time = time.time()
+        profiler = None
+        if profile or self.profile_jobs:
+            profiler = JobProfiler(self.storage.path_for(profile_filename(job_id)))
         
         try:
-            output_filename = self._process_csv(chunks, job_id)
+            process_args = (chunks, job_id, cancel_event, dataset, timings, columns, filters, row_batches,
+                            total_bytes)
+            if profiler is None:
+                output_filename, aggregator = self._process_csv(*process_args)
+            else:
+                with profiler:
+                    output_filename, aggregator = self._process_csv(*process_args)
             
-            # Generate download URL
-            download_url = f"/processed/{output_filename}"
+            # Cancelled after the last checkpoint: discard the result, unless it is
+            # already merged into a dataset (_process_csv made the final check then)
+            if not dataset and cancel_event is not None and cancel_event.is_set():
+                job = self.jobs.get(job_id)
+                self._remove_output(output_filename)
+                raise JobCancelled(job.rows_processed, job.rows_skipped, job.departments_count)
             
             # Calculate metrics
             processing_time_ms = int((time.time() - start_time) * 1000)
             peak_memory = process.memory_info().rss / 1024 / 1024  # MB
             
-            with self.jobs_lock:
-                job = self.jobs[job_id]
-                
-                # Create metrics object
-                metrics = sales_pb2.ProcessingMetrics()
-                metrics.processing_time_ms = processing_time_ms
-                metrics.rows_processed = job.get('rows_processed', 0)
-                metrics.rows_skipped = job.get('rows_skipped', 0)
-                metrics.departments_count = job.get('departments_count', 0)
-                metrics.peak_memory_mb = max(0, int(peak_memory - initial_memory))
-                
-                self.jobs[job_id] = {
-                    'status': 'completed',
-                    'download_url': download_url,
-                    'filename': output_filename,
-                    'metrics': metrics
-                }
+            job = self.jobs.get(job_id)
+            
+            # Create metrics object
+            metrics = sales_pb2.ProcessingMetrics()
+            metrics.processing_time_ms = processing_time_ms
+            metrics.rows_processed = job.rows_processed
+            metrics.rows_skipped = job.rows_skipped
+            metrics.rows_filtered = aggregator.rows_filtered
+            metrics.departments_count = job.departments_count
+            metrics.peak_memory_mb = max(0, int(peak_memory - initial_memory))
+            timings.add('lock_wait', self.jobs.take_lock_wait())
+            timings.fill(metrics)
+            if profiler is not None:
+                profiler.fill(metrics)
+            
+            self._publish_completed(job_id, filename, output_filename, aggregator.dept_counts, metrics)
             
             logger.info(f"Job {job_id} completed successfully in {processing_time_ms}ms")
             
+        except JobCancelled as e:
+            # Report partial metrics for the work done before the checkpoint
+            metrics = sales_pb2.ProcessingMetrics()
+            metrics.processing_time_ms = int((time.time() - start_time) * 1000)
+            metrics.rows_processed = e.rows_processed
+            metrics.rows_skipped = e.rows_skipped
+            metrics.rows_filtered = e.rows_filtered
+            metrics.departments_count = e.departments_count
+            timings.add('lock_wait', self.jobs.take_lock_wait())
+            timings.fill(metrics)
+            if profiler is not None:
+                profiler.fill(metrics)
+            
+            self.jobs.put(JobRecord(
+                job_id=job_id,
+                status='cancelled',
+                filename=filename,
+                error='Job cancelled',
+                metrics=metrics
+            ))
+            logger.info(f"Job {job_id} cancelled after {e.rows_processed} rows")
+            
         except Exception as e:
             logger.error(f"Error processing CSV for job {job_id}: {str(e)}", exc_info=True)
-            with self.jobs_lock:
-                self.jobs[job_id] = {
-                    'status': 'error',
-                    'error': str(e)
-                }
+            self.jobs.put(JobRecord(job_id=job_id, status='error', error=str(e)))
+        finally:
+            if profiler is not None:
+                self._track_output(profile_filename(job_id))
+    
+    def _process_admitted(self, chunks: list, job_id: str, filename: Optional[str],
+                          cancel_event: threading.Event, dataset: str, buffered_bytes: int,
+                          timings: Optional[PhaseTimings] = None, profile: bool = False,
+                          columns: Optional[Dict[str, object]] = None,
+                          filters: Optional[RowFilter] = None, row_batches: bool = False) -> None:
+        """Process an admitted upload, then release its admission."""
+        try:
+            self._process_csv_background(chunks, job_id, filename, cancel_event, dataset, timings, profile,
+                                         columns, filters, row_batches)
+        finally:
+            self.admission.release(buffered_bytes)
+    
+    def _process_session_background(self, session_id: str, job_id: str, filename: Optional[str],
+                                    cancel_event: threading.Event,
+                                    timings: Optional[PhaseTimings] = None) -> None:
+        """
+        Process a completed upload session's spooled data, then discard it.
+        
+        The spool is read back block by block as it is aggregated, so the
+        upload is never held in memory; read time is charged to receive.
+        """
+        if timings is None:
+            timings = PhaseTimings()
+        
+        def read_blocks():
+            blocks = self.upload_spool.iter_data(session_id)
+            while True:
+                with timings.measure('receive'):
+                    block = next(blocks, None)
+                if block is None:
+                    return
+                yield block
+        
+        try:
+            timings.lap('queue_wait')
+            total_bytes = self.upload_spool.committed_offset(session_id)
+            self._process_csv_background(read_blocks(), job_id, filename, cancel_event, timings=timings,
+                                         total_bytes=total_bytes)
+        finally:
+            self.upload_spool.discard_data(session_id)
     
-    def _process_csv(self, chunks: list, job_id: str) -> str:
+    def _publish_completed(self, job_id: str, filename: Optional[str], output_filename: str,
+                           dept_counts, metrics: sales_pb2.ProcessingMetrics) -> str:
+        """
+        Publish a job's completed record, index its totals and return the download URL.
+        
+        Index failures are logged and do not fail the job; the result file is
+        still the source of truth.
+        """
+        download_url = f"/processed/{output_filename}"
+        completed_at = time.time()
+        self.jobs.put(JobRecord(
+            job_id=job_id,
+            status='completed',
+            download_url=download_url,
+            filename=output_filename,
+            metrics=metrics,
+            rows_processed=metrics.rows_processed,
+            rows_skipped=metrics.rows_skipped,
+            departments_count=metrics.departments_count
+        ))
+        
+        try:
+            self.result_index.add_job(
+                job_id, filename, completed_at, dept_counts,
+                metrics.rows_processed, metrics.rows_skipped, metrics.processing_time_ms
+            )
+        except Exception as e:
+            logger.warning(f"Could not index results of job {job_id}: {str(e)}")
+        return download_url
+    
+    def _remove_output(self, output_filename: str) -> None:
+        """Delete a result file and its compressed sibling, if present."""
+        self.storage.remove(output_filename)
+    
+    def _track_output(self, filename: str, job_id: str = '') -> None:
+        """Register an output for eviction; failures are logged and never fail the job."""
+        try:
+            self.storage.register(filename, job_id)
+        except Exception as e:
+            logger.warning(f"Could not track output {filename}: {str(e)}")
+    
+    def _write_output(self, dept_counts, timings: Optional[PhaseTimings] = None, job_id: str = '') -> str:
+        """Stream sorted results straight to disk, publish atomically and return the filename."""
+        output_filename = f"{uuid4().hex}.csv"
+        output_path = self.storage.path_for(output_filename)
+        write_results_atomic(dept_counts, output_path, timings=timings)
+        if self.compress_output:
+            write_results_atomic(dept_counts, output_path + '.gz', compress=True, timings=timings)
+        self._track_output(output_filename, job_id)
+        return output_filename
+    
+    def _process_csv(self, chunks: Iterable, job_id: str, cancel_event: Optional[threading.Event] = None,
+                     dataset: str = '', timings: Optional[PhaseTimings] = None,
+                     columns: Optional[Dict[str, object]] = None,
+                     filters: Optional[RowFilter] = None,
+                     row_batches: bool = False,
+                     total_bytes: Optional[int] = None) -> Tuple[str, SalesAggregator]:
         """
         Process CSV chunks and write output.
         
-        CSV Format Expected:
+        Chunks are fed to a SalesAggregator one at a time and released as
+        soon as they are parsed, so the upload is never joined into a
+        single buffer. chunks is a list of buffered chunks, or, when
+        total_bytes gives the upload's size, any iterable of CSV blocks
+        (read lazily, e.g. from the upload spool). Large uploads publish an estimated preview in the
+        job record while they are processed (see build_preview).
+        
+        CSV Format Expected (columns can map the fields to other positions):
         - Column 1: Department Name (string)
         - Column 2: Date (ISO format: YYYY-MM-DD)
         - Column 3: Number of Sales (integer)
-        """
-        # Combine chunks into single buffer for processing
-        full_data = b''.join(chunks)
         
-        # Process CSV line-by-line to keep memory footprint low
-        dept_counts = defaultdict(int)
-        text_stream = io.TextIOWrapper(io.BytesIO(full_data), encoding='utf-8')
-        reader = csv.reader(text_stream)
+        Rows rejected by filters are dropped before validation and counted
+        in the aggregator's rows_filtered.
         
-        # Skip header row
-        try:
-            header = next(reader)
-            if len(header) < 3:
-                raise ValueError("CSV must have at least 3 columns: Department Name, Date, Number of Sales")
-        except StopIteration:
-            raise ValueError("CSV file is empty")
-        
-        rows_processed = 0
-        rows_skipped = 0
-        
-        # Process each data row
-        for row_num, row in enumerate(reader, start=2):  # Start at 2 since header is row 1
-            if not row or len(row) < 3:
-                rows_skipped += 1
-                logger.warning(f"Row {row_num}: Skipping malformed row (insufficient columns)")
-                continue
-            
-            try:
-                dept_name = row[0].strip()
-                date_str = row[1].strip()
-                sales_str = row[2].strip()
-                
-                # Validate department name
-                if not dept_name:
-                    rows_skipped += 1
-                    logger.warning(f"Row {row_num}: Skipping row with empty department name")
-                    continue
-                
-                # Validate date format (ISO format: YYYY-MM-DD)
-                try:
-                    datetime.strptime(date_str, '%Y-%m-%d')
-                except ValueError:
-                    rows_skipped += 1
-                    logger.warning(f"Row {row_num}: Invalid date format '{date_str}', expected YYYY-MM-DD")
-                    continue
-                
-                # Validate and parse number of sales
-                try:
-                    num_sales = int(sales_str)
-                    if num_sales < 0:
-                        rows_skipped += 1
-                        logger.warning(f"Row {row_num}: Negative sales value {num_sales}, skipping")
-                        continue
-                    
-                    # Aggregate sales by department
-                    dept_counts[dept_name] += num_sales
-                    rows_processed += 1
-                    
-                except ValueError:
-                    rows_skipped += 1
-                    logger.warning(f"Row {row_num}: Invalid sales value '{sales_str}', must be an integer")
-                    continue
-                    
-            except Exception as e:
-                rows_skipped += 1
-                logger.warning(f"Row {row_num}: Error processing row: {str(e)}")
-                continue
+        With row_batches, chunks are RowBatch messages whose columns are
+        aggregated directly (see SalesAggregator.feed_rows); sizes for
+        previews are their encoded sizes.
+        
+        If dataset is given, the upload's totals are also merged into that
+        dataset's stored aggregates. The merge comes after the output is
+        written and after the last cancellation checkpoint, so a job whose
+        rows reached the dataset is never reported cancelled or failed.
+        
+        Time spent in each phase is added to timings, if given.
         
-        logger.info(f"Job {job_id}: Processed {rows_processed} rows, skipped {rows_skipped} invalid rows")
+        Returns:
+            (output filename, the finished aggregator)
         
-        # Write output CSV to bytes buffer
-        output_buffer = io.BytesIO()
-        text_writer = io.TextIOWrapper(output_buffer, encoding='utf-8')
-        writer = csv.writer(text_writer)
+        Raises:
+            JobCancelled: If cancel_event is set (checked every CANCEL_CHECK_INTERVAL rows)
+        """
+        if timings is None:
+            timings = PhaseTimings()
+        aggregator = SalesAggregator(has_header=not row_batches, cancel_event=cancel_event, timings=timings,
+                                     columns=columns, row_filter=filters)
         
-        writer.writerow(['Department Name', 'Total Number of Sales'])
+        # Previews are checked per chunk, never per row, so they cost nothing on the row path
+        buffered = total_bytes is None
+        if buffered:
+            sizes = [chunk.ByteSize() for chunk in chunks] if row_batches else [len(chunk) for chunk in chunks]
+            total_bytes = sum(sizes)
+        next_preview = self.preview_bytes if 0 < 2 * self.preview_bytes <= total_bytes else None
+        try:
+            for index, chunk in enumerate(chunks):
+                if buffered:
+                    chunks[index] = None
+                if row_batches:
+                    aggregator.feed_rows(chunk.departments, chunk.department_ids, chunk.days, chunk.sales,
+                                         sizes[index])
+                else:
+                    aggregator.feed(chunk)
+                if next_preview is not None and aggregator.bytes_received >= next_preview:
+                    with timings.measure('preview'):
+                        self.jobs.update(job_id, require_status='processing',
+                                         preview=build_preview(aggregator, total_bytes))
+                    next_preview = next_preview * 2 if next_preview * 2 < total_bytes else None
+            aggregator.finish()
+        finally:
+            # Release buffered upload data, including on cancellation
+            if buffered:
+                chunks.clear()
         
-        # Sort alphabetically for consistent output
-        for dept in sorted(dept_counts.keys()):
-            writer.writerow([dept, dept_counts[dept]])
+        logger.info(f"Job {job_id}: Processed {aggregator.rows_processed} rows, "
+                    f"skipped {aggregator.rows_skipped} invalid rows, filtered {aggregator.rows_filtered}")
         
-        text_writer.flush()
-        output_data = output_buffer.getvalue()
+        output_filename = self._write_output(aggregator.dept_counts, timings, job_id)
         
-        # Save to local filesystem
-        output_filename = f"{uuid4().hex}.csv"
-        output_path = os.path.join(self.output_dir, output_filename)
-        with open(output_path, 'wb') as f:
-            f.write(output_data)
+        if dataset:
+            # Last checkpoint before the upload becomes part of the dataset's history; the
+            # merge is the final step, so a merged upload always completes
+            try:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise JobCancelled(aggregator.rows_processed, aggregator.rows_skipped,
+                                       len(aggregator.dept_counts), aggregator.rows_filtered)
+                with timings.measure('merge'):
+                    state = self.datasets.merge(dataset, aggregator)
+            except BaseException:
+                self._remove_output(output_filename)
+                raise
+            logger.info(f"Job {job_id}: merged into dataset {dataset} (version {state['version']})")
         
         # Store metrics in job
-        with self.jobs_lock:
-            if job_id in self.jobs:
-                self.jobs[job_id]['rows_processed'] = rows_processed
-                self.jobs[job_id]['rows_skipped'] = rows_skipped
-                self.jobs[job_id]['departments_count'] = len(dept_counts)
+        self.jobs.update(
+            job_id,
+            rows_processed=aggregator.rows_processed,
+            rows_skipped=aggregator.rows_skipped,
+            departments_count=len(aggregator.dept_counts)
+        )
         
-        return output_filename
+        return output_filename, aggregator
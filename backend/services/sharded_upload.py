@@ -0,0 +1,90 @@
+"""
+Tracking for jobs uploaded as several concurrent, newline-aligned parts.
+
+Parts are tracked in the memory of the process that opened the job, so in
+multi-process mode all of a job's streams must reach the same worker.
+"""
+import threading
+import time
+from typing import Optional
+
+from utils.csv_processor import SalesAggregator
+from utils.phase_timing import PhaseTimings
+
+# Upper bound on parts per sharded job
+MAX_UPLOAD_PARTS = 64
+
+
+class ShardedUpload:
+    """Partial aggregates of one job whose parts arrive on separate streams."""
+    
+    def __init__(self, job_id: str, filename: Optional[str], part_count: int):
+        """
+        Initialize sharded upload.
+        
+        Args:
+            job_id: Job the parts belong to
+            filename: Original filename of the upload
+            part_count: Number of parts that will be uploaded
+        """
+        self.job_id = job_id
+        self.filename = filename
+        self.part_count = part_count
+        self.start_time = time.time()
+        self.last_activity = self.start_time
+        
+        # Running totals; each part is folded in as soon as it lands
+        self.merged = SalesAggregator(has_header=False, timings=PhaseTimings())
+        self._received = set()
+        self._in_flight = set()
+        self._lock = threading.Lock()
+    
+    def claim(self, part_index: int) -> Optional[str]:
+        """
+        Reserve a part for one upload stream.
+        
+        Returns:
+            An error message if the part cannot be accepted, otherwise None
+        """
+        if not 0 <= part_index < self.part_count:
+            return f"Part index {part_index} out of range for {self.part_count} parts"
+        with self._lock:
+            if part_index in self._received:
+                return f"Part {part_index} already received"
+            if part_index in self._in_flight:
+                return f"Part {part_index} is already being uploaded"
+            self._in_flight.add(part_index)
+            self.last_activity = time.time()
+        return None
+    
+    def release(self, part_index: int) -> None:
+        """Give up a claimed part (e.g. its stream failed) so it can be retried."""
+        with self._lock:
+            self._in_flight.discard(part_index)
+            self.last_activity = time.time()
+    
+    @property
+    def received_count(self) -> int:
+        """Number of parts merged so far."""
+        with self._lock:
+            return len(self._received)
+    
+    def idle(self, timeout: float, now: Optional[float] = None) -> bool:
+        """Return True if no part is streaming and none started or ended for timeout seconds."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return not self._in_flight and now - self.last_activity >= timeout
+    
+    def add(self, part_index: int, aggregator: SalesAggregator) -> bool:
+        """
+        Merge a finished part's totals.
+        
+        Returns:
+            True if this was the last outstanding part
+        """
+        with self._lock:
+            self._in_flight.discard(part_index)
+            self._received.add(part_index)
+            self.last_activity = time.time()
+            self.merged.merge(aggregator)
+            return len(self._received) == self.part_count
@@ -0,0 +1,151 @@
+"""
+SQLite-backed job state shared by the worker processes of one server.
+
+Each worker keeps its own JobRegistry for the jobs it accepted and writes
+every snapshot through to this store, so any worker can answer
+GetJobStatus for any job. Cancellation of a job owned by another worker is
+requested through the store and picked up by the owner's watcher thread.
+
+Rows are owned by a worker generation: a random id chosen each time a
+worker starts, so a restarted worker (or an unrelated process reusing a
+pid) never inherits the jobs of the one it replaced. The supervisor fails
+the unfinished jobs of a generation once its worker has exited.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+from proto import sales_pb2
+from services.job_registry import JobRecord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    status TEXT NOT NULL,
+    response BLOB NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_cancel ON jobs (owner, cancel_requested);
+"""
+
+
+class SharedJobStore:
+    """Job snapshots visible to every process using the same database file."""
+    
+    def __init__(self, db_path: str = "storage/jobs.db", owner: Optional[str] = None):
+        """
+        Initialize shared job store.
+        
+        Args:
+            db_path: SQLite database file shared by all workers
+            owner: Generation id of this worker (defaults to a new random id)
+        """
+        self.db_path = db_path
+        self.owner = owner if owner is not None else uuid.uuid4().hex
+        self._local = threading.local()
+        
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def save(self, record: JobRecord) -> None:
+        """Publish a snapshot owned by this worker."""
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT INTO jobs (job_id, owner, status, response, updated_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(job_id) DO UPDATE SET owner = excluded.owner, status = excluded.status, '
+                'response = excluded.response, updated_at = excluded.updated_at',
+                (record.job_id, self.owner, record.status, record.response.SerializeToString(), time.time())
+            )
+    
+    def load(self, job_id: str) -> Optional[JobRecord]:
+        """Return the latest snapshot of a job published by any worker."""
+        row = self._connection().execute(
+            'SELECT status, response FROM jobs WHERE job_id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        status, blob = row
+        response = sales_pb2.JobStatusResponse.FromString(blob)
+        return JobRecord(
+            job_id=job_id,
+            status=status,
+            download_url=response.download_url,
+            error=response.error_message,
+            metrics=response.metrics if response.HasField('metrics') else None,
+            preview=response.preview if response.HasField('preview') else None
+        )
+    
+    def delete(self, job_id: str) -> None:
+        """Remove a job's snapshot."""
+        with self._connection() as conn:
+            conn.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+    
+    def request_cancel(self, job_id: str) -> bool:
+        """
+        Ask the owning worker to cancel a processing job.
+        
+        Returns:
+            True if the job was processing and is now marked 'cancelling'
+        """
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, status = 'cancelling', updated_at = ? "
+                "WHERE job_id = ? AND status = 'processing'",
+                (time.time(), job_id)
+            )
+            return cursor.rowcount > 0
+    
+    def take_cancel_requests(self) -> List[str]:
+        """Return and clear the cancellation requests for jobs owned by this worker."""
+        with self._connection() as conn:
+            job_ids = [row[0] for row in conn.execute(
+                'SELECT job_id FROM jobs WHERE owner = ? AND cancel_requested = 1', (self.owner,)
+            )]
+            if job_ids:
+                conn.executemany('UPDATE jobs SET cancel_requested = 0 WHERE job_id = ?',
+                                 [(job_id,) for job_id in job_ids])
+            return job_ids
+    
+    def fail_owner(self, owner: str, message: str) -> int:
+        """
+        Mark the unfinished jobs of an exited worker generation as failed.
+        
+        Args:
+            owner: Generation id of the worker that exited
+            message: Error reported to clients polling those jobs
+        
+        Returns:
+            Number of jobs marked 'error'
+        """
+        with self._connection() as conn:
+            job_ids = [row[0] for row in conn.execute(
+                "SELECT job_id FROM jobs WHERE owner = ? AND status IN ('processing', 'cancelling')", (owner,)
+            )]
+            for job_id in job_ids:
+                response = sales_pb2.JobStatusResponse(job_id=job_id, status='error', error_message=message)
+                response.metrics.SetInParent()
+                conn.execute(
+                    "UPDATE jobs SET status = 'error', response = ?, cancel_requested = 0, updated_at = ? "
+                    "WHERE job_id = ? AND owner = ? AND status IN ('processing', 'cancelling')",
+                    (response.SerializeToString(), time.time(), job_id, owner)
+                )
+            return len(job_ids)
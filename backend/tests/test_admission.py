@@ -0,0 +1,78 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.admission import AdmissionController
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def test_unlimited_by_default(self):
+        """Test a controller without limits admits everything."""
+        admission = AdmissionController()
+        for _ in range(100):
+            self.assertTrue(admission.try_acquire())
+            self.assertTrue(admission.add_bytes(1 << 30))
+        self.assertFalse(admission.overloaded())
+    
+    def test_active_job_limit(self):
+        """Test uploads beyond the active job limit are rejected until one ends."""
+        admission = AdmissionController(max_active_jobs=2)
+        self.assertTrue(admission.try_acquire())
+        self.assertTrue(admission.try_acquire())
+        self.assertFalse(admission.try_acquire())
+        self.assertTrue(admission.overloaded())
+        
+        admission.release(0)
+        self.assertFalse(admission.overloaded())
+        self.assertTrue(admission.try_acquire())
+    
+    def test_inflight_byte_limit(self):
+        """Test data crossing the byte limit is refused and new uploads wait for it to drain."""
+        admission = AdmissionController(max_inflight_bytes=100)
+        self.assertTrue(admission.try_acquire())
+        self.assertTrue(admission.add_bytes(60))
+        self.assertFalse(admission.add_bytes(50))
+        self.assertEqual(admission.inflight_bytes, 60)
+        self.assertTrue(admission.add_bytes(40))
+        
+        # Full: the next upload is turned away before sending anything
+        self.assertTrue(admission.overloaded())
+        self.assertFalse(admission.try_acquire())
+        
+        admission.release(100)
+        self.assertEqual((admission.active_jobs, admission.inflight_bytes), (0, 0))
+        self.assertTrue(admission.try_acquire())
+    
+    def test_exceeds_limit_and_release_bytes(self):
+        """Test uploads bigger than the byte limit are recognized and bytes can be returned early."""
+        admission = AdmissionController(max_inflight_bytes=100)
+        self.assertTrue(admission.exceeds_limit(101))
+        self.assertFalse(admission.exceeds_limit(100))
+        self.assertFalse(AdmissionController().exceeds_limit(1 << 40))
+        
+        self.assertTrue(admission.try_acquire())
+        self.assertTrue(admission.add_bytes(100))
+        self.assertTrue(admission.overloaded())
+        admission.release_bytes(100)
+        self.assertFalse(admission.overloaded())
+        self.assertEqual((admission.active_jobs, admission.inflight_bytes), (1, 0))
+    
+    def test_listeners_notified_on_change(self):
+        """Test listeners see each transition into and out of overload once."""
+        admission = AdmissionController(max_active_jobs=1)
+        changes = []
+        admission.add_listener(changes.append)
+        
+        admission.try_acquire()
+        admission.try_acquire()
+        admission.add_bytes(10)
+        admission.release(10)
+        
+        self.assertEqual(changes, [True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
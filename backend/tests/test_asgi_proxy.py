@@ -0,0 +1,253 @@
+import unittest
+import gzip
+import json
+import os
+import sys
+import tempfile
+import logging
+from concurrent import futures
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Configure logging for tests
+logging.basicConfig(level=logging.WARNING)
+
+import asgi_proxy
+import http_proxy
+from proto import sales_pb2_grpc
+from services.sales_service import SalesService
+from utils.csv_processor import write_results_atomic
+
+SAMPLE_CSV = b'Department Name,Date,Number of Sales\nElectronics,2024-01-01,100\nBooks,2024-01-02,50\n'
+
+
+async def call(method: str, path: str, body: bytes = b'', headers=(), query: str = '', piece_size: int = 7):
+    """
+    Run one request through the ASGI app.
+    
+    The body is delivered in piece_size messages, like a slow client.
+    
+    Returns:
+        (status, {lower-case header: value}, body)
+    """
+    pieces = [body[i:i + piece_size] for i in range(0, len(body), piece_size)] or [b'']
+    messages = [
+        {'type': 'http.request', 'body': piece, 'more_body': index < len(pieces) - 1}
+        for index, piece in enumerate(pieces)
+    ]
+    sent = []
+    
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+    
+    async def send(message):
+        sent.append(message)
+    
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query.encode('latin-1'),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    }
+    await asgi_proxy.app(scope, receive, send)
+    
+    start = sent[0]
+    response_headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in start['headers']}
+    return start['status'], response_headers, b''.join(m.get('body', b'') for m in sent[1:])
+
+
+class TestAsgiUpload(unittest.IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        cls.service = SalesService(
+            output_dir=cls.tmp_dir.name,
+            spool_dir=os.path.join(cls.tmp_dir.name, 'uploads'),
+            dataset_dir=os.path.join(cls.tmp_dir.name, 'datasets'),
+            index_path=os.path.join(cls.tmp_dir.name, 'results.db')
+        )
+        sales_pb2_grpc.add_SalesServiceServicer_to_server(cls.service, cls.server)
+        port = cls.server.add_insecure_port('127.0.0.1:0')
+        cls.server.start()
+        cls.original_server = http_proxy.GRPC_SERVER
+        http_proxy.GRPC_SERVER = f'127.0.0.1:{port}'
+        cls.original_dir = http_proxy.PROCESSED_DIR
+        http_proxy.PROCESSED_DIR = cls.tmp_dir.name
+    
+    @classmethod
+    def tearDownClass(cls):
+        http_proxy.GRPC_SERVER = cls.original_server
+        http_proxy.PROCESSED_DIR = cls.original_dir
+        cls.server.stop(0)
+        cls.service.result_index.close()
+        cls.tmp_dir.cleanup()
+    
+    async def asyncTearDown(self):
+        await asgi_proxy.close_channels()
+    
+    async def test_raw_upload_and_status(self):
+        """Test a raw body is streamed to gRPC and the job's status served."""
+        status, _, body = await call('POST', '/api/upload', SAMPLE_CSV, [('Content-Type', 'text/csv')])
+        self.assertEqual(status, 200)
+        job_id = json.loads(body)['job_id']
+        self.service.wait_for_jobs(5)
+        
+        status, _, body = await call('GET', f'/api/status/{job_id}')
+        result = json.loads(body)
+        self.assertEqual(result['status'], 'completed')
+        self.assertEqual(result['metrics']['rows_processed'], 2)
+        
+        status, headers, head_body = await call('HEAD', f'/api/status/{job_id}')
+        self.assertEqual((status, head_body), (200, b''))
+        self.assertEqual(headers['content-length'], str(len(body)))
+    
+    async def test_multipart_upload_with_options(self):
+        """Test multipart file fields are extracted incrementally and query options forwarded."""
+        body = (
+            b'--XyZ\r\nContent-Disposition: form-data; name="note"\r\n\r\nhello\r\n'
+            b'--XyZ\r\nContent-Disposition: form-data; name="file"; filename="sales.csv"\r\n'
+            b'Content-Type: text/csv\r\n\r\n' + SAMPLE_CSV + b'\r\n--XyZ--\r\n'
+        )
+        status, _, response = await call('POST', '/api/upload', body,
+                                         [('Content-Type', 'multipart/form-data; boundary=XyZ')],
+                                         query='department=Books')
+        self.assertEqual(status, 200)
+        self.service.wait_for_jobs(5)
+        
+        _, _, response = await call('GET', f'/api/status/{json.loads(response)["job_id"]}')
+        metrics = json.loads(response)['metrics']
+        self.assertEqual((metrics['rows_processed'], metrics['rows_filtered']), (1, 1))
+    
+    async def test_upload_errors(self):
+        """Test unsupported bodies and missing files are rejected before reaching gRPC."""
+        status, _, _ = await call('POST', '/api/upload', b'{}', [('Content-Type', 'application/json')])
+        self.assertEqual(status, 415)
+        
+        body = b'--XyZ\r\nContent-Disposition: form-data; name="note"\r\n\r\nhello\r\n--XyZ--\r\n'
+        status, _, _ = await call('POST', '/api/upload', body, [('Content-Type', 'multipart/form-data; boundary=XyZ')])
+        self.assertEqual(status, 400)
+        
+        status, _, _ = await call('GET', '/api/upload')
+        self.assertEqual(status, 405)
+        status, _, _ = await call('GET', '/api/unknown')
+        self.assertEqual(status, 404)
+    
+    async def test_client_disconnect_sends_no_response(self):
+        """Test an upload whose client goes away mid-body is abandoned without a response."""
+        for content_type, body in (('text/csv', SAMPLE_CSV),
+                                   ('multipart/form-data; boundary=XyZ', b'--XyZ\r\nContent-Disp')):
+            with self.subTest(content_type=content_type):
+                messages = [{'type': 'http.request', 'body': body[:20], 'more_body': True},
+                            {'type': 'http.disconnect'}]
+                sent = []
+                
+                async def receive():
+                    return messages.pop(0)
+                
+                async def send(message):
+                    sent.append(message)
+                
+                scope = {'type': 'http', 'method': 'POST', 'path': '/api/upload', 'query_string': b'',
+                         'headers': [(b'content-type', content_type.encode('latin-1'))]}
+                await asgi_proxy.app(scope, receive, send)
+                self.assertEqual(sent, [])
+    
+    async def test_upload_at_capacity_returns_503(self):
+        """Test uploads rejected by admission control map to 503 with Retry-After."""
+        admission = self.service.admission
+        admission.max_active_jobs, admission.retry_after_ms = 1, 2500
+        self.assertTrue(admission.try_acquire())
+        try:
+            status, headers, _ = await call('POST', '/api/upload', SAMPLE_CSV, [('Content-Type', 'text/csv')])
+        finally:
+            admission.release(0)
+            admission.max_active_jobs = 0
+        
+        self.assertEqual(status, 503)
+        self.assertEqual(headers['retry-after'], '3')
+    
+    async def test_upload_over_byte_limit_returns_413(self):
+        """Test uploads larger than the in-flight byte limit map to 413 without Retry-After."""
+        admission = self.service.admission
+        admission.max_inflight_bytes = 16
+        try:
+            status, headers, _ = await call('POST', '/api/upload', SAMPLE_CSV, [('Content-Type', 'text/csv')])
+        finally:
+            admission.max_inflight_bytes = 0
+        
+        self.assertEqual(status, 413)
+        self.assertNotIn('retry-after', headers)
+    
+    async def test_invalid_row_filter_returns_400(self):
+        """Test an unusable filter is rejected with 400 and the server's validation message."""
+        status, _, body = await call('POST', '/api/upload', SAMPLE_CSV, [('Content-Type', 'text/csv')],
+                                     query='date_from=March')
+        
+        self.assertEqual(status, 400)
+        self.assertIn(b'March', body)
+
+
+class TestAsgiDownload(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.original_dir = http_proxy.PROCESSED_DIR
+        http_proxy.PROCESSED_DIR = self.tmp_dir.name
+        
+        self.dept_counts = {f'Department {i}': i for i in range(100)}
+        self.result_path = http_proxy._get_storage().path_for('result.csv')
+        write_results_atomic(self.dept_counts, self.result_path)
+    
+    def tearDown(self):
+        http_proxy.PROCESSED_DIR = self.original_dir
+        self.tmp_dir.cleanup()
+    
+    async def test_download_and_conditional_get(self):
+        """Test sharded results are served with caching headers and revalidated with 304."""
+        status, headers, body = await call('GET', '/processed/result.csv')
+        self.assertEqual(status, 200)
+        with open(self.result_path, 'rb') as f:
+            self.assertEqual(body, f.read())
+        self.assertIn('immutable', headers['cache-control'])
+        self.assertEqual(headers['content-length'], str(len(body)))
+        
+        status, _, body = await call('GET', '/processed/result.csv', headers=[('If-None-Match', headers['etag'])])
+        self.assertEqual((status, body), (304, b''))
+    
+    async def test_range_request(self):
+        """Test byte ranges return partial content, and unsatisfiable ones 416."""
+        status, headers, body = await call('GET', '/processed/result.csv', headers=[('Range', 'bytes=0-9')])
+        self.assertEqual((status, body), (206, b'Department'))
+        self.assertTrue(headers['content-range'].startswith('bytes 0-9/'))
+        
+        status, _, _ = await call('GET', '/processed/result.csv', headers=[('Range', 'bytes=100000-')])
+        self.assertEqual(status, 416)
+    
+    async def test_gzip_sibling_and_large_file(self):
+        """Test the gzip sibling is served to gzip clients and large files arrive whole."""
+        self.dept_counts = {f'Department {i}': i for i in range(50000)}
+        write_results_atomic(self.dept_counts, self.result_path)
+        write_results_atomic(self.dept_counts, self.result_path + '.gz', compress=True)
+        
+        _, _, plain = await call('GET', '/processed/result.csv')
+        status, headers, encoded = await call('GET', '/processed/result.csv', headers=[('Accept-Encoding', 'gzip')])
+        
+        self.assertGreater(len(plain), asgi_proxy.DOWNLOAD_BLOCK_SIZE)
+        self.assertEqual(headers['content-encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(encoded), plain)
+    
+    async def test_invalid_and_missing_files(self):
+        """Test non-CSV names are rejected and unknown results are 404."""
+        status, _, _ = await call('GET', '/processed/result.txt')
+        self.assertEqual(status, 400)
+        status, _, _ = await call('GET', '/processed/missing.csv')
+        self.assertEqual(status, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ import io
 import os
 import sys
 import tempfile
+import gzip
 import logging
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -10,7 +11,11 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 # Configure logging for tests
 logging.basicConfig(level=logging.WARNING)
 
-from utils.csv_processor import aggregate_sales_from_stream, write_output_csv
+from utils.csv_processor import (
+    MAX_DAY, RowFilter, SalesAggregator, aggregate_sales_from_stream, day_number, resolve_columns,
+    write_output_csv, write_results_atomic
+)
+from utils.phase_timing import PhaseTimings
 
 
 class TestCSVProcessor(unittest.TestCase):
@@ -145,6 +150,238 @@ class TestCSVProcessor(unittest.TestCase):
             if os.path.exists(output_path):
                 os.unlink(output_path)
 
+    
+    def test_write_results_atomic_leaves_no_temp_files(self):
+        """Test atomic writer publishes only the final file."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            output_path = os.path.join(output_dir, 'result.csv')
+            write_results_atomic({'Books': 2, 'Apparel': 1}, output_path)
+            
+            self.assertEqual(os.listdir(output_dir), ['result.csv'])
+            with open(output_path, 'rb') as f:
+                self.assertEqual(
+                    f.read(),
+                    b'Department Name,Total Number of Sales\r\nApparel,1\r\nBooks,2\r\n'
+                )
+    
+    def test_write_results_atomic_gzip(self):
+        """Test gzip-compressed output matches the plain output."""
+        dept_counts = {'Electronics': 500, 'Clothing': 300}
+        
+        with tempfile.TemporaryDirectory() as output_dir:
+            plain_path = os.path.join(output_dir, 'result.csv')
+            gzip_path = plain_path + '.gz'
+            write_results_atomic(dept_counts, plain_path)
+            write_results_atomic(dept_counts, gzip_path, compress=True)
+            
+            with open(plain_path, 'rb') as f, gzip.open(gzip_path, 'rb') as g:
+                self.assertEqual(f.read(), g.read())
+    
+    def test_aggregator_chunk_boundaries(self):
+        """Test rows split across chunks are aggregated exactly once."""
+        csv_data = (
+            'Department Name,Date,Number of Sales\n'
+            'Électronique,2024-01-01,100\n'
+            'Clothing,2024-01-01,200\n'
+            'Électronique,2024-01-02,150'
+        ).encode('utf-8')
+        
+        for chunk_size in (1, 2, 7, len(csv_data)):
+            aggregator = SalesAggregator()
+            for offset in range(0, len(csv_data), chunk_size):
+                aggregator.feed(csv_data[offset:offset + chunk_size])
+            aggregator.finish()
+            
+            self.assertEqual(dict(aggregator.dept_counts), {'Électronique': 250, 'Clothing': 200})
+            self.assertEqual(aggregator.rows_processed, 3)
+            self.assertEqual(aggregator.bytes_received, len(csv_data))
+    
+    def test_aggregator_quoted_newline_across_chunks(self):
+        """Test a quoted field containing newlines survives every chunk split."""
+        csv_data = (
+            b'Department Name,Date,Number of Sales\n'
+            b'"Home\nGarden",2024-01-01,5\n'
+            b'Books,2024-01-01,2\n'
+            b'"Say ""hi""\n\nthere",2024-01-02,3\n'
+        )
+        
+        for split in range(1, len(csv_data)):
+            aggregator = SalesAggregator()
+            aggregator.feed(csv_data[:split])
+            aggregator.feed(csv_data[split:])
+            aggregator.finish()
+            
+            self.assertEqual(dict(aggregator.dept_counts),
+                             {'Home\nGarden': 5, 'Books': 2, 'Say "hi"\n\nthere': 3}, f'split at {split}')
+            self.assertEqual(aggregator.rows_skipped, 0)
+    
+    def test_aggregator_merge_parts(self):
+        """Test merged part totals match aggregating the whole file."""
+        head = SalesAggregator()
+        head.feed(b'Department Name,Date,Number of Sales\nBooks,2024-01-01,5\nToys,bad-date,1\n')
+        head.finish()
+        
+        tail = SalesAggregator(has_header=False)
+        tail.feed(b'Books,2024-01-02,7\nToys,2024-01-02,3\n')
+        tail.finish()
+        
+        head.merge(tail)
+        self.assertEqual(dict(head.dept_counts), {'Books': 12, 'Toys': 3})
+        self.assertEqual(head.rows_processed, 3)
+        self.assertEqual(head.rows_skipped, 1)
+    
+    def test_phase_timings(self):
+        """Test aggregation and output charge their time to the matching phases."""
+        timings = PhaseTimings()
+        aggregator = SalesAggregator(timings=timings)
+        aggregator.feed(b'Department Name,Date,Number of Sales\nBooks,2024-01-01,5\n')
+        aggregator.feed(b'Toys,2024-01-02,3\n')
+        aggregator.finish()
+        self.assertEqual(set(timings.seconds), {'decode', 'parse'})
+        
+        with tempfile.TemporaryDirectory() as output_dir:
+            write_results_atomic(aggregator.dept_counts, os.path.join(output_dir, 'result.csv'), timings=timings)
+        self.assertEqual(set(timings.seconds), {'decode', 'parse', 'sort', 'write'})
+        self.assertTrue(all(seconds >= 0 for seconds in timings.seconds.values()))
+        
+        # Row batches report validation and sums as parse too; folding parts is merge
+        part = SalesAggregator(has_header=False, timings=PhaseTimings())
+        part.feed_rows(['Books'], [0], [19723], [2])
+        self.assertEqual(set(part.timings.seconds), {'parse'})
+        aggregator.merge(part)
+        self.assertEqual(set(timings.seconds), {'decode', 'parse', 'merge', 'sort', 'write'})
+    
+    def test_resolve_columns(self):
+        """Test fields resolve by exact name, case-insensitive name or index."""
+        header = ['Region', 'Dept', 'Day', 'Units', 'Revenue']
+        self.assertEqual(
+            resolve_columns(header, {'department': 'Dept', 'date': 'day', 'sales': 3}),
+            (1, 2, 3)
+        )
+        self.assertEqual(resolve_columns(header, None), (0, 1, 2))
+        
+        for columns in ({'sales': 'Profit'}, {'sales': 9}, {'sales': -1}):
+            with self.assertRaises(ValueError):
+                resolve_columns(header, columns)
+    
+    def test_aggregator_mapped_columns(self):
+        """Test wide files aggregate the mapped columns, on both parse paths."""
+        rows = [
+            'Region,Dept,Day,Units,Revenue',
+            'North,Books,2024-01-01,5,99.5',
+            'South,Toys,2024-01-01,3,10',
+            'North,Books,2024-01-02,7,1',
+        ]
+        for text in ('\n'.join(rows), '\r\n'.join(rows), '\n'.join(rows + ['"East, Inc.","Toys",2024-01-03,2,"1,000"'])):
+            aggregator = SalesAggregator(columns={'department': 'Dept', 'date': 'Day', 'sales': 'Units'})
+            aggregator.feed(text.encode('utf-8'))
+            aggregator.finish()
+            
+            expected_toys = 5 if 'East' in text else 3
+            self.assertEqual(dict(aggregator.dept_counts), {'Books': 12, 'Toys': expected_toys})
+    
+    def test_aggregator_mapped_columns_short_row(self):
+        """Test rows missing a mapped column are skipped."""
+        aggregator = SalesAggregator(columns={'department': 0, 'date': 1, 'sales': 4})
+        aggregator.feed(b'a,b,c,d,e\nBooks,2024-01-01,x,x,5\nToys,2024-01-01,3\n')
+        aggregator.finish()
+        self.assertEqual(dict(aggregator.dept_counts), {'Books': 5})
+        self.assertEqual(aggregator.rows_skipped, 1)
+    
+    def test_row_filter(self):
+        """Test filtered rows are counted apart from skipped rows and never validated."""
+        csv_data = (
+            b'Department Name,Date,Number of Sales\n'
+            b'Books,2023-12-31,1\n'
+            b'Books,2024-01-01,2\n'
+            b'Toys,2024-02-15,4\n'
+            b'Games,2024-03-31,8\n'
+            b'Books,2024-04-01,16\n'
+            b'Toys,2024-02-30x,oops\n'
+            b'Books,2024-03-01,bad\n'
+            b'Games,2024-1-5,32\n'
+            b'Games,2024-4-1,64\n'
+        )
+        cases = [
+            (RowFilter(date_from='2024-01-01', date_to='2024-03-31'), {'Books': 2, 'Toys': 4, 'Games': 40}, 3, 2),
+            (RowFilter(include_departments=['Toys', 'Games']), {'Toys': 4, 'Games': 104}, 4, 1),
+            (RowFilter(exclude_departments=['Books']), {'Toys': 4, 'Games': 104}, 4, 1),
+        ]
+        for row_filter, expected, filtered, skipped in cases:
+            aggregator = SalesAggregator(row_filter=row_filter)
+            aggregator.feed(csv_data)
+            aggregator.finish()
+            
+            self.assertEqual(dict(aggregator.dept_counts), expected)
+            self.assertEqual(aggregator.rows_filtered, filtered)
+            self.assertEqual(aggregator.rows_skipped, skipped)
+    
+    def test_row_filter_validation(self):
+        """Test malformed or empty date ranges are rejected and empty filters are falsy."""
+        self.assertFalse(RowFilter())
+        self.assertTrue(RowFilter(date_to='2024-12-31'))
+        with self.assertRaises(ValueError):
+            RowFilter(date_from='2024-1-1')
+        with self.assertRaises(ValueError):
+            RowFilter(date_from='2024-02-01', date_to='2024-01-31')
+    
+    def test_day_number(self):
+        """Test row batch day numbers count days since 1970-01-01."""
+        self.assertEqual(day_number('1970-01-01'), 0)
+        self.assertEqual(day_number('1969-12-31'), -1)
+        self.assertEqual(day_number('2024-03-01'), 19783)
+        self.assertEqual(day_number('9999-12-31'), MAX_DAY)
+        with self.assertRaises(ValueError):
+            day_number('2024-02-30')
+    
+    def test_feed_rows(self):
+        """Test row batches aggregate like the equivalent CSV, with the same rows skipped."""
+        csv_aggregator = SalesAggregator()
+        csv_aggregator.feed(
+            b'Department Name,Date,Number of Sales\n'
+            b'Books,2024-01-01,5\n'
+            b' Toys ,2024-01-02,3\n'
+            b'Books,2024-01-03,0\n'
+            b'Games,2024-01-03,-1\n'
+            b',2024-01-04,9\n'
+        )
+        csv_aggregator.finish()
+        
+        aggregator = SalesAggregator(has_header=False)
+        day = day_number('2024-01-01')
+        # Valid batch: takes the single-pass path
+        aggregator.feed_rows(['Books', ' Toys '], [0, 1], [day, day + 1], [5, 3], nbytes=20)
+        # Negative sales and an empty department
+        aggregator.feed_rows(['Games', '', 'Books'], [2, 0, 1], [day + 2, day + 2, day + 3], [0, -1, 9])
+        
+        self.assertEqual(dict(aggregator.dept_counts), dict(csv_aggregator.dept_counts))
+        self.assertEqual((aggregator.rows_processed, aggregator.rows_skipped), (3, 2))
+        self.assertEqual(aggregator.bytes_received, 20)
+    
+    def test_feed_rows_malformed(self):
+        """Test rows with unknown department ids, out-of-range days or missing values are skipped."""
+        aggregator = SalesAggregator(has_header=False)
+        aggregator.feed_rows(['Books'], [0, 1, 0, 0, 0], [0, 0, MAX_DAY + 1, 0], [1, 2, 4, 8])
+        
+        self.assertEqual(dict(aggregator.dept_counts), {'Books': 9})
+        self.assertEqual((aggregator.rows_processed, aggregator.rows_skipped), (2, 3))
+    
+    def test_feed_rows_filter(self):
+        """Test row filters apply to batches before validation."""
+        row_filter = RowFilter(date_from='2024-01-02', exclude_departments=['Toys'])
+        aggregator = SalesAggregator(has_header=False, row_filter=row_filter)
+        day = day_number('2024-01-01')
+        aggregator.feed_rows(['Books', 'Toys'], [0, 0, 1, 0], [day, day + 1, day + 1, day + 2], [1, 2, -4, -8])
+        
+        self.assertEqual(dict(aggregator.dept_counts), {'Books': 2})
+        self.assertEqual((aggregator.rows_processed, aggregator.rows_filtered, aggregator.rows_skipped), (1, 2, 1))
+    
+    def test_aggregator_empty(self):
+        """Test an aggregator that never saw a header rejects the input."""
+        aggregator = SalesAggregator()
+        with self.assertRaises(ValueError):
+            aggregator.finish()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.csv_processor import SalesAggregator
+from utils.dataset_store import DatasetStore
+
+
+def aggregate(data: bytes) -> SalesAggregator:
+    aggregator = SalesAggregator()
+    aggregator.feed(data)
+    aggregator.finish()
+    return aggregator
+
+
+class TestDatasetStore(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.store = DatasetStore(self.tmp_dir.name)
+    
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        self.output_dir.cleanup()
+    
+    def test_merge_accumulates_totals(self):
+        """Test successive uploads are merged into running totals."""
+        self.store.merge('march', aggregate(b'Department Name,Date,Number of Sales\nBooks,2024-03-01,5\n'))
+        state = self.store.merge('march', aggregate(
+            b'Department Name,Date,Number of Sales\nBooks,2024-03-02,7\nToys,2024-03-02,1\nToys,x,1\n'
+        ))
+        
+        self.assertEqual(state['dept_counts'], {'Books': 12, 'Toys': 1})
+        self.assertEqual(state['version'], 2)
+        self.assertEqual(state['uploads'], 2)
+        self.assertEqual(state['rows_processed'], 3)
+        self.assertEqual(state['rows_skipped'], 1)
+        self.assertEqual(state['rows_filtered'], 0)
+        
+        # State is persisted on disk
+        reopened = DatasetStore(self.tmp_dir.name)
+        self.assertEqual(reopened.load('march')['dept_counts'], {'Books': 12, 'Toys': 1})
+    
+    def test_materialize_replaces_previous_version(self):
+        """Test the output is rewritten only when the dataset changed."""
+        self.store.merge('march', aggregate(b'Department Name,Date,Number of Sales\nBooks,2024-03-01,5\n'))
+        _, first = self.store.materialize('march', self.output_dir.name)
+        _, again = self.store.materialize('march', self.output_dir.name)
+        self.assertEqual(first, again)
+        
+        self.store.merge('march', aggregate(b'Department Name,Date,Number of Sales\nBooks,2024-03-02,1\n'))
+        _, second = self.store.materialize('march', self.output_dir.name)
+        self.assertNotEqual(first, second)
+        self.assertEqual(os.listdir(self.output_dir.name), [second])
+        
+        with open(os.path.join(self.output_dir.name, second), encoding='utf-8', newline='') as f:
+            self.assertEqual(f.read(), 'Department Name,Total Number of Sales\r\nBooks,6\r\n')
+    
+    def test_unknown_and_invalid_names(self):
+        """Test missing datasets and path-like names."""
+        self.assertIsNone(self.store.materialize('missing', self.output_dir.name))
+        self.assertIsNone(self.store.load('../etc/passwd'))
+        with self.assertRaises(ValueError):
+            self.store.merge('../etc/passwd', aggregate(b'Department Name,Date,Number of Sales\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+import logging
+from concurrent import futures
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Configure logging for tests
+logging.basicConfig(level=logging.WARNING)
+
+from proto import sales_pb2, sales_pb2_grpc
+from services.sales_service import SalesService
+from utils.grpc_transport import PROFILES, TransportProfile, from_env, get_profile
+
+
+def large_csv(size: int) -> bytes:
+    line = b'Books,2024-01-01,1\n'
+    return b'Department Name,Date,Number of Sales\n' + line * (size // len(line))
+
+
+class TestTransportProfiles(unittest.TestCase):
+
+    def test_from_env_overrides(self):
+        """Test GRPC_* variables override single settings of the selected profile."""
+        profile = from_env({
+            'GRPC_TRANSPORT_PROFILE': 'wan-bulk',
+            'GRPC_COMPRESSION': 'Deflate',
+            'GRPC_MAX_MESSAGE_MB': '8',
+            'GRPC_MAX_CONCURRENT_STREAMS': '10'
+        })
+        
+        self.assertEqual(profile.name, 'wan-bulk')
+        self.assertEqual(profile.compression_algorithm, grpc.Compression.Deflate)
+        self.assertEqual(profile.max_message_bytes, 8 * 1024 * 1024)
+        self.assertEqual(profile.max_concurrent_streams, 10)
+        self.assertEqual(profile.keepalive_time_ms, PROFILES['wan-bulk'].keepalive_time_ms)
+        self.assertIs(from_env({}), PROFILES['default'])
+    
+    def test_invalid_settings(self):
+        """Test unknown profiles, unknown compression and too-frequent keepalives are rejected."""
+        with self.assertRaises(ValueError):
+            get_profile('satellite')
+        with self.assertRaises(ValueError):
+            from_env({'GRPC_COMPRESSION': 'brotli'})
+        with self.assertRaises(ValueError):
+            TransportProfile(keepalive_time_ms=1000)
+    
+    def test_options(self):
+        """Test settings map to server and channel arguments, with streams limited only by servers."""
+        profile = PROFILES['lan-bulk']
+        server_options = dict(profile.server_options())
+        channel_options = dict(profile.channel_options())
+        
+        for options in (server_options, channel_options):
+            self.assertEqual(options['grpc.max_receive_message_length'], 64 * 1024 * 1024)
+            self.assertEqual(options['grpc.http2.lookahead_bytes'], 8 * 1024 * 1024)
+            self.assertEqual(options['grpc.keepalive_time_ms'], 60000)
+        self.assertEqual(server_options['grpc.max_concurrent_streams'], 256)
+        self.assertNotIn('grpc.max_concurrent_streams', channel_options)
+        self.assertNotIn('grpc.keepalive_time_ms', dict(PROFILES['default'].channel_options()))
+
+
+class TestTransportEndToEnd(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.servers = []
+    
+    def tearDown(self):
+        for server, service in self.servers:
+            server.stop(0)
+            service.result_index.close()
+        self.tmp_dir.cleanup()
+    
+    def start_server(self, profile: TransportProfile) -> str:
+        service = SalesService(
+            output_dir=os.path.join(self.tmp_dir.name, 'processed'),
+            spool_dir=os.path.join(self.tmp_dir.name, 'uploads'),
+            dataset_dir=os.path.join(self.tmp_dir.name, 'datasets'),
+            index_path=os.path.join(self.tmp_dir.name, f'results-{len(self.servers)}.db')
+        )
+        server = profile.server(futures.ThreadPoolExecutor(max_workers=4))
+        sales_pb2_grpc.add_SalesServiceServicer_to_server(service, server)
+        port = server.add_insecure_port('127.0.0.1:0')
+        server.start()
+        self.servers.append((server, service))
+        return f'127.0.0.1:{port}'
+    
+    def upload(self, profile: TransportProfile, address: str, data: bytes) -> sales_pb2.JobStatusResponse:
+        """Upload data as one message and wait for the job."""
+        with profile.insecure_channel(address) as channel:
+            stub = sales_pb2_grpc.SalesServiceStub(channel)
+            response = stub.UploadCSV(iter([sales_pb2.UploadChunk(data=data, filename='sales.csv')]))
+            deadline = time.time() + 10
+            while time.time() < deadline:
+                status = stub.GetJobStatus(sales_pb2.JobStatusRequest(job_id=response.job_id))
+                if status.status != 'processing':
+                    return status
+                time.sleep(0.02)
+        self.fail('Job did not finish')
+    
+    def test_profiles_interoperate(self):
+        """Test every client profile, compressed or not, works against every server profile."""
+        data = large_csv(64 * 1024)
+        addresses = {name: self.start_server(profile) for name, profile in PROFILES.items()}
+        for server_name, address in addresses.items():
+            for client_name, profile in PROFILES.items():
+                with self.subTest(server=server_name, client=client_name):
+                    status = self.upload(profile, address, data)
+                    self.assertEqual(status.status, 'completed')
+                    self.assertEqual(status.metrics.rows_processed, (len(data) - 37) // 19)
+    
+    def test_bulk_profile_allows_large_messages(self):
+        """Test messages over gRPC's 4 MB default pass with a bulk profile only."""
+        data = large_csv(6 * 1024 * 1024)
+        
+        status = self.upload(PROFILES['lan-bulk'], self.start_server(PROFILES['lan-bulk']), data)
+        self.assertEqual(status.status, 'completed')
+        
+        with self.assertRaises(grpc.RpcError) as raised:
+            self.upload(PROFILES['default'], self.start_server(PROFILES['default']), data)
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.RESOURCE_EXHAUSTED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,284 @@
+import unittest
+import gzip
+import os
+import sys
+import tempfile
+import io
+import logging
+from concurrent import futures
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Configure logging for tests
+logging.basicConfig(level=logging.WARNING)
+
+import http_proxy
+from proto import sales_pb2_grpc
+from services.sales_service import SalesService
+from utils.csv_processor import write_results_atomic
+
+SAMPLE_CSV = b'Department Name,Date,Number of Sales\nElectronics,2024-01-01,100\nBooks,2024-01-02,50\n'
+
+
+class TestDownloadFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.original_dir = http_proxy.PROCESSED_DIR
+        http_proxy.PROCESSED_DIR = self.tmp_dir.name
+        self.client = http_proxy.app.test_client()
+        
+        self.dept_counts = {f'Department {i}': i for i in range(100)}
+        write_results_atomic(self.dept_counts, os.path.join(self.tmp_dir.name, 'result.csv'))
+    
+    def tearDown(self):
+        http_proxy.PROCESSED_DIR = self.original_dir
+        self.tmp_dir.cleanup()
+    
+    def test_download_sets_cache_headers(self):
+        """Test immutable caching headers and strong ETag."""
+        response = self.client.get('/processed/result.csv')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        etag, weak = response.get_etag()
+        self.assertFalse(weak)
+        self.assertEqual(len(etag), 64)
+    
+    def test_conditional_get_returns_304(self):
+        """Test If-None-Match with the current ETag returns 304 and no body."""
+        etag = self.client.get('/processed/result.csv').headers['ETag']
+        
+        response = self.client.get('/processed/result.csv', headers={'If-None-Match': etag})
+        
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+    
+    def test_range_request(self):
+        """Test byte-range requests return partial content."""
+        response = self.client.get('/processed/result.csv', headers={'Range': 'bytes=0-9'})
+        
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b'Department')
+    
+    def test_gzip_sibling_served_when_accepted(self):
+        """Test precompressed sibling is served only to clients accepting gzip."""
+        output_path = os.path.join(self.tmp_dir.name, 'result.csv')
+        write_results_atomic(self.dept_counts, output_path + '.gz', compress=True)
+        
+        plain = self.client.get('/processed/result.csv')
+        encoded = self.client.get('/processed/result.csv', headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(encoded.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(encoded.data), plain.data)
+        self.assertNotEqual(encoded.headers['ETag'], plain.headers['ETag'])
+    
+    def test_missing_file_returns_404(self):
+        """Test unknown result file."""
+        response = self.client.get('/processed/missing.csv')
+        self.assertEqual(response.status_code, 404)
+    
+    def test_missing_file_invalidates_cached_status(self):
+        """Test a 404 download drops cached statuses that link to the evicted output."""
+        if http_proxy.status_cache is None:
+            self.skipTest('status cache disabled')
+        http_proxy.status_cache.get('evicted-job', lambda: {'status': 'completed',
+                                                            'download_url': '/processed/evicted.csv'})
+        
+        self.assertEqual(self.client.get('/processed/evicted.csv').status_code, 404)
+        reloaded = http_proxy.status_cache.get('evicted-job', lambda: {'status': 'not_found'})
+        self.assertEqual(reloaded['status'], 'not_found')
+    
+    def test_sharded_download_and_usage(self):
+        """Test sharded outputs are served by name and their downloads tracked."""
+        storage = http_proxy._get_storage()
+        write_results_atomic(self.dept_counts, storage.path_for('sharded.csv'))
+        storage.register('sharded.csv', 'job-1', now=1000.0)
+        
+        response = self.client.get('/processed/sharded.csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.client.get('/processed/result.csv').data)
+        
+        last_access = storage._connection().execute(
+            "SELECT last_access FROM outputs WHERE filename = 'sharded.csv'"
+        ).fetchone()[0]
+        self.assertGreater(last_access, 1000.0)
+        
+        usage = self.client.get('/api/storage').get_json()
+        self.assertEqual(usage['files'], 1)
+        self.assertEqual(usage['bytes'], os.path.getsize(storage.path_for('sharded.csv')))
+
+
+
+class TestUpload(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        cls.service = SalesService(
+            output_dir=cls.tmp_dir.name,
+            spool_dir=os.path.join(cls.tmp_dir.name, 'uploads'),
+            dataset_dir=os.path.join(cls.tmp_dir.name, 'datasets'),
+            index_path=os.path.join(cls.tmp_dir.name, 'results.db')
+        )
+        sales_pb2_grpc.add_SalesServiceServicer_to_server(cls.service, cls.server)
+        port = cls.server.add_insecure_port('127.0.0.1:0')
+        cls.server.start()
+        cls.original_server = http_proxy.GRPC_SERVER
+        http_proxy.GRPC_SERVER = f'127.0.0.1:{port}'
+        cls.original_dir = http_proxy.PROCESSED_DIR
+        http_proxy.PROCESSED_DIR = cls.tmp_dir.name
+    
+    @classmethod
+    def tearDownClass(cls):
+        http_proxy.GRPC_SERVER = cls.original_server
+        http_proxy.PROCESSED_DIR = cls.original_dir
+        cls.server.stop(0)
+        cls.service.result_index.close()
+        cls.tmp_dir.cleanup()
+    
+    def setUp(self):
+        self.client = http_proxy.app.test_client()
+    
+    def test_multipart_upload(self):
+        """Test multipart uploads are streamed to gRPC."""
+        response = self.client.post(
+            '/api/upload',
+            data={'file': (io.BytesIO(SAMPLE_CSV), 'sales.csv')},
+            content_type='multipart/form-data'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'processing')
+    
+    def test_raw_upload(self):
+        """Test raw text/csv bodies are accepted."""
+        response = self.client.post(
+            '/api/upload',
+            data=SAMPLE_CSV,
+            content_type='text/csv',
+            headers={'X-Filename': 'sales.csv'}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'processing')
+    
+    def test_upload_at_capacity_returns_503(self):
+        """Test uploads rejected by admission control map to 503 with Retry-After."""
+        admission = self.service.admission
+        admission.max_active_jobs, admission.retry_after_ms = 1, 2500
+        self.assertTrue(admission.try_acquire())
+        try:
+            response = self.client.post('/api/upload', data=SAMPLE_CSV, content_type='text/csv')
+        finally:
+            admission.release(0)
+            admission.max_active_jobs = 0
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '3')
+    
+    def test_upload_over_byte_limit_returns_413(self):
+        """Test uploads larger than the in-flight byte limit map to 413 without Retry-After."""
+        admission = self.service.admission
+        admission.max_inflight_bytes = 16
+        try:
+            response = self.client.post('/api/upload', data=SAMPLE_CSV, content_type='text/csv')
+        finally:
+            admission.max_inflight_bytes = 0
+        
+        self.assertEqual(response.status_code, 413)
+        self.assertNotIn('Retry-After', response.headers)
+    
+    def test_invalid_row_filter_returns_400(self):
+        """Test an unusable filter is rejected with 400 and the server's validation message."""
+        response = self.client.post('/api/upload?date_from=March', data=SAMPLE_CSV, content_type='text/csv')
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('March', response.get_json()['error'])
+    
+    def test_profile_endpoint(self):
+        """Test profiled jobs' profiles are served as pstats data or a text report."""
+        response = self.client.post('/api/upload?profile=1', data=SAMPLE_CSV, content_type='text/csv')
+        job_id = response.get_json()['job_id']
+        self.service.wait_for_jobs(5)
+        
+        status = self.client.get(f'/api/status/{job_id}').get_json()
+        self.assertEqual(status['profile_url'], f'/api/profile/{job_id}')
+        self.assertGreater(len(status['metrics']['hot_functions']), 0)
+        
+        response = self.client.get(f'/api/profile/{job_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/octet-stream')
+        
+        response = self.client.get(f'/api/profile/{job_id}?format=text')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('function calls', response.get_data(as_text=True))
+        
+        self.assertEqual(self.client.get('/api/profile/00000000-0000-0000-0000-000000000000').status_code, 404)
+        self.assertEqual(self.client.get('/api/profile/not-a-job').status_code, 400)
+    
+    def test_upload_with_column_params(self):
+        """Test column query parameters map fields by name or index."""
+        response = self.client.post(
+            '/api/upload?department_column=Dept&date_column=1&sales_column=units',
+            data=b'Region,Day,Dept,Units\nNorth,2024-01-01,Books,5\nSouth,2024-01-02,Books,7\n',
+            content_type='text/csv'
+        )
+        job_id = response.get_json()['job_id']
+        self.service.wait_for_jobs(5)
+        
+        status = self.client.get(f'/api/status/{job_id}').get_json()
+        self.assertEqual(status['status'], 'completed')
+        self.assertEqual(status['metrics']['rows_processed'], 2)
+    
+    def test_upload_with_filter_params(self):
+        """Test date and department query parameters become the upload's row filter."""
+        response = self.client.post(
+            '/api/upload?date_to=2024-01-01&department=Electronics&department=Books',
+            data=SAMPLE_CSV,
+            content_type='text/csv'
+        )
+        job_id = response.get_json()['job_id']
+        self.service.wait_for_jobs(5)
+        
+        metrics = self.client.get(f'/api/status/{job_id}').get_json()['metrics']
+        self.assertEqual(metrics['rows_processed'], 1)
+        self.assertEqual(metrics['rows_filtered'], 1)
+    
+    def test_multipart_without_file(self):
+        """Test multipart bodies without a file field are rejected."""
+        response = self.client.post('/api/upload', data={'note': 'x'}, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_cancel_unknown_job(self):
+        """Test cancelling an unknown job returns 404."""
+        response = self.client.post('/api/cancel/missing')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json()['status'], 'not_found')
+    
+    def test_totals(self):
+        """Test totals are served from the result index."""
+        self.service.result_index.add_job('indexed-job', 'sales.csv', 1704067200.0, {'Garden': 3}, 1, 0, 1)
+        
+        response = self.client.get('/api/totals?job_id=indexed-job&since=2024-01-01&until=2024-01-02')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {
+            'jobs_matched': 1,
+            'totals': [{'department': 'Garden', 'total': 3, 'job_count': 1}]
+        })
+        
+        response = self.client.get('/api/totals?since=yesterday')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_unsupported_content_type(self):
+        """Test other content types are rejected."""
+        response = self.client.post('/api/upload', data='{}', content_type='application/json')
+        self.assertEqual(response.status_code, 415)
+
+
+if __name__ == '__main__':
+    unittest.main()
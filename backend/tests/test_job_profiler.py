@@ -0,0 +1,58 @@
+import unittest
+import os
+import pstats
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from proto import sales_pb2
+from utils.job_profiler import JobProfiler, describe_function
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+class TestJobProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.profile_path = os.path.join(self.tmp_dir.name, 'profile-job.prof')
+    
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+    
+    def test_profile_saved_and_summarized(self):
+        """Test the profile is written in pstats format and hot functions are reported."""
+        with JobProfiler(self.profile_path) as profiler:
+            busy(200000)
+        
+        self.assertGreater(pstats.Stats(self.profile_path).total_calls, 0)
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['profile-job.prof'])
+        
+        metrics = sales_pb2.ProcessingMetrics()
+        profiler.fill(metrics, limit=3)
+        self.assertEqual(len(metrics.hot_functions), 3)
+        self_times = [f.self_ms for f in metrics.hot_functions]
+        self.assertEqual(self_times, sorted(self_times, reverse=True))
+        self.assertTrue(any('busy' in f.function or 'genexpr' in f.function for f in metrics.hot_functions))
+    
+    def test_profile_saved_when_processing_fails(self):
+        """Test a failing job still leaves its profile behind."""
+        with self.assertRaises(ValueError):
+            with JobProfiler(self.profile_path):
+                busy(1000)
+                raise ValueError('bad row')
+        self.assertTrue(os.path.isfile(self.profile_path))
+    
+    def test_describe_function(self):
+        """Test pstats keys are formatted as file:line(name), built-ins by name."""
+        self.assertEqual(describe_function(('/srv/utils/csv_processor.py', 42, '_parse')),
+                         'csv_processor.py:42(_parse)')
+        self.assertEqual(describe_function(('~', 0, "<method 'decode' of 'bytes' objects>")),
+                         "<method 'decode' of 'bytes' objects>")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from proto import sales_pb2
+from services.job_registry import JobRecord, JobRegistry
+
+
+class TestJobRegistry(unittest.TestCase):
+
+    def test_put_and_get(self):
+        """Test snapshots are stored and returned as published."""
+        registry = JobRegistry()
+        record = JobRecord(job_id='job', status='processing', filename='sales.csv')
+        registry.put(record)
+        
+        self.assertIs(registry.get('job'), record)
+        self.assertIsNone(registry.get('missing'))
+        self.assertIn('job', registry)
+        self.assertEqual(len(registry), 1)
+    
+    def test_prebuilt_response(self):
+        """Test each snapshot carries its JobStatusResponse."""
+        metrics = sales_pb2.ProcessingMetrics(rows_processed=10, departments_count=2)
+        record = JobRecord(job_id='job', status='completed', download_url='/processed/x.csv', metrics=metrics)
+        
+        self.assertEqual(record.response.status, 'completed')
+        self.assertEqual(record.response.download_url, '/processed/x.csv')
+        self.assertEqual(record.response.metrics.rows_processed, 10)
+        self.assertTrue(JobRecord(job_id='job', status='processing').response.HasField('metrics'))
+    
+    def test_update_replaces_snapshot(self):
+        """Test updates publish a new snapshot and leave the old one intact."""
+        registry = JobRegistry()
+        original = JobRecord(job_id='job', status='processing')
+        registry.put(original)
+        
+        updated = registry.update('job', status='error', error='boom')
+        
+        self.assertIs(registry.get('job'), updated)
+        self.assertEqual(updated.response.error_message, 'boom')
+        self.assertEqual(original.status, 'processing')
+        self.assertEqual(original.response.status, 'processing')
+        self.assertIsNone(registry.update('missing', status='error'))
+    
+    def test_concurrent_updates(self):
+        """Test concurrent writers to different jobs do not lose updates."""
+        registry = JobRegistry(stripes=4)
+        for i in range(50):
+            registry.put(JobRecord(job_id=f'job-{i}', status='processing'))
+        
+        def writer(i):
+            for n in range(100):
+                registry.update(f'job-{i}', rows_processed=n + 1)
+        
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertTrue(all(record.rows_processed == 100 for record in registry))
+    
+    def test_lock_wait_measured_per_thread(self):
+        """Test time spent waiting for a contended stripe lock is reported to the waiting thread."""
+        registry = JobRegistry(stripes=1)
+        registry.put(JobRecord(job_id='job', status='processing'))
+        self.assertEqual(registry.take_lock_wait(), 0.0)
+        
+        waits = []
+        
+        def contend():
+            registry.update('job', rows_processed=1)
+            waits.append(registry.take_lock_wait())
+        
+        with registry._locked(0):
+            thread = threading.Thread(target=contend)
+            thread.start()
+            thread.join(0.05)
+        thread.join()
+        
+        self.assertGreaterEqual(waits[0], 0.04)
+        self.assertEqual(registry.take_lock_wait(), 0.0)
+    
+    def test_pop(self):
+        """Test removing a job."""
+        registry = JobRegistry()
+        registry.put(JobRecord(job_id='job', status='completed'))
+        self.assertEqual(registry.pop('job').status, 'completed')
+        self.assertIsNone(registry.get('job'))
+
+
+if __name__ == '__main__':
+    unittest.main()
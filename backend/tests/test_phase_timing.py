@@ -0,0 +1,52 @@
+import unittest
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from proto import sales_pb2
+from utils.phase_timing import PhaseTimings
+
+
+class TestPhaseTimings(unittest.TestCase):
+
+    def test_lap_and_measure(self):
+        """Test laps charge the time since the previous lap and measure charges its block."""
+        timings = PhaseTimings()
+        time.sleep(0.02)
+        timings.lap('receive')
+        with timings.measure('parse'):
+            time.sleep(0.01)
+        timings.lap('queue_wait')
+        
+        self.assertGreaterEqual(timings.seconds['receive'], 0.02)
+        self.assertGreaterEqual(timings.seconds['parse'], 0.01)
+        # The measured block is also part of the next lap
+        self.assertGreaterEqual(timings.seconds['queue_wait'], 0.01)
+    
+    def test_merge_sums_phases(self):
+        """Test merging adds up matching phases."""
+        first, second = PhaseTimings(), PhaseTimings()
+        first.add('parse', 1.0)
+        second.add('parse', 2.0)
+        second.add('write', 0.5)
+        
+        first.merge(second)
+        self.assertEqual(first.seconds, {'parse': 3.0, 'write': 0.5})
+    
+    def test_fill_in_pipeline_order(self):
+        """Test phases are reported in pipeline order in milliseconds."""
+        timings = PhaseTimings()
+        timings.add('write', 0.002)
+        timings.add('decode', 0.0015)
+        timings.add('receive', 1.0)
+        
+        metrics = sales_pb2.ProcessingMetrics()
+        timings.fill(metrics)
+        self.assertEqual([(p.phase, p.duration_ms) for p in metrics.phases],
+                         [('receive', 1000.0), ('decode', 1.5), ('write', 2.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.result_index import ResultIndex
+
+
+class TestResultIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = ResultIndex(os.path.join(self.tmp_dir.name, 'results.db'))
+        self.index.add_job('job-1', 'mon.csv', 100.0, {'Electronics': 10, 'Books': 1}, 11, 0, 5)
+        self.index.add_job('job-2', 'tue.csv', 200.0, {'Electronics': 5, 'Toys': 2}, 7, 1, 5)
+        self.index.add_job('job-3', 'wed.csv', 300.0, {'Electronics': 1}, 1, 0, 5)
+    
+    def tearDown(self):
+        self.index.close()
+        self.tmp_dir.cleanup()
+    
+    def test_totals_across_all_jobs(self):
+        """Test department totals are summed across every indexed job."""
+        rows, jobs_matched = self.index.query_totals()
+        self.assertEqual(rows, [('Books', 1, 1), ('Electronics', 16, 3), ('Toys', 2, 1)])
+        self.assertEqual(jobs_matched, 3)
+    
+    def test_filters(self):
+        """Test department, job and time range filters."""
+        rows, jobs_matched = self.index.query_totals(departments=['Electronics'], since=150.0)
+        self.assertEqual(rows, [('Electronics', 6, 2)])
+        self.assertEqual(jobs_matched, 2)
+        
+        rows, jobs_matched = self.index.query_totals(job_ids=['job-1', 'job-3'], until=300.0)
+        self.assertEqual(rows, [('Books', 1, 1), ('Electronics', 10, 1)])
+        self.assertEqual(jobs_matched, 1)
+    
+    def test_filters_beyond_variable_limit(self):
+        """Test id lists longer than SQLite's bound-variable limit are still filtered."""
+        job_ids = ['job-3'] + [f'missing-{i}' for i in range(40000)]
+        departments = ['Electronics'] + [f'Dept {i}' for i in range(40000)]
+        rows, jobs_matched = self.index.query_totals(job_ids=job_ids, departments=departments)
+        self.assertEqual(rows, [('Electronics', 1, 1)])
+        self.assertEqual(jobs_matched, 1)
+        
+        # Lists from an earlier query do not leak into the next one
+        rows, jobs_matched = self.index.query_totals(job_ids=['job-1'])
+        self.assertEqual(rows, [('Books', 1, 1), ('Electronics', 10, 1)])
+        self.assertEqual(jobs_matched, 1)
+    
+    def test_reindexing_replaces_job(self):
+        """Test indexing the same job twice keeps only the latest totals."""
+        self.index.add_job('job-3', 'wed.csv', 300.0, {'Garden': 4}, 1, 0, 5)
+        rows, _ = self.index.query_totals(job_ids=['job-3'])
+        self.assertEqual(rows, [('Garden', 4, 1)])
+        
+        # Persisted across connections
+        reopened = ResultIndex(self.index.db_path)
+        self.assertEqual(reopened.query_totals(job_ids=['job-3'])[0], [('Garden', 4, 1)])
+        reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,656 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+import logging
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Configure logging for tests
+logging.basicConfig(level=logging.WARNING)
+
+from proto import sales_pb2
+from services.job_registry import JobRecord
+from services.sales_service import SalesService
+from utils.csv_processor import day_number
+
+SAMPLE_CSV = (
+    b'Department Name,Date,Number of Sales\n'
+    b'Electronics,2024-01-01,100\n'
+    b'Clothing,2024-01-01,200\n'
+    b'Electronics,2024-01-02,150\n'
+    b'Books,not-a-date,5\n'
+)
+
+
+def upload_chunks(data: bytes, chunk_size: int = 16, **first_chunk_fields):
+    """Split data into UploadChunk messages; metadata goes in the first chunk."""
+    for offset in range(0, len(data), chunk_size):
+        chunk = sales_pb2.UploadChunk(data=data[offset:offset + chunk_size])
+        if offset == 0:
+            chunk.filename = 'sales.csv'
+            for name, value in first_chunk_fields.items():
+                setattr(chunk, name, value)
+        yield chunk
+
+
+def row_batch_chunks(batches, **first_chunk_fields):
+    """Wrap (departments, department_ids, dates, sales) tuples in UploadChunk messages."""
+    for index, (departments, department_ids, dates, sales) in enumerate(batches):
+        chunk = sales_pb2.UploadChunk()
+        chunk.rows.departments.extend(departments)
+        chunk.rows.department_ids.extend(department_ids)
+        chunk.rows.days.extend(day_number(value) for value in dates)
+        chunk.rows.sales.extend(sales)
+        if index == 0:
+            chunk.filename = 'sales.rows'
+            for name, value in first_chunk_fields.items():
+                setattr(chunk, name, value)
+        yield chunk
+
+
+def large_csv(rows: int) -> bytes:
+    lines = ['Department Name,Date,Number of Sales\n']
+    lines.extend(f'Dept{i % 50},2024-01-{i % 28 + 1:02d},{i % 100}\n' for i in range(rows))
+    return ''.join(lines).encode('utf-8')
+
+
+class AbortedContext:
+    """Stand-in for a gRPC context whose client has gone away."""
+    
+    def is_active(self):
+        return False
+
+
+class TestSalesService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.spool_dir = tempfile.TemporaryDirectory()
+        self.dataset_dir = tempfile.TemporaryDirectory()
+        self.service = SalesService(output_dir=self.tmp_dir.name, spool_dir=self.spool_dir.name,
+                                    dataset_dir=self.dataset_dir.name,
+                                    index_path=os.path.join(self.dataset_dir.name, 'results.db'))
+    
+    def tearDown(self):
+        self.service.result_index.close()
+        self.tmp_dir.cleanup()
+        self.spool_dir.cleanup()
+        self.dataset_dir.cleanup()
+    
+    def wait_for_job(self, job_id: str, timeout: float = 5.0) -> sales_pb2.JobStatusResponse:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            response = self.service.GetJobStatus(sales_pb2.JobStatusRequest(job_id=job_id), None)
+            if response.status != 'processing':
+                return response
+            time.sleep(0.01)
+        self.fail(f'Job {job_id} did not finish')
+    
+    def read_output(self, download_url: str) -> str:
+        filename = download_url.rsplit('/', 1)[-1]
+        with open(self.service.storage.locate(filename), encoding='utf-8', newline='') as f:
+            return f.read()
+    
+    def output_files(self) -> list:
+        """Names of the files below the output directory, excluding the storage index."""
+        return [name for _, _, names in os.walk(self.tmp_dir.name) for name in names if not name.startswith('.')]
+    
+    def test_upload_and_complete(self):
+        """Test upload is processed in the background and reported as completed."""
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV), None)
+        self.assertEqual(response.status, 'processing')
+        
+        status = self.wait_for_job(response.job_id)
+        
+        self.assertEqual(status.status, 'completed')
+        self.assertEqual(status.metrics.rows_processed, 3)
+        self.assertEqual(status.metrics.rows_skipped, 1)
+        self.assertEqual(status.metrics.departments_count, 2)
+        self.assertEqual(
+            self.read_output(status.download_url),
+            'Department Name,Total Number of Sales\r\nClothing,200\r\nElectronics,250\r\n'
+        )
+    
+    def wait_for_status(self, job_id: str, statuses, timeout: float = 10.0) -> sales_pb2.JobStatusResponse:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            response = self.service.GetJobStatus(sales_pb2.JobStatusRequest(job_id=job_id), None)
+            if response.status in statuses:
+                return response
+            time.sleep(0.01)
+        self.fail(f'Job {job_id} never reached {statuses}')
+    
+    def test_cancel_running_job(self):
+        """Test cancelling a running job stops it with partial metrics."""
+        response = self.service.UploadCSV(upload_chunks(large_csv(300000), chunk_size=65536), None)
+        
+        cancel = self.service.CancelJob(sales_pb2.CancelJobRequest(job_id=response.job_id), None)
+        self.assertIn(cancel.status, ('cancelling', 'completed'))
+        
+        status = self.wait_for_status(response.job_id, ('cancelled', 'completed'))
+        if status.status == 'cancelled':
+            self.assertLess(status.metrics.rows_processed, 300000)
+            self.assertEqual(status.download_url, '')
+            self.assertEqual(self.output_files(), [])
+    
+    def test_cancel_finished_job_is_noop(self):
+        """Test cancelling a completed job leaves it completed."""
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV), None)
+        self.wait_for_job(response.job_id)
+        
+        cancel = self.service.CancelJob(sales_pb2.CancelJobRequest(job_id=response.job_id), None)
+        
+        self.assertEqual(cancel.status, 'completed')
+    
+    def test_cancel_unknown_job(self):
+        """Test cancelling an unknown job."""
+        cancel = self.service.CancelJob(sales_pb2.CancelJobRequest(job_id='missing'), None)
+        self.assertEqual(cancel.status, 'not_found')
+    
+    def test_client_abort_discards_upload(self):
+        """Test an upload aborted mid-stream is reported as cancelled."""
+        def broken_stream():
+            yield from upload_chunks(SAMPLE_CSV[:40])
+            raise RuntimeError('stream reset')
+        
+        response = self.service.UploadCSV(broken_stream(), AbortedContext())
+        
+        self.assertEqual(response.status, 'cancelled')
+        status = self.service.GetJobStatus(sales_pb2.JobStatusRequest(job_id=response.job_id), None)
+        self.assertEqual(status.status, 'cancelled')
+    
+    def session_chunks(self, session_id: str, data: bytes, start: int = 0, chunk_size: int = 16):
+        for offset in range(start, len(data), chunk_size):
+            yield sales_pb2.UploadChunk(data=data[offset:offset + chunk_size], session_id=session_id, offset=offset)
+    
+    def test_resumable_upload(self):
+        """Test an interrupted session upload resumes from the committed offset."""
+        session = self.service.BeginUpload(
+            sales_pb2.BeginUploadRequest(filename='sales.csv', total_size=len(SAMPLE_CSV)), None)
+        self.assertEqual(session.status, 'receiving')
+        
+        def dropped_stream():
+            for chunk in self.session_chunks(session.session_id, SAMPLE_CSV):
+                if chunk.offset >= 48:
+                    raise RuntimeError('connection reset')
+                yield chunk
+        
+        interrupted = self.service.UploadCSV(dropped_stream(), None)
+        self.assertEqual(interrupted.status, 'receiving')
+        
+        status = self.service.ResumeUpload(sales_pb2.UploadSessionRequest(session_id=session.session_id), None)
+        self.assertEqual(status.committed_offset, 48)
+        
+        # Resume slightly before the committed offset; the overlap is ignored
+        response = self.service.UploadCSV(self.session_chunks(session.session_id, SAMPLE_CSV, start=32), None)
+        self.assertEqual(response.status, 'processing')
+        
+        job = self.wait_for_job(response.job_id)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.metrics.rows_processed, 3)
+        
+        status = self.service.ResumeUpload(sales_pb2.UploadSessionRequest(session_id=session.session_id), None)
+        self.assertEqual(status.status, 'completed')
+        self.assertEqual(status.job_id, response.job_id)
+        self.assertEqual(status.committed_offset, len(SAMPLE_CSV))
+    
+    def test_resumable_upload_streams_spool(self):
+        """Test a spooled upload is aggregated block by block, with read time charged to receive."""
+        session = self.service.BeginUpload(sales_pb2.BeginUploadRequest(filename='sales.csv'), None)
+        with mock.patch('utils.upload_spool.READ_BLOCK_SIZE', 10):
+            response = self.service.UploadCSV(self.session_chunks(session.session_id, SAMPLE_CSV), None)
+            job = self.wait_for_job(response.job_id)
+        
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.metrics.rows_processed, job.metrics.rows_skipped), (3, 1))
+        self.assertIn('receive', [phase.phase for phase in job.metrics.phases])
+        self.assertEqual(self.service.upload_spool.committed_offset(session.session_id), 0)
+    
+    def test_resumable_upload_gap_rejected(self):
+        """Test chunks skipping past the committed offset are rejected."""
+        session = self.service.BeginUpload(sales_pb2.BeginUploadRequest(filename='sales.csv'), None)
+        
+        response = self.service.UploadCSV(self.session_chunks(session.session_id, SAMPLE_CSV, start=16), None)
+        
+        self.assertEqual(response.status, 'error')
+        self.assertEqual(response.committed_offset, 0)
+    
+    def test_unknown_session(self):
+        """Test uploads to an unknown session."""
+        response = self.service.UploadCSV(self.session_chunks('deadbeef', SAMPLE_CSV), None)
+        self.assertEqual(response.status, 'error')
+        status = self.service.ResumeUpload(sales_pb2.UploadSessionRequest(session_id='deadbeef'), None)
+        self.assertEqual(status.status, 'not_found')
+    
+    def begin_sharded(self, part_count: int) -> str:
+        response = self.service.BeginShardedUpload(
+            sales_pb2.BeginShardedUploadRequest(filename='sales.csv', part_count=part_count), None
+        )
+        self.assertEqual(response.status, 'processing')
+        return response.job_id
+    
+    def test_sharded_upload(self):
+        """Test parts uploaded out of order are merged into one result."""
+        job_id = self.begin_sharded(3)
+        first, second = SAMPLE_CSV.index(b'Clothing'), SAMPLE_CSV.index(b'Electronics,2024-01-02')
+        parts = [SAMPLE_CSV[:first], SAMPLE_CSV[first:second], SAMPLE_CSV[second:]]
+        
+        for part_index in (2, 0):
+            response = self.service.UploadCSV(
+                upload_chunks(parts[part_index], job_id=job_id, part_index=part_index), None
+            )
+            self.assertEqual(response.status, 'processing')
+        status = self.service.GetJobStatus(sales_pb2.JobStatusRequest(job_id=job_id), None)
+        self.assertEqual(status.status, 'processing')
+        
+        duplicate = self.service.UploadCSV(upload_chunks(parts[0], job_id=job_id, part_index=0), None)
+        self.assertEqual(duplicate.status, 'error')
+        
+        response = self.service.UploadCSV(upload_chunks(parts[1], job_id=job_id, part_index=1), None)
+        self.assertEqual(response.status, 'completed')
+        self.assertEqual(response.metrics.rows_processed, 3)
+        self.assertEqual(response.metrics.rows_skipped, 1)
+        self.assertEqual(
+            self.read_output(response.download_url),
+            'Department Name,Total Number of Sales\r\nClothing,200\r\nElectronics,250\r\n'
+        )
+        
+        status = self.wait_for_job(job_id)
+        self.assertEqual(status.status, 'completed')
+        self.assertEqual(status.download_url, response.download_url)
+    
+    def test_sharded_upload_cancel(self):
+        """Test cancelling a sharded job rejects further parts."""
+        job_id = self.begin_sharded(2)
+        
+        status = self.service.CancelJob(sales_pb2.CancelJobRequest(job_id=job_id), None)
+        self.assertEqual(status.status, 'cancelled')
+        
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV, job_id=job_id, part_index=0), None)
+        self.assertEqual(response.status, 'error')
+    
+    def test_sharded_upload_expires_when_idle(self):
+        """Test a sharded job whose parts stop arriving fails and frees its partial totals."""
+        job_id = self.begin_sharded(2)
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV, job_id=job_id, part_index=0), None)
+        self.assertEqual(response.status, 'processing')
+        
+        timeout = self.service.sharded_idle_timeout
+        self.assertEqual(self.service.expire_sharded(now=time.time() + timeout / 2), 0)
+        self.assertEqual(self.service.expire_sharded(now=time.time() + timeout), 1)
+        
+        status = self.service.GetJobStatus(sales_pb2.JobStatusRequest(job_id=job_id), None)
+        self.assertEqual(status.status, 'error')
+        self.assertIn('1 of 2 parts', status.error_message)
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV, job_id=job_id, part_index=1), None)
+        self.assertEqual(response.status, 'error')
+    
+    def test_sharded_upload_invalid_part_count(self):
+        """Test part counts outside the allowed range are rejected."""
+        response = self.service.BeginShardedUpload(sales_pb2.BeginShardedUploadRequest(part_count=0), None)
+        self.assertEqual(response.status, 'error')
+    
+    def batch_chunks(self, files, chunk_size: int = 16):
+        for file_index, data in enumerate(files):
+            for offset in range(0, max(len(data), 1), chunk_size):
+                chunk = sales_pb2.BatchChunk(data=data[offset:offset + chunk_size], file_index=file_index)
+                if offset == 0:
+                    chunk.filename = f'store{file_index}.csv'
+                yield chunk
+    
+    def test_batch_upload(self):
+        """Test a batch is combined into one result with per-file metrics."""
+        files = [
+            SAMPLE_CSV,
+            b'Department Name,Date,Number of Sales\nBooks,2024-01-03,7\nClothing,2024-01-03,1\n',
+            b'',
+        ]
+        response = self.service.UploadBatch(self.batch_chunks(files), None)
+        
+        self.assertEqual(response.status, 'completed')
+        self.assertEqual(response.metrics.rows_processed, 5)
+        self.assertEqual(response.metrics.rows_skipped, 1)
+        self.assertEqual(
+            self.read_output(response.download_url),
+            'Department Name,Total Number of Sales\r\nBooks,7\r\nClothing,201\r\nElectronics,250\r\n'
+        )
+        
+        self.assertEqual([f.status for f in response.files], ['completed', 'completed', 'error'])
+        self.assertEqual([f.filename for f in response.files], ['store0.csv', 'store1.csv', 'store2.csv'])
+        self.assertEqual(response.files[0].metrics.rows_processed, 3)
+        self.assertEqual(response.files[1].metrics.departments_count, 2)
+        self.assertEqual(response.files[2].error_message, 'CSV file is empty')
+        
+        status = self.wait_for_job(response.job_id)
+        self.assertEqual(status.status, 'completed')
+        self.assertEqual(status.download_url, response.download_url)
+    
+    def test_batch_upload_decreasing_file_index(self):
+        """Test chunks that go back to an earlier file are rejected."""
+        chunks = list(self.batch_chunks([SAMPLE_CSV, SAMPLE_CSV]))
+        chunks.append(sales_pb2.BatchChunk(data=b'Books,2024-01-01,1\n', file_index=0))
+        response = self.service.UploadBatch(iter(chunks), None)
+        self.assertEqual(response.status, 'error')
+    
+    def test_dataset_upload(self):
+        """Test uploads tagged with a dataset accumulate running totals."""
+        for data in (SAMPLE_CSV, b'Department Name,Date,Number of Sales\nBooks,2024-01-03,7\n'):
+            response = self.service.UploadCSV(upload_chunks(data, dataset='january'), None)
+            status = self.wait_for_job(response.job_id)
+            self.assertEqual(status.status, 'completed')
+            self.assertIn('merge', [phase.phase for phase in status.metrics.phases])
+        
+        dataset = self.service.GetDataset(sales_pb2.DatasetRequest(name='january'), None)
+        self.assertEqual(dataset.status, 'ok')
+        self.assertEqual(dataset.uploads, 2)
+        self.assertEqual(dataset.metrics.rows_processed, 4)
+        self.assertEqual(dataset.metrics.departments_count, 3)
+        self.assertEqual(
+            self.read_output(dataset.download_url),
+            'Department Name,Total Number of Sales\r\nBooks,7\r\nClothing,200\r\nElectronics,250\r\n'
+        )
+        
+        missing = self.service.GetDataset(sales_pb2.DatasetRequest(name='february'), None)
+        self.assertEqual(missing.status, 'not_found')
+    
+    def test_dataset_upload_commits_at_merge(self):
+        """Test a merged upload completes despite a late cancel, and a failed one never reaches the dataset."""
+        merge = self.service.datasets.merge
+        
+        def merge_then_cancel(name, aggregator):
+            state = merge(name, aggregator)
+            # A cancel landing after the merge, before the job is published
+            aggregator.cancel_event.set()
+            return state
+        
+        chunks = list(upload_chunks(SAMPLE_CSV, dataset='january'))
+        chunks[0].row_filter.date_from = '2024-01-02'
+        with mock.patch.object(self.service.datasets, 'merge', side_effect=merge_then_cancel):
+            response = self.service.UploadCSV(iter(chunks), None)
+            self.assertEqual(self.wait_for_job(response.job_id).status, 'completed')
+        
+        dataset = self.service.GetDataset(sales_pb2.DatasetRequest(name='january'), None)
+        self.assertEqual((dataset.uploads, dataset.metrics.rows_processed, dataset.metrics.rows_filtered), (1, 1, 2))
+        
+        with mock.patch.object(self.service, '_write_output', side_effect=OSError('disk full')):
+            response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV, dataset='february'), None)
+            self.assertEqual(self.wait_for_job(response.job_id).status, 'error')
+        self.assertIsNone(self.service.datasets.load('february'))
+    
+    def test_invalid_dataset_name(self):
+        """Test uploads to a path-like dataset name are rejected."""
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV, dataset='../x'), None)
+        self.assertEqual(response.status, 'error')
+    
+    def test_query_totals(self):
+        """Test completed jobs are indexed and queryable across jobs."""
+        job_ids = []
+        for _ in range(2):
+            response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV), None)
+            self.assertEqual(self.wait_for_job(response.job_id).status, 'completed')
+            job_ids.append(response.job_id)
+        
+        result = self.service.QueryTotals(sales_pb2.QueryTotalsRequest(departments=['Electronics']), None)
+        self.assertEqual(result.status, 'ok')
+        self.assertEqual(result.jobs_matched, 2)
+        self.assertEqual([(t.department, t.total, t.job_count) for t in result.totals], [('Electronics', 500, 2)])
+        
+        result = self.service.QueryTotals(sales_pb2.QueryTotalsRequest(job_ids=job_ids[:1]), None)
+        self.assertEqual([(t.department, t.total) for t in result.totals], [('Clothing', 200), ('Electronics', 250)])
+        
+        result = self.service.QueryTotals(sales_pb2.QueryTotalsRequest(since=time.time() + 60), None)
+        self.assertEqual(result.jobs_matched, 0)
+        self.assertEqual(len(result.totals), 0)
+    
+    def test_preview_while_processing(self):
+        """Test large uploads publish extrapolated previews before the exact result."""
+        self.service.preview_bytes = 64 * 1024
+        data = large_csv(50000)
+        chunks = [data[offset:offset + 16 * 1024] for offset in range(0, len(data), 16 * 1024)]
+        
+        previews = []
+        original_update = self.service.jobs.update
+        
+        def recording_update(job_id, require_status=None, **changes):
+            if 'preview' in changes:
+                previews.append(changes['preview'])
+            return original_update(job_id, require_status, **changes)
+        
+        self.service.jobs.update = recording_update
+        self.service.jobs.put(JobRecord(job_id='job', status='processing'))
+        self.service._process_csv_background(chunks, 'job', 'sales.csv')
+        
+        # Previews at 64 KB, then every time the processed share doubles
+        self.assertGreaterEqual(len(previews), 3)
+        fractions = [p.sampled_fraction for p in previews]
+        self.assertEqual(fractions, sorted(fractions))
+        self.assertEqual(previews[0].confidence, 'low')
+        self.assertLessEqual(len(previews[-1].departments), 10)
+        
+        # Rows are uniform, so the estimate is close to the exact total
+        estimate = previews[-1].departments[0]
+        exact = sum(i % 100 for i in range(50000) if f'Dept{i % 50}' == estimate.department)
+        self.assertAlmostEqual(estimate.estimated_total, exact, delta=exact * 0.1)
+        
+        status = self.service.GetJobStatus(sales_pb2.JobStatusRequest(job_id='job'), None)
+        self.assertEqual(status.status, 'completed')
+        self.assertFalse(status.HasField('preview'))
+    
+    def test_phase_timings_reported(self):
+        """Test completed jobs report where their time went, in pipeline order."""
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV), None)
+        status = self.wait_for_job(response.job_id)
+        
+        phases = [timing.phase for timing in status.metrics.phases]
+        self.assertEqual(phases, ['receive', 'queue_wait', 'decode', 'parse', 'sort', 'write', 'lock_wait'])
+        self.assertTrue(all(timing.duration_ms >= 0 for timing in status.metrics.phases))
+    
+    def test_profiled_job(self):
+        """Test a job uploaded with profile set saves its profile and reports hot functions."""
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV, profile=True), None)
+        status = self.wait_for_job(response.job_id)
+        
+        self.assertEqual(status.status, 'completed')
+        self.assertGreater(len(status.metrics.hot_functions), 0)
+        self.assertLessEqual(len(status.metrics.hot_functions), 10)
+        self.assertIsNotNone(self.service.storage.locate(f'profile-{response.job_id}.prof'))
+    
+    def test_unprofiled_job(self):
+        """Test jobs are not profiled unless asked to."""
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV), None)
+        status = self.wait_for_job(response.job_id)
+        
+        self.assertEqual(len(status.metrics.hot_functions), 0)
+        self.assertFalse(any(name.endswith('.prof') for name in self.output_files()))
+    
+    def test_upload_rejected_at_capacity(self):
+        """Test uploads are turned away while the active job limit is reached."""
+        self.service.admission.max_active_jobs = 1
+        self.assertTrue(self.service.admission.try_acquire())
+        
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV), None)
+        self.assertEqual(response.status, 'rejected')
+        self.assertEqual(response.job_id, '')
+        
+        self.service.admission.release(0)
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV), None)
+        self.assertEqual(response.status, 'processing')
+        self.assertEqual(self.wait_for_job(response.job_id).status, 'completed')
+        
+        # Released by the processing thread just after it publishes the result
+        deadline = time.time() + 5
+        while self.service.admission.active_jobs and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual((self.service.admission.active_jobs, self.service.admission.inflight_bytes), (0, 0))
+    
+    def test_upload_rejected_over_byte_limit(self):
+        """Test uploads crossing the byte limit are rejected, and retryable only if they could ever fit."""
+        admission = self.service.admission
+        admission.max_inflight_bytes = len(SAMPLE_CSV)
+        self.assertTrue(admission.add_bytes(64))
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV), None)
+        self.assertEqual(response.status, 'rejected')
+        admission.release_bytes(64)
+        self.assertEqual((admission.active_jobs, admission.inflight_bytes), (0, 0))
+        
+        # Larger than the limit on its own: retrying cannot help
+        admission.max_inflight_bytes = 64
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV), None)
+        self.assertEqual(response.status, 'error')
+        self.assertIn('resumable upload', response.message)
+        self.assertEqual((admission.active_jobs, admission.inflight_bytes), (0, 0))
+    
+    def test_batch_upload_admission(self):
+        """Test batch uploads are admitted like single uploads and release their bytes."""
+        admission = self.service.admission
+        admission.max_active_jobs = 1
+        self.assertTrue(admission.try_acquire())
+        response = self.service.UploadBatch(self.batch_chunks([SAMPLE_CSV]), None)
+        self.assertEqual(response.status, 'rejected')
+        admission.release(0)
+        
+        admission.max_inflight_bytes = len(SAMPLE_CSV) + 10
+        response = self.service.UploadBatch(self.batch_chunks([SAMPLE_CSV, SAMPLE_CSV]), None)
+        self.assertEqual(response.status, 'completed')
+        self.assertEqual(response.metrics.rows_processed, 6)
+        
+        admission.max_inflight_bytes = 64
+        response = self.service.UploadBatch(self.batch_chunks([SAMPLE_CSV]), None)
+        self.assertEqual(response.status, 'error')
+        
+        # Aggregated files release their bytes from worker callbacks
+        deadline = time.time() + 5
+        while admission.inflight_bytes and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual((admission.active_jobs, admission.inflight_bytes), (0, 0))
+    
+    def test_upload_with_column_mapping(self):
+        """Test an upload's column mapping selects the fields of a wide file."""
+        chunks = list(upload_chunks(
+            b'Region,Units,Dept,Day\nNorth,5,Books,2024-01-01\nSouth,3,Toys,2024-01-01\nEast,2,Books,2024-01-02\n'
+        ))
+        chunks[0].columns.department.name = 'Dept'
+        chunks[0].columns.date.name = 'day'
+        chunks[0].columns.sales.index = 1
+        
+        status = self.wait_for_job(self.service.UploadCSV(iter(chunks), None).job_id)
+        
+        self.assertEqual(status.status, 'completed')
+        self.assertEqual(
+            self.read_output(status.download_url),
+            'Department Name,Total Number of Sales\r\nBooks,7\r\nToys,3\r\n'
+        )
+    
+    def test_upload_with_unknown_column(self):
+        """Test mapping a column the header lacks fails the job."""
+        chunks = list(upload_chunks(SAMPLE_CSV))
+        chunks[0].columns.sales.name = 'Revenue'
+        
+        status = self.wait_for_job(self.service.UploadCSV(iter(chunks), None).job_id)
+        self.assertEqual(status.status, 'error')
+        self.assertIn('Revenue', status.error_message)
+    
+    def test_upload_with_row_filter(self):
+        """Test an upload's row filter limits aggregation and reports filtered rows."""
+        chunks = list(upload_chunks(SAMPLE_CSV))
+        chunks[0].row_filter.date_from = '2024-01-02'
+        
+        status = self.wait_for_job(self.service.UploadCSV(iter(chunks), None).job_id)
+        
+        self.assertEqual(status.status, 'completed')
+        self.assertEqual(
+            (status.metrics.rows_processed, status.metrics.rows_filtered, status.metrics.rows_skipped),
+            (1, 2, 1)
+        )
+        self.assertEqual(
+            self.read_output(status.download_url),
+            'Department Name,Total Number of Sales\r\nElectronics,150\r\n'
+        )
+    
+    def test_upload_with_invalid_row_filter(self):
+        """Test a malformed filter date or column mapping fails the upload with its own message."""
+        chunks = list(upload_chunks(SAMPLE_CSV))
+        chunks[0].row_filter.date_to = 'March'
+        
+        response = self.service.UploadCSV(iter(chunks), None)
+        self.assertEqual(response.status, 'error')
+        self.assertIn('March', response.message)
+        self.assertNotIn('Failed to receive', response.message)
+        
+        chunks = list(upload_chunks(SAMPLE_CSV))
+        chunks[0].columns.sales.index = -1
+        response = self.service.UploadCSV(iter(chunks), None)
+        self.assertEqual(response.status, 'error')
+        self.assertIn('must not be negative', response.message)
+    
+    def test_row_batch_upload(self):
+        """Test pre-parsed row batches produce the same result as the equivalent CSV."""
+        batches = [
+            (['Electronics', 'Clothing'], [0, 1], ['2024-01-01', '2024-01-01'], [100, 200]),
+            # Each batch has its own dictionary; the empty department is skipped
+            (['', 'Electronics'], [1, 0], ['2024-01-02', '2024-01-03'], [150, 5]),
+        ]
+        response = self.service.UploadCSV(row_batch_chunks(batches), None)
+        self.assertEqual(response.status, 'processing')
+        
+        status = self.wait_for_job(response.job_id)
+        self.assertEqual(status.status, 'completed')
+        self.assertEqual((status.metrics.rows_processed, status.metrics.rows_skipped), (3, 1))
+        self.assertIn('parse', [phase.phase for phase in status.metrics.phases])
+        self.assertEqual(
+            self.read_output(status.download_url),
+            'Department Name,Total Number of Sales\r\nClothing,200\r\nElectronics,250\r\n'
+        )
+    
+    def test_row_batch_upload_with_row_filter(self):
+        """Test an upload's row filter applies to row batches."""
+        chunks = list(row_batch_chunks([(['Books', 'Toys'], [0, 1, 0], ['2024-01-01', '2024-01-02', '2024-01-03'],
+                                         [1, 2, 4])]))
+        chunks[0].row_filter.date_from = '2024-01-02'
+        chunks[0].row_filter.include_departments.append('Books')
+        
+        status = self.wait_for_job(self.service.UploadCSV(iter(chunks), None).job_id)
+        self.assertEqual((status.metrics.rows_processed, status.metrics.rows_filtered), (1, 2))
+        self.assertEqual(self.read_output(status.download_url), 'Department Name,Total Number of Sales\r\nBooks,4\r\n')
+    
+    def test_row_batch_upload_rejects_csv_data(self):
+        """Test an upload cannot switch from row batches to CSV data."""
+        chunks = list(row_batch_chunks([(['Books'], [0], ['2024-01-01'], [1])]))
+        chunks.append(sales_pb2.UploadChunk(data=b'Books,2024-01-01,1\n'))
+        
+        response = self.service.UploadCSV(iter(chunks), None)
+        self.assertEqual(response.status, 'error')
+        self.assertEqual((self.service.admission.active_jobs, self.service.admission.inflight_bytes), (0, 0))
+    
+    def test_evicted_output_expires_job(self):
+        """Test evicting a job's result drops the job from the job table."""
+        response = self.service.UploadCSV(upload_chunks(SAMPLE_CSV), None)
+        status = self.wait_for_job(response.job_id)
+        filename = status.download_url.rsplit('/', 1)[-1]
+        
+        self.service.storage.max_age = 60
+        evicted = self.service.storage.sweep(now=time.time() + 120)
+        for evicted_filename, job_id in evicted:
+            self.service._on_output_evicted(evicted_filename, job_id)
+        
+        self.assertEqual(evicted, [(filename, response.job_id)])
+        self.assertIsNone(self.service.storage.locate(filename))
+        status = self.service.GetJobStatus(sales_pb2.JobStatusRequest(job_id=response.job_id), None)
+        self.assertEqual(status.status, 'not_found')
+    
+    def test_unknown_job(self):
+        """Test status of an unknown job."""
+        response = self.service.GetJobStatus(sales_pb2.JobStatusRequest(job_id='missing'), None)
+        self.assertEqual(response.status, 'not_found')
+    
+    def test_empty_upload(self):
+        """Test uploads with no data are rejected."""
+        response = self.service.UploadCSV(iter([]), None)
+        self.assertEqual(response.status, 'error')
+
+
+if __name__ == '__main__':
+    unittest.main()
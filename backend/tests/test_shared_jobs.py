@@ -0,0 +1,86 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from proto import sales_pb2
+from services.job_registry import JobRecord, JobRegistry
+from services.shared_jobs import SharedJobStore
+
+
+class TestSharedJobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmp_dir.name, 'jobs.db')
+        # Two workers of one server, each with its own registry
+        self.worker_a = JobRegistry(shared_store=SharedJobStore(db_path, owner='gen-a'))
+        self.worker_b = JobRegistry(shared_store=SharedJobStore(db_path, owner='gen-b'))
+    
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+    
+    def test_status_visible_from_other_worker(self):
+        """Test a job accepted by one worker is reported by another."""
+        self.worker_a.put(JobRecord(job_id='job', status='processing', cancel_event=threading.Event()))
+        self.assertEqual(self.worker_b.get('job').status, 'processing')
+        self.assertIsNone(self.worker_b.get_local('job'))
+        
+        metrics = sales_pb2.ProcessingMetrics(rows_processed=3, departments_count=2)
+        self.worker_a.put(JobRecord(job_id='job', status='completed', download_url='/processed/x.csv',
+                                    metrics=metrics))
+        response = self.worker_b.get('job').response
+        self.assertEqual(response.status, 'completed')
+        self.assertEqual(response.download_url, '/processed/x.csv')
+        self.assertEqual(response.metrics.rows_processed, 3)
+        
+        self.worker_a.pop('job')
+        self.assertIsNone(self.worker_b.get('job'))
+    
+    def test_cancel_request_reaches_owner(self):
+        """Test cancellation requested through another worker is delivered to the owner."""
+        self.worker_a.put(JobRecord(job_id='job', status='processing', cancel_event=threading.Event()))
+        
+        self.assertTrue(self.worker_b.shared_store.request_cancel('job'))
+        self.assertEqual(self.worker_b.get('job').status, 'cancelling')
+        
+        self.assertEqual(self.worker_b.shared_store.take_cancel_requests(), [])
+        self.assertEqual(self.worker_a.shared_store.take_cancel_requests(), ['job'])
+        self.assertEqual(self.worker_a.shared_store.take_cancel_requests(), [])
+    
+    def test_cancel_request_ignored_for_finished_job(self):
+        """Test finished jobs cannot be marked cancelling."""
+        self.worker_a.put(JobRecord(job_id='job', status='completed'))
+        self.assertFalse(self.worker_b.shared_store.request_cancel('job'))
+        self.assertEqual(self.worker_b.get('job').status, 'completed')
+    
+    def test_fail_owner_marks_unfinished_jobs(self):
+        """Test the unfinished jobs of an exited worker generation are failed, and only those."""
+        self.worker_a.put(JobRecord(job_id='running', status='processing', cancel_event=threading.Event()))
+        self.worker_a.put(JobRecord(job_id='cancelling', status='processing', cancel_event=threading.Event()))
+        self.worker_a.put(JobRecord(job_id='done', status='completed', download_url='/processed/x.csv'))
+        self.worker_b.put(JobRecord(job_id='other', status='processing', cancel_event=threading.Event()))
+        self.worker_b.shared_store.request_cancel('cancelling')
+        
+        self.assertEqual(self.worker_b.shared_store.fail_owner('gen-a', 'Worker exited'), 2)
+        
+        for job_id in ('running', 'cancelling'):
+            response = self.worker_b.get(job_id).response
+            self.assertEqual(response.status, 'error')
+            self.assertEqual(response.error_message, 'Worker exited')
+        self.assertEqual(self.worker_b.get('done').status, 'completed')
+        self.assertEqual(self.worker_a.get('other').status, 'processing')
+        self.assertEqual(self.worker_a.shared_store.take_cancel_requests(), [])
+        self.assertEqual(self.worker_b.shared_store.fail_owner('gen-a', 'Worker exited'), 0)
+    
+    def test_default_owner_is_fresh_generation(self):
+        """Test stores opened without an owner never share one, even within a process."""
+        db_path = os.path.join(self.tmp_dir.name, 'jobs.db')
+        self.assertNotEqual(SharedJobStore(db_path).owner, SharedJobStore(db_path).owner)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+import unittest
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.status_cache import StatusCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestStatusCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.calls = 0
+    
+    def _loader(self, status):
+        def load():
+            self.calls += 1
+            return {'status': status}
+        return load
+    
+    def test_processing_status_expires_after_ttl(self):
+        """Test processing statuses are refreshed once the TTL passes."""
+        cache = StatusCache(processing_ttl=0.5, clock=self.clock)
+        
+        cache.get('job', self._loader('processing'))
+        cache.get('job', self._loader('processing'))
+        self.assertEqual(self.calls, 1)
+        
+        self.clock.now = 0.6
+        cache.get('job', self._loader('processing'))
+        self.assertEqual(self.calls, 2)
+    
+    def test_terminal_status_cached_until_evicted(self):
+        """Test terminal statuses without a terminal TTL never expire but are LRU-evicted."""
+        cache = StatusCache(processing_ttl=0.5, max_entries=2, terminal_ttl=0, clock=self.clock)
+        
+        cache.get('a', self._loader('completed'))
+        self.clock.now = 1000
+        cache.get('a', self._loader('completed'))
+        self.assertEqual(self.calls, 1)
+        
+        cache.get('b', self._loader('error'))
+        cache.get('c', self._loader('completed'))
+        cache.get('a', self._loader('completed'))
+        self.assertEqual(self.calls, 4)
+    
+    def test_terminal_status_expires_after_terminal_ttl(self):
+        """Test terminal statuses outlive the processing TTL but are refreshed after the terminal TTL."""
+        cache = StatusCache(processing_ttl=0.5, terminal_ttl=60, clock=self.clock)
+        
+        cache.get('job', self._loader('completed'))
+        self.clock.now = 59
+        cache.get('job', self._loader('completed'))
+        self.assertEqual(self.calls, 1)
+        
+        self.clock.now = 61
+        cache.get('job', self._loader('completed'))
+        self.assertEqual(self.calls, 2)
+    
+    def test_invalidate_download(self):
+        """Test statuses linking to a missing download are dropped, others kept."""
+        cache = StatusCache(clock=self.clock)
+        cache.get('a', lambda: {'status': 'completed', 'download_url': '/processed/a.csv'})
+        cache.get('b', lambda: {'status': 'completed', 'download_url': '/processed/b.csv'})
+        
+        self.assertEqual(cache.invalidate_download('/processed/a.csv'), 1)
+        self.assertEqual(cache.invalidate_download('/processed/a.csv'), 0)
+        cache.get('a', self._loader('completed'))
+        cache.get('b', self._loader('completed'))
+        self.assertEqual(self.calls, 1)
+    
+    def test_not_found_is_not_cached(self):
+        """Test unknown jobs always go to the backend."""
+        cache = StatusCache(clock=self.clock)
+        cache.get('job', self._loader('not_found'))
+        cache.get('job', self._loader('not_found'))
+        self.assertEqual(self.calls, 2)
+    
+    def test_concurrent_lookups_are_coalesced(self):
+        """Test concurrent misses share one backend call."""
+        cache = StatusCache()
+        release = threading.Event()
+        
+        def slow_loader():
+            self.calls += 1
+            release.wait(5)
+            return {'status': 'processing'}
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get('job', slow_loader)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        while cache.stats()['coalesced'] < 7:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(cache.stats()['misses'], 1)
+    
+    def test_loader_errors_are_not_cached(self):
+        """Test a failed lookup is retried on the next call."""
+        cache = StatusCache(clock=self.clock)
+        
+        def failing_loader():
+            raise RuntimeError('backend down')
+        
+        with self.assertRaises(RuntimeError):
+            cache.get('job', failing_loader)
+        self.assertEqual(cache.get('job', self._loader('completed')), {'status': 'completed'})
+    
+    def test_invalidate(self):
+        """Test invalidated entries are reloaded."""
+        cache = StatusCache(clock=self.clock)
+        cache.get('job', self._loader('completed'))
+        cache.invalidate('job')
+        cache.get('job', self._loader('completed'))
+        self.assertEqual(self.calls, 2)
+    
+    
+    def test_async_lookups_are_coalesced(self):
+        """Test concurrent coroutine misses share one backend call and then hit the cache."""
+        cache = StatusCache(clock=self.clock)
+        
+        async def run():
+            release = asyncio.Event()
+            
+            async def slow_loader():
+                self.calls += 1
+                await release.wait()
+                return {'status': 'completed'}
+            
+            tasks = [asyncio.create_task(cache.get_async('job', slow_loader)) for _ in range(8)]
+            while cache.stats()['coalesced'] < 7:
+                await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(*tasks)
+            results.append(await cache.get_async('job', slow_loader))
+            return results
+        
+        results = asyncio.run(run())
+        self.assertEqual(results, [{'status': 'completed'}] * 9)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+    
+    def test_async_leader_cancellation_reruns_lookup(self):
+        """Test waiters coalesced on a cancelled leader load the status themselves instead of failing."""
+        cache = StatusCache(clock=self.clock)
+        
+        async def run():
+            started = asyncio.Event()
+            
+            async def loader():
+                self.calls += 1
+                if self.calls == 1:
+                    started.set()
+                    await asyncio.Event().wait()
+                return {'status': 'completed'}
+            
+            leader = asyncio.create_task(cache.get_async('job', loader))
+            await started.wait()
+            waiters = [asyncio.create_task(cache.get_async('job', loader)) for _ in range(3)]
+            while cache.stats()['coalesced'] < 3:
+                await asyncio.sleep(0)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await asyncio.gather(*waiters)
+        
+        self.assertEqual(asyncio.run(run()), [{'status': 'completed'}] * 3)
+        self.assertEqual(self.calls, 2)
+    
+    def test_async_loader_errors_are_not_cached(self):
+        """Test a failed coroutine lookup propagates and is retried on the next call."""
+        cache = StatusCache(clock=self.clock)
+        
+        async def failing_loader():
+            raise RuntimeError('backend down')
+        
+        async def completed_loader():
+            return {'status': 'completed'}
+        
+        with self.assertRaises(RuntimeError):
+            asyncio.run(cache.get_async('job', failing_loader))
+        self.assertEqual(asyncio.run(cache.get_async('job', completed_loader)), {'status': 'completed'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.storage_manager import ACCESS_RESOLUTION, StorageManager, shard_dir
+
+
+class TestStorageManager(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = StorageManager(self.tmp_dir.name)
+    
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+    
+    def write(self, filename: str, size: int, now: float = 1000.0, job_id: str = '') -> str:
+        path = self.storage.path_for(filename)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        self.storage.register(filename, job_id, now=now)
+        return path
+    
+    def test_sharded_layout(self):
+        """Test outputs land in two levels of hashed subdirectories and are located there."""
+        path = self.write('a' * 32 + '.csv', 10)
+        
+        relative = os.path.relpath(path, self.tmp_dir.name)
+        self.assertEqual(relative, os.path.join(shard_dir('a' * 32 + '.csv'), 'a' * 32 + '.csv'))
+        self.assertEqual(len(relative.split(os.sep)), 3)
+        self.assertEqual(self.storage.locate('a' * 32 + '.csv'), path)
+    
+    def test_locate_flat_fallback(self):
+        """Test files outside the shards (older outputs, datasets) are still found."""
+        flat_path = os.path.join(self.tmp_dir.name, 'dataset-sales-v1.csv')
+        with open(flat_path, 'w') as f:
+            f.write('x')
+        
+        self.assertEqual(self.storage.locate('dataset-sales-v1.csv'), flat_path)
+        self.assertIsNone(self.storage.locate('missing.csv'))
+    
+    def test_register_counts_gzip_sibling(self):
+        """Test a result's tracked size includes its precompressed copy."""
+        path = self.storage.path_for('r.csv')
+        for candidate, size in ((path, 100), (path + '.gz', 30)):
+            with open(candidate, 'wb') as f:
+                f.write(b'x' * size)
+        self.storage.register('r.csv', 'job-1')
+        
+        self.assertEqual(self.storage.usage()['bytes'], 130)
+        self.storage.remove('r.csv')
+        self.assertFalse(os.path.exists(path + '.gz'))
+        self.assertEqual(self.storage.usage()['files'], 0)
+    
+    def test_sweep_by_age(self):
+        """Test outputs not accessed within max_age are evicted with their job ids."""
+        self.storage.max_age = 3600
+        self.write('old.csv', 10, now=1000.0, job_id='job-old')
+        self.write('new.csv', 10, now=5000.0, job_id='job-new')
+        
+        self.assertEqual(self.storage.sweep(now=5000.0), [('old.csv', 'job-old')])
+        self.assertIsNone(self.storage.locate('old.csv'))
+        self.assertIsNotNone(self.storage.locate('new.csv'))
+    
+    def test_sweep_by_size_evicts_least_recently_accessed(self):
+        """Test the byte budget evicts by last access, so downloads keep outputs alive."""
+        self.storage.max_bytes = 250
+        for index, name in enumerate(('a.csv', 'b.csv', 'c.csv')):
+            self.write(name, 100, now=1000.0 + index)
+        self.storage.touch('a.csv', now=1000.0 + ACCESS_RESOLUTION + 10)
+        
+        self.assertEqual([name for name, _ in self.storage.sweep(now=2000.0)], ['b.csv'])
+        usage = self.storage.usage()
+        self.assertEqual((usage['files'], usage['bytes']), (2, 200))
+        self.assertEqual((usage['evicted_files'], usage['evicted_bytes'], usage['last_sweep']), (1, 100, 2000.0))
+    
+    def test_touch_is_throttled(self):
+        """Test repeated downloads within ACCESS_RESOLUTION record one access."""
+        self.write('a.csv', 10, now=1000.0)
+        self.storage.touch('a.csv', now=1000.0 + ACCESS_RESOLUTION + 1)
+        self.storage.touch('a.csv', now=1000.0 + ACCESS_RESOLUTION + 5)
+        
+        last_access = self.storage._connection().execute(
+            "SELECT last_access FROM outputs WHERE filename = 'a.csv'"
+        ).fetchone()[0]
+        self.assertEqual(last_access, 1000.0 + ACCESS_RESOLUTION + 1)
+    
+    def test_concurrent_sweeps_evict_once(self):
+        """Test two managers sharing the index never evict the same output twice."""
+        self.storage.max_age = 10
+        self.write('a.csv', 10, now=1000.0)
+        other = StorageManager(self.tmp_dir.name, max_age=10)
+        
+        self.assertEqual(len(self.storage.sweep(now=2000.0)), 1)
+        self.assertEqual(other.sweep(now=2000.0), [])
+        self.assertEqual(other.usage()['evicted_files'], 1)
+    
+    def test_adopt_legacy(self):
+        """Test flat results and profiles move into shards; other files stay put."""
+        names = ['b' * 32 + '.csv', 'b' * 32 + '.csv.gz', 'profile-00000000-0000-0000-0000-000000000000.prof',
+                 'dataset-sales-v2.csv']
+        for name in names:
+            with open(os.path.join(self.tmp_dir.name, name), 'wb') as f:
+                f.write(b'x' * 10)
+        
+        self.assertEqual(self.storage.adopt_legacy(), 3)
+        
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp_dir.name, 'dataset-sales-v2.csv')))
+        self.assertEqual(self.storage.locate(names[0]), self.storage.path_for(names[0]))
+        usage = self.storage.usage()
+        self.assertEqual((usage['files'], usage['bytes']), (2, 30))
+
+
+if __name__ == '__main__':
+    unittest.main()
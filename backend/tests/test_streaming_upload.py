@@ -0,0 +1,97 @@
+import unittest
+import asyncio
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.streaming_upload import AsyncMultipartFileReader, MultipartFileReader, arechunk, iter_raw_body, rechunk
+
+
+def _multipart_body(boundary: str, filename: str, content: bytes) -> bytes:
+    return (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="note"\r\n\r\n'
+        f'hello\r\n'
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+
+
+class TestStreamingUpload(unittest.TestCase):
+
+    def test_rechunk_sizes(self):
+        """Test pieces are coalesced into fixed-size chunks."""
+        chunks = list(rechunk(iter([b'ab', b'cdefg', b'h', b'ijk']), 4))
+        self.assertEqual(chunks, [b'abcd', b'efgh', b'ijk'])
+    
+    def test_iter_raw_body(self):
+        """Test raw bodies are split into chunk_size pieces."""
+        data = os.urandom(300 * 1024)
+        chunks = list(iter_raw_body(io.BytesIO(data), chunk_size=100 * 1024))
+        
+        self.assertEqual([len(c) for c in chunks], [100 * 1024] * 3)
+        self.assertEqual(b''.join(chunks), data)
+    
+    def test_multipart_file_extraction(self):
+        """Test the file field is extracted without surrounding form data."""
+        content = b'Department Name,Date,Number of Sales\r\n' + b'Books,2024-01-01,5\r\n' * 20000
+        body = _multipart_body('XyZ', 'sales.csv', content)
+        
+        reader = MultipartFileReader(io.BytesIO(body), b'XyZ')
+        self.assertEqual(reader.open(), 'sales.csv')
+        chunks = list(reader.iter_chunks(chunk_size=64 * 1024))
+        
+        self.assertEqual(b''.join(chunks), content)
+        self.assertTrue(all(len(c) == 64 * 1024 for c in chunks[:-1]))
+    
+    def test_multipart_without_file_field(self):
+        """Test bodies with no file field."""
+        body = b'--XyZ\r\nContent-Disposition: form-data; name="note"\r\n\r\nhello\r\n--XyZ--\r\n'
+        reader = MultipartFileReader(io.BytesIO(body), b'XyZ')
+        self.assertIsNone(reader.open())
+    
+    def test_truncated_multipart_raises(self):
+        """Test a body cut off mid-file is reported as malformed."""
+        body = _multipart_body('XyZ', 'sales.csv', b'a,b,c\n' * 1000)[:-100]
+        reader = MultipartFileReader(io.BytesIO(body), b'XyZ')
+        reader.open()
+        with self.assertRaises(ValueError):
+            list(reader.iter_chunks())
+
+    
+    def test_async_multipart_file_extraction(self):
+        """Test the async reader extracts the file from a body arriving in small pieces."""
+        content = b'Department Name,Date,Number of Sales\r\n' + b'Books,2024-01-01,5\r\n' * 5000
+        body = _multipart_body('XyZ', 'sales.csv', content)
+        
+        async def pieces():
+            for i in range(0, len(body), 1000):
+                yield body[i:i + 1000]
+        
+        async def read():
+            reader = AsyncMultipartFileReader(pieces(), b'XyZ')
+            filename = await reader.open()
+            return filename, [chunk async for chunk in reader.iter_chunks(chunk_size=16 * 1024)]
+        
+        filename, chunks = asyncio.run(read())
+        self.assertEqual(filename, 'sales.csv')
+        self.assertEqual(b''.join(chunks), content)
+        self.assertTrue(all(len(c) == 16 * 1024 for c in chunks[:-1]))
+    
+    def test_async_rechunk_sizes(self):
+        """Test async pieces are coalesced into fixed-size chunks."""
+        async def pieces():
+            for piece in (b'ab', b'cdefg', b'h', b'ijk'):
+                yield piece
+        
+        async def collect():
+            return [chunk async for chunk in arechunk(pieces(), 4)]
+        
+        self.assertEqual(asyncio.run(collect()), [b'abcd', b'efgh', b'ijk'])
+
+
+if __name__ == '__main__':
+    unittest.main()
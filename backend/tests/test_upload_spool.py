@@ -0,0 +1,109 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.upload_spool import UploadSpool
+
+
+class TestUploadSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.spool = UploadSpool(self.tmp_dir.name)
+    
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+    
+    def test_append_tracks_committed_offset(self):
+        """Test appends advance the committed offset."""
+        session_id = self.spool.create('sales.csv', total_size=10)
+        
+        self.assertEqual(self.spool.append(session_id, 0, b'hello'), 5)
+        self.assertEqual(self.spool.append(session_id, 5, b'world'), 10)
+        self.assertEqual(self.spool.committed_offset(session_id), 10)
+        self.assertEqual(b''.join(self.spool.iter_data(session_id)), b'helloworld')
+    
+    def test_retransmitted_bytes_are_skipped(self):
+        """Test overlapping chunks only append the new bytes."""
+        session_id = self.spool.create('sales.csv')
+        self.spool.append(session_id, 0, b'hello')
+        
+        self.assertEqual(self.spool.append(session_id, 3, b'loworld'), 10)
+        self.assertEqual(self.spool.append(session_id, 0, b'hel'), 10)
+        self.assertEqual(b''.join(self.spool.iter_data(session_id)), b'helloworld')
+    
+    def test_gap_is_rejected(self):
+        """Test chunks beyond the committed offset raise."""
+        session_id = self.spool.create('sales.csv')
+        with self.assertRaises(ValueError):
+            self.spool.append(session_id, 4, b'data')
+    
+    def test_session_survives_new_spool_instance(self):
+        """Test sessions are persisted on disk."""
+        session_id = self.spool.create('sales.csv', total_size=100)
+        self.spool.append(session_id, 0, b'abc')
+        
+        reopened = UploadSpool(self.tmp_dir.name)
+        self.assertEqual(reopened.metadata(session_id)['filename'], 'sales.csv')
+        self.assertEqual(reopened.committed_offset(session_id), 3)
+    
+    def test_single_writer(self):
+        """Test a session can only be claimed by one stream at a time."""
+        session_id = self.spool.create('sales.csv')
+        self.assertTrue(self.spool.acquire(session_id))
+        self.assertFalse(self.spool.acquire(session_id))
+        self.spool.release(session_id)
+        self.assertTrue(self.spool.acquire(session_id))
+    
+    def test_claim_excludes_other_processes(self):
+        """Test a session claimed by another process can be neither claimed nor expired here."""
+        session_id = self.spool.create('sales.csv')
+        holder = subprocess.Popen(
+            [sys.executable, '-c',
+             'import sys; from utils.upload_spool import UploadSpool; spool = UploadSpool(sys.argv[1]); '
+             'print(spool.acquire(sys.argv[2]), flush=True); sys.stdin.read()',
+             self.tmp_dir.name, session_id],
+            cwd=os.path.join(os.path.dirname(__file__), '..'),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        try:
+            self.assertEqual(holder.stdout.readline().strip(), 'True')
+            self.assertFalse(self.spool.acquire(session_id))
+            self.assertEqual(self.spool.expire(0, now=time.time() + 3600), 0)
+        finally:
+            holder.communicate('')
+        
+        self.assertTrue(self.spool.acquire(session_id))
+        self.spool.release(session_id)
+        self.assertEqual(self.spool.expire(0, now=time.time() + 3600), 1)
+    
+    def test_expire_idle_sessions(self):
+        """Test sessions idle past the TTL are deleted unless a stream holds them."""
+        idle = self.spool.create('idle.csv')
+        self.spool.append(idle, 0, b'abc')
+        held = self.spool.create('held.csv')
+        self.spool.acquire(held)
+        fresh = self.spool.create('fresh.csv')
+        for session_id in (idle, held):
+            for ext in ('.json', '.part'):
+                path = os.path.join(self.tmp_dir.name, session_id + ext)
+                os.utime(path, (time.time() - 7200, time.time() - 7200))
+        
+        self.assertEqual(self.spool.expire(3600), 1)
+        self.assertIsNone(self.spool.metadata(idle))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir.name, idle + '.part')))
+        self.assertIsNotNone(self.spool.metadata(held))
+        self.assertIsNotNone(self.spool.metadata(fresh))
+    
+    def test_invalid_session_id(self):
+        """Test path-like session ids are rejected."""
+        self.assertIsNone(self.spool.metadata('../etc/passwd'))
+
+
+if __name__ == '__main__':
+    unittest.main()
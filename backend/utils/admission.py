@@ -0,0 +1,115 @@
+"""
+Admission control for uploads buffered in memory.
+
+The server counts the bytes held by accepted uploads and the jobs still
+running, and turns new uploads away while either is at its limit instead
+of queueing them until the process runs out of memory. Listeners are told
+whenever the server enters or leaves the overloaded state, which drives
+the gRPC health status.
+"""
+import threading
+from typing import Callable, List
+
+# Suggested wait before a rejected client retries
+DEFAULT_RETRY_AFTER_MS = 1000
+
+
+class AdmissionRejected(Exception):
+    """Raised when an upload is turned away because the server is at capacity."""
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload needs more memory than the in-flight limit allows, so retrying cannot help."""
+
+
+class AdmissionController:
+    """Counters of in-flight upload bytes and active jobs with fixed limits."""
+    
+    def __init__(self, max_inflight_bytes: int = 0, max_active_jobs: int = 0,
+                 retry_after_ms: int = DEFAULT_RETRY_AFTER_MS):
+        """
+        Initialize admission controller.
+        
+        Args:
+            max_inflight_bytes: Bytes accepted uploads may hold in memory (0 for no limit)
+            max_active_jobs: Uploads that may be buffering or processing at once (0 for no limit)
+            retry_after_ms: Retry hint given to rejected clients
+        """
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_active_jobs = max_active_jobs
+        self.retry_after_ms = retry_after_ms
+        self.inflight_bytes = 0
+        self.active_jobs = 0
+        self._overloaded = False
+        self._listeners: List[Callable[[bool], None]] = []
+        self._lock = threading.Lock()
+    
+    def _at_limit(self) -> bool:
+        """Return True if no further upload can be admitted; callers hold self._lock."""
+        return bool(
+            (self.max_active_jobs and self.active_jobs >= self.max_active_jobs) or
+            (self.max_inflight_bytes and self.inflight_bytes >= self.max_inflight_bytes)
+        )
+    
+    def _update_state(self) -> None:
+        """Notify listeners if the overloaded state changed; callers hold self._lock."""
+        overloaded = self._at_limit()
+        if overloaded != self._overloaded:
+            self._overloaded = overloaded
+            for listener in self._listeners:
+                listener(overloaded)
+    
+    def add_listener(self, listener: Callable[[bool], None]) -> None:
+        """Call listener(overloaded) each time the overloaded state changes."""
+        with self._lock:
+            self._listeners.append(listener)
+    
+    def overloaded(self) -> bool:
+        """Return True while new uploads are being rejected."""
+        with self._lock:
+            return self._overloaded
+    
+    def try_acquire(self) -> bool:
+        """
+        Admit one upload.
+        
+        Returns:
+            True if admitted; the caller must release() it when the job ends
+        """
+        with self._lock:
+            if self._at_limit():
+                return False
+            self.active_jobs += 1
+            self._update_state()
+            return True
+    
+    def add_bytes(self, nbytes: int) -> bool:
+        """
+        Account for more data buffered by an admitted upload.
+        
+        Returns:
+            False if the data would cross the in-flight byte limit (nothing is added)
+        """
+        with self._lock:
+            if self.max_inflight_bytes and self.inflight_bytes + nbytes > self.max_inflight_bytes:
+                return False
+            self.inflight_bytes += nbytes
+            self._update_state()
+            return True
+    
+    def exceeds_limit(self, nbytes: int) -> bool:
+        """Return True if one upload holding nbytes could never be admitted, even on an idle server."""
+        return bool(self.max_inflight_bytes and nbytes > self.max_inflight_bytes)
+    
+    def release_bytes(self, nbytes: int) -> None:
+        """Return data an admitted upload no longer holds, keeping the upload admitted."""
+        with self._lock:
+            self.inflight_bytes -= nbytes
+            self._update_state()
+    
+    def release(self, nbytes: int) -> None:
+        """End an admitted upload that held nbytes."""
+        with self._lock:
+            self.active_jobs -= 1
+            self.inflight_bytes -= nbytes
+            self._update_state()
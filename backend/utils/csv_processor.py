@@ -1,14 +1,165 @@
 import csv
+import gzip
 import io
 from collections import defaultdict
-from typing import Dict, Iterator
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Sequence, Tuple, Union
 from uuid import uuid4
 import os
-from datetime import datetime
+import tempfile
+import time
+from datetime import date, datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+OUTPUT_HEADER = ['Department Name', 'Total Number of Sales']
+
+# Write buffer for result files; large enough that typical outputs hit the disk in a single write
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# Rows parsed between checks for a pending cancellation
+CANCEL_CHECK_INTERVAL = 10000
+
+# Logical fields read from each row and their default column positions
+DEFAULT_COLUMNS = {'department': 0, 'date': 1, 'sales': 2}
+
+# Row batches carry dates as days since 1970-01-01; valid ones fall within 0001-01-01..9999-12-31
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MIN_DAY = date.min.toordinal() - EPOCH_ORDINAL
+MAX_DAY = date.max.toordinal() - EPOCH_ORDINAL
+
+
+def resolve_columns(header: Optional[list],
+                    columns: Optional[Mapping[str, Union[int, str]]] = None) -> Tuple[int, int, int]:
+    """
+    Resolve a column mapping to (department, date, sales) column indices.
+    
+    Args:
+        header: Header row fields, or None if the input has no header
+        columns: Logical field -> header name or 0-based index; unmapped
+            fields keep their default position
+    
+    Returns:
+        Column indices of department, date and sales
+    
+    Raises:
+        ValueError: If a field is unknown, a named column is not in the header,
+            or a column lies beyond the header
+    """
+    mapping = dict(DEFAULT_COLUMNS)
+    for field, ref in (columns or {}).items():
+        if field not in mapping:
+            raise ValueError(f"Unknown column mapping field {field!r}")
+        mapping[field] = ref
+    
+    names = [name.strip() for name in header] if header is not None else None
+    indices = []
+    for field in DEFAULT_COLUMNS:
+        ref = mapping[field]
+        if isinstance(ref, str):
+            if names is None:
+                raise ValueError(f"Column {ref!r} cannot be found without a header row")
+            if ref.strip() in names:
+                ref = names.index(ref.strip())
+            else:
+                # Fall back to a case-insensitive match
+                folded = [name.casefold() for name in names]
+                if ref.strip().casefold() not in folded:
+                    raise ValueError(f"Column {ref!r} for {field} not found in header")
+                ref = folded.index(ref.strip().casefold())
+        elif ref < 0:
+            raise ValueError(f"Column index for {field} must not be negative")
+        indices.append(ref)
+    
+    if names is not None and max(indices) >= len(names):
+        if columns:
+            raise ValueError(f"Header has {len(names)} columns, mapping needs {max(indices) + 1}")
+        raise ValueError("CSV must have at least 3 columns: Department Name, Date, Number of Sales")
+    return indices[0], indices[1], indices[2]
+
+
+def day_number(value: str) -> int:
+    """
+    Convert a YYYY-MM-DD date to its row batch day number (days since 1970-01-01).
+    
+    Raises:
+        ValueError: If value is not a valid YYYY-MM-DD date
+    """
+    return datetime.strptime(value, '%Y-%m-%d').toordinal() - EPOCH_ORDINAL
+
+
+def _pad_date(value: str) -> str:
+    """Zero-pad a date like 2024-1-5 that strptime accepts; other values are returned unchanged."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        return value
+
+
+def _is_iso_date(value: str) -> bool:
+    """Whether value parses as a YYYY-MM-DD date."""
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return False
+    return True
+
+
+class RowFilter:
+    """
+    Row predicates pushed down into parsing.
+    
+    Dates are compared as YYYY-MM-DD strings, whose lexical order is their
+    chronological order, so no datetime is built for a row that is filtered
+    out. Dates without zero padding (2024-1-5), which validation accepts,
+    are padded before they are compared. Bounds are inclusive; an empty
+    bound or set does not filter.
+    """
+    
+    def __init__(self, date_from: str = '', date_to: str = '',
+                 include_departments: Iterable[str] = (), exclude_departments: Iterable[str] = ()):
+        """
+        Initialize row filter.
+        
+        Args:
+            date_from: Earliest date kept (YYYY-MM-DD), or '' for no lower bound
+            date_to: Latest date kept (YYYY-MM-DD), or '' for no upper bound
+            include_departments: If not empty, only these departments are kept
+            exclude_departments: Departments dropped even if included
+        
+        Raises:
+            ValueError: If a bound is not a YYYY-MM-DD date or the range is empty
+        """
+        for bound in (date_from, date_to):
+            # Only the zero-padded form compares correctly as a string
+            if bound and (len(bound) != 10 or not _is_iso_date(bound)):
+                raise ValueError(f"Invalid filter date {bound!r}, expected YYYY-MM-DD")
+        if date_from and date_to and date_from > date_to:
+            raise ValueError(f"Filter date range {date_from}..{date_to} is empty")
+        self.date_from = date_from or None
+        self.date_to = date_to or None
+        # The same bounds for row batches, whose dates are day numbers
+        self.day_from = day_number(date_from) if date_from else None
+        self.day_to = day_number(date_to) if date_to else None
+        self.include = frozenset(dept.strip() for dept in include_departments) or None
+        self.exclude = frozenset(dept.strip() for dept in exclude_departments) or None
+    
+    def __bool__(self) -> bool:
+        """Whether the filter can drop any row."""
+        return any(value is not None for value in (self.date_from, self.date_to, self.include, self.exclude))
+
+
+class JobCancelled(Exception):
+    """Raised inside processing when a job's cancellation has been requested."""
+    
+    def __init__(self, rows_processed: int = 0, rows_skipped: int = 0, departments_count: int = 0,
+                 rows_filtered: int = 0):
+        super().__init__("Job cancelled")
+        self.rows_processed = rows_processed
+        self.rows_skipped = rows_skipped
+        self.departments_count = departments_count
+        self.rows_filtered = rows_filtered
+
 
 def aggregate_sales_from_stream(stream: Iterator[str]) -> Dict[str, int]:
     """
@@ -91,17 +242,431 @@ def aggregate_sales_from_stream(stream: Iterator[str]) -> Dict[str, int]:
     return dept_counts
 
 
-def write_output_csv(dept_counts: Dict[str, int], output_path: str) -> None:
-    """Write aggregated results to output CSV file."""
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+class SalesAggregator:
+    """
+    Incremental CSV aggregation over raw byte chunks.
+    
+    Chunks are fed as they arrive; complete lines are decoded and parsed in
+    batches and any trailing partial line is carried into the next chunk, so
+    the input is never joined into a single buffer. Quote parity is tracked
+    across chunks, so a newline inside a quoted field never ends a block. Partial aggregates from
+    separate parts of one file can be combined with merge().
+    
+    Only the department, date and sales columns are extracted. Blocks
+    without quotes are split per line only up to the last of those columns,
+    so the width of the file barely matters; blocks with quotes go through
+    csv.reader.
+    
+    A RowFilter is applied as soon as a row's department and date are
+    extracted; rows it drops are counted in rows_filtered, not rows_skipped,
+    and are never validated.
+    
+    Pre-parsed columnar row batches are consumed by feed_rows() under the
+    same filtering and validation rules, without any text parsing.
+    
+    CSV Format Expected (positions can be remapped with columns):
+    - Column 1: Department Name (string)
+    - Column 2: Date (ISO format: YYYY-MM-DD)
+    - Column 3: Number of Sales (integer)
+    """
+    
+    def __init__(self, has_header: bool = True, cancel_event=None, timings=None,
+                 columns: Optional[Mapping[str, Union[int, str]]] = None,
+                 row_filter: Optional[RowFilter] = None):
+        """
+        Initialize aggregator.
+        
+        Args:
+            has_header: Whether the first line is a header row (False for non-initial parts)
+            cancel_event: Optional threading.Event checked every CANCEL_CHECK_INTERVAL rows
+            timings: Optional PhaseTimings charged with decode and parse time per block
+            columns: Optional mapping of 'department', 'date' and 'sales' to header
+                names or 0-based indices, resolved once from the header row
+            row_filter: Optional RowFilter; rows it rejects are counted, not aggregated
+        
+        Raises:
+            ValueError: If columns names header columns but there is no header
+        """
+        self.dept_counts: Dict[str, int] = defaultdict(int)
+        self.rows_processed = 0
+        self.rows_skipped = 0
+        self.rows_filtered = 0
+        self.bytes_received = 0
+        self.cancel_event = cancel_event
+        self.timings = timings
+        self._columns = columns
+        self._row_filter = row_filter if row_filter else None
+        # Resolved when the header is read; fixed up front for headerless parts
+        self._indices = None if has_header else resolve_columns(None, columns)
+        self._expect_header = has_header
+        self._pending = b''
+        # Whether _pending ends inside a quoted field, so its next newline is data
+        self._quote_open = False
+        self._row_num = 1 if has_header else 0
+    
+    def feed(self, data: bytes) -> None:
+        """Consume a chunk of raw CSV bytes."""
+        if not data:
+            return
+        self.bytes_received += len(data)
+        
+        end = data.rfind(b'\n')
+        if self._quote_open or b'"' in data:
+            end = self._last_row_end(data, end)
+        if end == -1:
+            self._pending += data
+            return
+        
+        # Splitting on b'\n' is safe for UTF-8: it never occurs inside a multi-byte sequence
+        block = self._pending + data[:end + 1] if self._pending else data[:end + 1]
+        self._pending = data[end + 1:]
+        self._parse(block)
+    
+    def _last_row_end(self, data: bytes, end: int) -> int:
+        """
+        Find the last newline in data that ends a row rather than a quoted field.
+        
+        A newline ends a row when the quotes before it, counted from the
+        start of the carried partial line, are balanced. Sets _quote_open
+        for the bytes carried after the returned position.
+        
+        Returns:
+            Offset of that newline, or -1 if data ends no row
+        """
+        # Quote parity at the end of data; escaped quotes ("") cancel out
+        open_at_end = self._quote_open ^ (data.count(b'"') % 2 == 1)
+        tail_quotes = 0
+        tail_start = len(data)
+        while end != -1:
+            tail_quotes += data.count(b'"', end + 1, tail_start)
+            tail_start = end + 1
+            if open_at_end == (tail_quotes % 2 == 1):
+                self._quote_open = bool(tail_quotes % 2)
+                return end
+            end = data.rfind(b'\n', 0, end)
+        self._quote_open = open_at_end
+        return -1
+    
+    def feed_rows(self, departments: Sequence[str], department_ids: Sequence[int], days: Sequence[int],
+                  sales: Sequence[int], nbytes: int = 0) -> None:
+        """
+        Consume a batch of pre-parsed rows given as parallel columns.
+        
+        Rows are checked like parsed CSV rows: filtered rows are dropped
+        first, then rows with an empty department, a day outside
+        MIN_DAY..MAX_DAY or negative sales are skipped. Rows whose
+        department id is outside the dictionary, and trailing rows missing
+        from a shorter column, are skipped as malformed. A batch with no
+        invalid rows and no filter is summed in a single pass with its range
+        checks done by min()/max().
+        
+        Args:
+            departments: The batch's dictionary of department names
+            department_ids: Per row, an index into departments
+            days: Per row, the sale date as days since 1970-01-01
+            sales: Per row, the number of sales
+            nbytes: Encoded size of the batch, added to bytes_received
+        
+        Raises:
+            JobCancelled: If cancel_event is set when the batch arrives
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise JobCancelled(self.rows_processed, self.rows_skipped, len(self.dept_counts), self.rows_filtered)
+        timings = self.timings
+        start = time.perf_counter() if timings is not None else 0.0
+        self.bytes_received += nbytes
+        
+        # Columns are copied to lists once: the checks below make several passes over them
+        names = [name.strip() for name in departments]
+        department_ids, days, sales = list(department_ids), list(days), list(sales)
+        row_count = min(len(department_ids), len(days), len(sales))
+        malformed = max(len(department_ids), len(days), len(sales)) - row_count
+        if malformed:
+            del department_ids[row_count:], days[row_count:], sales[row_count:]
+        
+        row_filter = self._row_filter
+        totals = [0] * len(names)
+        if row_count and row_filter is None and all(names) and 0 <= min(department_ids) \
+                and max(department_ids) < len(names) and MIN_DAY <= min(days) and max(days) <= MAX_DAY \
+                and min(sales) >= 0:
+            for dept_id, num_sales in zip(department_ids, sales):
+                totals[dept_id] += num_sales
+            used = set(department_ids)
+            processed = row_count
+            skipped = filtered = 0
+        else:
+            processed, skipped, filtered, used = self._check_rows(names, department_ids, days, sales, totals)
+        
+        dept_counts = self.dept_counts
+        for dept_id in used:
+            dept_counts[names[dept_id]] += totals[dept_id]
+        
+        skipped += malformed
+        if skipped:
+            logger.warning(f"Rows {self._row_num + 1}-{self._row_num + row_count + malformed}: "
+                           f"Skipped {skipped} invalid rows in row batch")
+        self._row_num += row_count + malformed
+        self.rows_processed += processed
+        self.rows_skipped += skipped
+        self.rows_filtered += filtered
+        if timings is not None:
+            # Validation and per-department sums, as in the CSV row loop
+            timings.add('parse', time.perf_counter() - start)
+    
+    def _check_rows(self, names: list, department_ids: list, days: list, sales: list,
+                    totals: list) -> Tuple[int, int, int, set]:
+        """
+        Filter, validate and sum a row batch row by row into totals.
+        
+        Returns:
+            (rows processed, rows skipped, rows filtered, ids of departments with processed rows)
+        """
+        row_filter = self._row_filter
+        day_from = day_to = None
+        # Per dictionary entry: 1 = aggregate, 0 = filtered by department, -1 = empty name
+        states = [1 if name else -1 for name in names]
+        if row_filter is not None:
+            day_from, day_to = row_filter.day_from, row_filter.day_to
+            include, exclude = row_filter.include, row_filter.exclude
+            for dept_id, name in enumerate(names):
+                if (include is not None and name not in include) or (exclude is not None and name in exclude):
+                    states[dept_id] = 0
+        
+        dictionary_size = len(names)
+        processed = skipped = filtered = 0
+        used = set()
+        for dept_id, day, num_sales in zip(department_ids, days, sales):
+            if not 0 <= dept_id < dictionary_size:
+                skipped += 1
+                continue
+            state = states[dept_id]
+            
+            # Filter before any validation
+            if state == 0 or (day_from is not None and day < day_from) or (day_to is not None and day > day_to):
+                filtered += 1
+                continue
+            
+            if state < 0 or not MIN_DAY <= day <= MAX_DAY or num_sales < 0:
+                skipped += 1
+                continue
+            
+            totals[dept_id] += num_sales
+            used.add(dept_id)
+            processed += 1
+        return processed, skipped, filtered, used
+    
+    def finish(self) -> None:
+        """
+        Process any trailing partial line.
+        
+        Raises:
+            ValueError: If the input had no header row or the header has fewer than 3 columns
+        """
+        if self._pending:
+            block, self._pending = self._pending, b''
+            self._quote_open = False
+            self._parse(block)
+        if self._expect_header:
+            raise ValueError("CSV file is empty")
     
-    with open(output_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Department Name', 'Total Number of Sales'])
+    def merge(self, other: 'SalesAggregator') -> None:
+        """Fold another aggregator's totals into this one in O(departments)."""
+        start = time.perf_counter()
+        for dept, total in other.dept_counts.items():
+            self.dept_counts[dept] += total
+        self.rows_processed += other.rows_processed
+        self.rows_skipped += other.rows_skipped
+        self.rows_filtered += other.rows_filtered
+        self.bytes_received += other.bytes_received
+        if self.timings is not None:
+            if other.timings is not None:
+                self.timings.merge(other.timings)
+            self.timings.add('merge', time.perf_counter() - start)
+    
+    def _parse(self, block: bytes) -> None:
+        """Parse a block of complete lines."""
+        # Timed per block; parse covers validation and accumulation, which share the row loop
+        timings = self.timings
+        start = time.perf_counter() if timings is not None else 0.0
+        text = block.decode('utf-8')
+        if timings is not None:
+            decoded = time.perf_counter()
+            timings.add('decode', decoded - start)
+        
+        if self._expect_header:
+            if not text:
+                return
+            end = text.find('\n') + 1 or len(text)
+            header = next(csv.reader([text[:end]]), [])
+            text = text[end:]
+            self._expect_header = False
+            self._indices = resolve_columns(header, self._columns)
+        
+        dept_index, date_index, sales_index = self._indices
+        needed = max(self._indices) + 1
+        
+        # Unquoted text with only \n or \r\n line ends tokenizes like csv.reader,
+        # so split it directly, stopping after the last needed column
+        if '"' not in text and text.count('\r') == text.count('\r\n'):
+            if '\r' in text:
+                text = text.replace('\r\n', '\n')
+            lines = text.split('\n')
+            if lines[-1] == '':
+                lines.pop()
+            rows = (line.split(',', needed) for line in lines)
+        else:
+            rows = csv.reader(io.StringIO(text, newline=''))
         
-        # sort by department name for consistent output
-        for dept in sorted(dept_counts.keys()):
-            writer.writerow([dept, dept_counts[dept]])
+        dept_counts = self.dept_counts
+        cancel_event = self.cancel_event
+        row_num = self._row_num
+        rows_processed = self.rows_processed
+        rows_skipped = self.rows_skipped
+        rows_filtered = self.rows_filtered
+        
+        # Predicates are bound to locals so unfiltered jobs pay one test per row
+        row_filter = self._row_filter
+        dates_bounded = False
+        if row_filter is not None:
+            date_from, date_to = row_filter.date_from, row_filter.date_to
+            include, exclude = row_filter.include, row_filter.exclude
+            dates_bounded = date_from is not None or date_to is not None
+        
+        try:
+            for row in rows:
+                row_num += 1
+                
+                # Cooperative cancellation checkpoint
+                if cancel_event is not None and row_num % CANCEL_CHECK_INTERVAL == 0 and cancel_event.is_set():
+                    raise JobCancelled(rows_processed, rows_skipped, len(dept_counts), rows_filtered)
+                
+                if len(row) < needed:
+                    rows_skipped += 1
+                    logger.warning(f"Row {row_num}: Skipping malformed row (insufficient columns)")
+                    continue
+                
+                try:
+                    dept_name = row[dept_index].strip()
+                    date_str = row[date_index].strip()
+                    
+                    # Only dates without zero padding are shorter; pad them so they compare correctly
+                    if dates_bounded and len(date_str) != 10:
+                        date_str = _pad_date(date_str)
+                    
+                    # Filter before any validation or conversion
+                    if row_filter is not None and (
+                        (date_from is not None and date_str < date_from)
+                        or (date_to is not None and date_str > date_to)
+                        or (include is not None and dept_name not in include)
+                        or (exclude is not None and dept_name in exclude)
+                    ):
+                        rows_filtered += 1
+                        continue
+                    
+                    sales_str = row[sales_index].strip()
+                    
+                    # Validate department name
+                    if not dept_name:
+                        rows_skipped += 1
+                        logger.warning(f"Row {row_num}: Skipping row with empty department name")
+                        continue
+                    
+                    # Validate date format (ISO format: YYYY-MM-DD)
+                    try:
+                        datetime.strptime(date_str, '%Y-%m-%d')
+                    except ValueError:
+                        rows_skipped += 1
+                        logger.warning(f"Row {row_num}: Invalid date format '{date_str}', expected YYYY-MM-DD")
+                        continue
+                    
+                    # Validate and parse number of sales
+                    try:
+                        num_sales = int(sales_str)
+                        if num_sales < 0:
+                            rows_skipped += 1
+                            logger.warning(f"Row {row_num}: Negative sales value {num_sales}, skipping")
+                            continue
+                        
+                        # Aggregate sales by department
+                        dept_counts[dept_name] += num_sales
+                        rows_processed += 1
+                        
+                    except ValueError:
+                        rows_skipped += 1
+                        logger.warning(f"Row {row_num}: Invalid sales value '{sales_str}', must be an integer")
+                        continue
+                        
+                except Exception as e:
+                    rows_skipped += 1
+                    logger.warning(f"Row {row_num}: Error processing row: {str(e)}")
+                    continue
+        finally:
+            self._row_num = row_num
+            self.rows_processed = rows_processed
+            self.rows_skipped = rows_skipped
+            self.rows_filtered = rows_filtered
+            if timings is not None:
+                timings.add('parse', time.perf_counter() - decoded)
+
+
+def write_results_atomic(dept_counts: Dict[str, int], output_path: str,
+                         compress: bool = False,
+                         buffer_size: int = OUTPUT_BUFFER_SIZE, timings=None) -> None:
+    """
+    Stream sorted department totals to output_path and publish it atomically.
+    
+    Rows are written straight to a temporary file in the destination directory
+    and renamed into place once complete, so readers never see a partially
+    written result and the output is never built up in memory.
+    
+    Args:
+        dept_counts: Mapping of department name -> total number of sales
+        output_path: Final path of the result file
+        compress: Gzip-encode the output (use a .csv.gz path)
+        buffer_size: Size of the file write buffer in bytes
+        timings: Optional PhaseTimings charged with sort and write time
+    """
+    start = time.perf_counter()
+    output_dir = os.path.dirname(output_path) or '.'
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Temp file lives in the same directory so the rename stays on one filesystem;
+    # the dot prefix and .tmp suffix keep it out of /processed/*.csv downloads
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix='.', suffix='.tmp')
+    try:
+        with open(fd, 'wb', buffering=buffer_size) as raw:
+            binary = gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) if compress else raw
+            text = io.TextIOWrapper(binary, encoding='utf-8', newline='')
+            writer = csv.writer(text)
+            writer.writerow(OUTPUT_HEADER)
+            
+            # sort by department name for consistent output
+            sort_start = time.perf_counter()
+            departments = sorted(dept_counts)
+            sort_seconds = time.perf_counter() - sort_start
+            writer.writerows((dept, dept_counts[dept]) for dept in departments)
+            
+            text.detach()  # flushes pending text without closing the file
+            if compress:
+                binary.close()  # writes the gzip trailer, leaves raw open
+        
+        # mkstemp creates 0600 files; results are served by a separate proxy process
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output_path)
+        if timings is not None:
+            timings.add('sort', sort_seconds)
+            timings.add('write', time.perf_counter() - start - sort_seconds)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_output_csv(dept_counts: Dict[str, int], output_path: str) -> None:
+    """Write aggregated results to output CSV file."""
+    write_results_atomic(dept_counts, output_path)
 
 
 def process_csv_stream(input_stream: Iterator[bytes], output_dir: str) -> str:
@@ -0,0 +1,167 @@
+"""
+Persistent running aggregates for named datasets.
+
+Each dataset is a JSON file in the dataset directory holding department
+totals and row metrics, guarded by a lock file so that worker processes of
+a multi-process server can share it. Uploads tagged with a dataset are aggregated on
+their own and merged into the stored state in O(departments), so the cost
+of an upload never depends on the dataset's history. The output CSV is
+materialized on demand and named by version, so a published file never
+changes.
+"""
+import fcntl
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from utils.csv_processor import SalesAggregator, write_results_atomic
+
+# Dataset names become file names; keep them to a safe character set
+DATASET_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def valid_dataset_name(name: str) -> bool:
+    """Return True if name can be used as a dataset name."""
+    return bool(name) and DATASET_NAME_PATTERN.match(name) is not None
+
+
+class DatasetStore:
+    """On-disk store of named, appendable aggregates."""
+    
+    def __init__(self, dataset_dir: str = "storage/datasets"):
+        """
+        Initialize dataset store.
+        
+        Args:
+            dataset_dir: Directory holding one JSON state file per dataset
+        """
+        self.dataset_dir = dataset_dir
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+    
+    def _state_path(self, name: str) -> str:
+        return os.path.join(self.dataset_dir, f"{name}.json")
+    
+    @contextmanager
+    def _locked(self, name: str) -> Iterator[None]:
+        """Serialize access to one dataset across threads and worker processes."""
+        with self._locks_lock:
+            lock = self._locks.get(name)
+            if lock is None:
+                lock = self._locks[name] = threading.Lock()
+        
+        with lock:
+            os.makedirs(self.dataset_dir, exist_ok=True)
+            with open(os.path.join(self.dataset_dir, f".{name}.lock"), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _write_state(self, name: str, state: Dict) -> None:
+        """Atomically replace a dataset's state file."""
+        os.makedirs(self.dataset_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.dataset_dir, prefix='.', suffix='.tmp')
+        try:
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self._state_path(name))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    
+    def load(self, name: str) -> Optional[Dict]:
+        """Return a dataset's state, or None if it does not exist."""
+        if not valid_dataset_name(name):
+            return None
+        try:
+            with open(self._state_path(name), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def merge(self, name: str, aggregator: SalesAggregator) -> Dict:
+        """
+        Fold one upload's totals into a dataset, creating it if needed.
+        
+        Args:
+            name: Dataset to update
+            aggregator: Finished aggregator of the new upload
+        
+        Returns:
+            The dataset's new state
+        
+        Raises:
+            ValueError: If name is not a valid dataset name
+        """
+        if not valid_dataset_name(name):
+            raise ValueError(f"Invalid dataset name: {name!r}")
+        
+        with self._locked(name):
+            state = self.load(name) or {
+                'name': name,
+                'version': 0,
+                'uploads': 0,
+                'rows_processed': 0,
+                'rows_skipped': 0,
+                'rows_filtered': 0,
+                'dept_counts': {},
+                'created_at': time.time()
+            }
+            dept_counts = state['dept_counts']
+            for dept, total in aggregator.dept_counts.items():
+                dept_counts[dept] = dept_counts.get(dept, 0) + total
+            state['version'] += 1
+            state['uploads'] += 1
+            state['rows_processed'] += aggregator.rows_processed
+            state['rows_skipped'] += aggregator.rows_skipped
+            # Absent from states written before filters existed
+            state['rows_filtered'] = state.get('rows_filtered', 0) + aggregator.rows_filtered
+            state['updated_at'] = time.time()
+            self._write_state(name, state)
+            return state
+    
+    def materialize(self, name: str, output_dir: str) -> Optional[Tuple[Dict, str]]:
+        """
+        Write the dataset's current totals as an output CSV unless already written.
+        
+        Args:
+            name: Dataset to materialize
+            output_dir: Directory of processed results
+        
+        Returns:
+            (state, output filename), or None if the dataset does not exist
+        """
+        if not valid_dataset_name(name):
+            return None
+        with self._locked(name):
+            state = self.load(name)
+            if state is None:
+                return None
+            
+            output_filename = f"dataset-{name}-v{state['version']}.csv"
+            output_path = os.path.join(output_dir, output_filename)
+            if not os.path.exists(output_path):
+                write_results_atomic(state['dept_counts'], output_path)
+                self._remove_superseded(name, output_dir, output_filename)
+            return state, output_filename
+    
+    @staticmethod
+    def _remove_superseded(name: str, output_dir: str, current: str) -> None:
+        """Delete earlier materialized versions, which the dataset no longer points to."""
+        pattern = re.compile(rf'^dataset-{re.escape(name)}-v\d+\.csv$')
+        for filename in os.listdir(output_dir):
+            if pattern.match(filename) and filename != current:
+                try:
+                    os.unlink(os.path.join(output_dir, filename))
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,205 @@
+"""
+gRPC transport settings shared by the server, the HTTP proxies and clients.
+
+A TransportProfile bundles message size limits, call compression, HTTP/2
+flow control, keepalive and the per-connection stream limit. PROFILES
+names the deployments we tune for; GRPC_TRANSPORT_PROFILE selects one and
+single GRPC_* variables override its settings (see from_env).
+
+Compression is chosen by the sender: a channel's setting compresses the
+upload chunks clients send, a server's setting its responses. Either side
+reads any supported encoding, so profiles can differ between the two.
+"""
+import os
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import grpc
+
+COMPRESSION_ALGORITHMS = {
+    'none': grpc.Compression.NoCompression,
+    'deflate': grpc.Compression.Deflate,
+    'gzip': grpc.Compression.Gzip
+}
+
+# Keepalive pings more frequent than this are refused by servers (and so by profiles)
+KEEPALIVE_MIN_TIME_MS = 10000
+
+# gRPC's own limit on received messages, kept by the default profile
+DEFAULT_MAX_MESSAGE_BYTES = 4 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class TransportProfile:
+    """Transport settings for one kind of deployment; 0 keeps gRPC's default."""
+    name: str = 'default'
+    # Largest message sent or received
+    max_message_bytes: int = DEFAULT_MAX_MESSAGE_BYTES
+    # Call compression: none, deflate or gzip
+    compression: str = 'none'
+    # Initial HTTP/2 stream flow-control window; BDP probing may grow it further
+    flow_control_window: int = 0
+    bdp_probe: bool = True
+    # Interval of keepalive pings on idle connections, and how long to wait for their ack
+    keepalive_time_ms: int = 0
+    keepalive_timeout_ms: int = 20000
+    # Concurrent streams a server allows per client connection
+    max_concurrent_streams: int = 0
+    # gRPC core tuning hint: blend, latency or throughput
+    optimization_target: str = 'blend'
+    
+    def __post_init__(self):
+        if self.compression not in COMPRESSION_ALGORITHMS:
+            raise ValueError(f"Unknown compression {self.compression!r}, "
+                             f"expected one of {', '.join(COMPRESSION_ALGORITHMS)}")
+        if self.optimization_target not in ('blend', 'latency', 'throughput'):
+            raise ValueError(f"Unknown optimization target {self.optimization_target!r}")
+        if self.keepalive_time_ms and self.keepalive_time_ms < KEEPALIVE_MIN_TIME_MS:
+            raise ValueError(f"Keepalive time must be at least {KEEPALIVE_MIN_TIME_MS}ms")
+        if self.max_message_bytes <= 0:
+            raise ValueError("Maximum message size must be positive")
+    
+    @property
+    def compression_algorithm(self) -> grpc.Compression:
+        return COMPRESSION_ALGORITHMS[self.compression]
+    
+    def _common_options(self) -> List[Tuple[str, object]]:
+        options = [
+            ('grpc.max_send_message_length', self.max_message_bytes),
+            ('grpc.max_receive_message_length', self.max_message_bytes),
+            ('grpc.http2.bdp_probe', int(self.bdp_probe))
+        ]
+        if self.flow_control_window:
+            options.append(('grpc.http2.lookahead_bytes', self.flow_control_window))
+        if self.optimization_target != 'blend':
+            options.append(('grpc.optimization_target', self.optimization_target))
+        return options
+    
+    def server_options(self) -> List[Tuple[str, object]]:
+        """
+        Channel arguments for grpc.server().
+        
+        Servers always accept client keepalive pings down to
+        KEEPALIVE_MIN_TIME_MS, so clients using any profile stay connected.
+        """
+        options = self._common_options() + [
+            ('grpc.keepalive_permit_without_calls', 1),
+            ('grpc.http2.min_ping_interval_without_data_ms', KEEPALIVE_MIN_TIME_MS)
+        ]
+        if self.keepalive_time_ms:
+            options += [
+                ('grpc.keepalive_time_ms', self.keepalive_time_ms),
+                ('grpc.keepalive_timeout_ms', self.keepalive_timeout_ms)
+            ]
+        if self.max_concurrent_streams:
+            options.append(('grpc.max_concurrent_streams', self.max_concurrent_streams))
+        return options
+    
+    def channel_options(self) -> List[Tuple[str, object]]:
+        """Channel arguments for client channels."""
+        options = self._common_options()
+        if self.keepalive_time_ms:
+            options += [
+                ('grpc.keepalive_time_ms', self.keepalive_time_ms),
+                ('grpc.keepalive_timeout_ms', self.keepalive_timeout_ms),
+                ('grpc.keepalive_permit_without_calls', 1),
+                ('grpc.http2.max_pings_without_data', 0)
+            ]
+        return options
+    
+    def server(self, executor, extra_options: Iterable[Tuple[str, object]] = ()) -> grpc.Server:
+        """Create a grpc.server() with this profile's settings."""
+        return grpc.server(executor, options=self.server_options() + list(extra_options),
+                           compression=self.compression_algorithm)
+    
+    def insecure_channel(self, target: str, extra_options: Iterable[Tuple[str, object]] = ()) -> grpc.Channel:
+        """Open a client channel with this profile's settings."""
+        return grpc.insecure_channel(target, options=self.channel_options() + list(extra_options),
+                                     compression=self.compression_algorithm)
+    
+    def aio_insecure_channel(self, target: str, extra_options: Iterable[Tuple[str, object]] = ()):
+        """Open a grpc.aio client channel with this profile's settings."""
+        return grpc.aio.insecure_channel(target, options=self.channel_options() + list(extra_options),
+                                         compression=self.compression_algorithm)
+
+
+PROFILES: Dict[str, TransportProfile] = {
+    # gRPC's defaults: 4 MB messages, no compression, no keepalive
+    'default': TransportProfile(),
+    # Bulk uploads inside a data center: bandwidth is cheap, so no compression;
+    # large messages and a wide window keep a fast link full
+    'lan-bulk': TransportProfile(
+        name='lan-bulk',
+        max_message_bytes=64 * 1024 * 1024,
+        flow_control_window=8 * 1024 * 1024,
+        keepalive_time_ms=60000,
+        max_concurrent_streams=256,
+        optimization_target='throughput'
+    ),
+    # Bulk uploads over slow or long links: CSV text compresses several times
+    # over, a larger window covers the bandwidth-delay product, and pings keep
+    # idle connections open through NATs and load balancers
+    'wan-bulk': TransportProfile(
+        name='wan-bulk',
+        max_message_bytes=64 * 1024 * 1024,
+        compression='gzip',
+        flow_control_window=16 * 1024 * 1024,
+        keepalive_time_ms=30000,
+        keepalive_timeout_ms=10000,
+        max_concurrent_streams=100,
+        optimization_target='throughput'
+    ),
+    # Status polling and small calls: no compression, and dead connections
+    # are noticed within seconds instead of at the next call's timeout
+    'low-latency': TransportProfile(
+        name='low-latency',
+        keepalive_time_ms=10000,
+        keepalive_timeout_ms=5000,
+        max_concurrent_streams=1000,
+        optimization_target='latency'
+    )
+}
+
+
+def get_profile(name: str) -> TransportProfile:
+    """
+    Look up a named profile.
+    
+    Raises:
+        ValueError: If name is not in PROFILES
+    """
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown transport profile {name!r}, expected one of {', '.join(PROFILES)}")
+
+
+def from_env(environ: Optional[Mapping[str, str]] = None) -> TransportProfile:
+    """
+    Build the transport profile configured by environment variables.
+    
+    GRPC_TRANSPORT_PROFILE names the base profile (default 'default');
+    GRPC_MAX_MESSAGE_MB, GRPC_COMPRESSION, GRPC_FLOW_CONTROL_WINDOW_KB,
+    GRPC_KEEPALIVE_TIME_MS, GRPC_KEEPALIVE_TIMEOUT_MS and
+    GRPC_MAX_CONCURRENT_STREAMS override single settings.
+    
+    Raises:
+        ValueError: If the profile is unknown or a setting is invalid
+    """
+    environ = os.environ if environ is None else environ
+    profile = get_profile(environ.get('GRPC_TRANSPORT_PROFILE', 'default'))
+    
+    overrides = {}
+    if environ.get('GRPC_MAX_MESSAGE_MB'):
+        overrides['max_message_bytes'] = int(float(environ['GRPC_MAX_MESSAGE_MB']) * 1024 * 1024)
+    if environ.get('GRPC_COMPRESSION'):
+        overrides['compression'] = environ['GRPC_COMPRESSION'].lower()
+    if environ.get('GRPC_FLOW_CONTROL_WINDOW_KB'):
+        overrides['flow_control_window'] = int(environ['GRPC_FLOW_CONTROL_WINDOW_KB']) * 1024
+    if environ.get('GRPC_KEEPALIVE_TIME_MS'):
+        overrides['keepalive_time_ms'] = int(environ['GRPC_KEEPALIVE_TIME_MS'])
+    if environ.get('GRPC_KEEPALIVE_TIMEOUT_MS'):
+        overrides['keepalive_timeout_ms'] = int(environ['GRPC_KEEPALIVE_TIMEOUT_MS'])
+    if environ.get('GRPC_MAX_CONCURRENT_STREAMS'):
+        overrides['max_concurrent_streams'] = int(environ['GRPC_MAX_CONCURRENT_STREAMS'])
+    return replace(profile, **overrides) if overrides else profile
@@ -0,0 +1,98 @@
+"""
+Opt-in cProfile capture of one job's processing.
+
+The profile is saved in pstats format so a slow job can be examined offline
+(`python -m pstats <file>` or snakeviz), and the functions with the most
+own time are summarized for the job's metrics. Nothing here runs for jobs
+that are not profiled.
+"""
+import cProfile
+import logging
+import os
+import pstats
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Hot functions included in a profiled job's metrics
+PROFILE_TOP_FUNCTIONS = 10
+
+
+def profile_filename(job_id: str) -> str:
+    """Name of a job's profile file in the output directory."""
+    return f"profile-{job_id}.prof"
+
+
+def describe_function(key) -> str:
+    """Format a pstats (file, line, name) key as file:line(name), or a built-in's name."""
+    filename, lineno, name = key
+    if filename == '~':
+        return name
+    return f"{os.path.basename(filename)}:{lineno}({name})"
+
+
+class JobProfiler:
+    """Context manager profiling the calling thread and saving the result."""
+    
+    def __init__(self, profile_path: str):
+        """
+        Initialize job profiler.
+        
+        Args:
+            profile_path: Where the pstats file is written when profiling stops
+        """
+        self.profile_path = profile_path
+        self._profile = cProfile.Profile()
+        self._stats = None
+    
+    def __enter__(self) -> 'JobProfiler':
+        self._profile.enable()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._profile.disable()
+        self._stats = pstats.Stats(self._profile)
+        self._save()
+    
+    def _save(self) -> None:
+        """Atomically write the profile; a failure to save never fails the job."""
+        directory = os.path.dirname(self.profile_path) or '.'
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+            os.close(fd)
+            self._stats.dump_stats(tmp_path)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.profile_path)
+        except OSError as e:
+            logger.warning(f"Could not save profile {self.profile_path}: {str(e)}")
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+    
+    def hot_functions(self, limit: int = PROFILE_TOP_FUNCTIONS):
+        """
+        Return the functions with the most own time.
+        
+        Returns:
+            [(function, calls, self seconds, cumulative seconds), ...] slowest first
+        """
+        if self._stats is None:
+            return []
+        entries = sorted(self._stats.stats.items(), key=lambda item: item[1][2], reverse=True)
+        return [
+            (describe_function(key), calls, self_time, cumulative)
+            for key, (_, calls, self_time, cumulative, _) in entries[:limit]
+        ]
+    
+    def fill(self, metrics, limit: int = PROFILE_TOP_FUNCTIONS) -> None:
+        """Append the hot functions to a ProcessingMetrics message."""
+        for function, calls, self_time, cumulative in self.hot_functions(limit):
+            metrics.hot_functions.add(
+                function=function,
+                calls=calls,
+                self_ms=round(self_time * 1000, 3),
+                cumulative_ms=round(cumulative * 1000, 3)
+            )
@@ -0,0 +1,50 @@
+"""
+Per-phase wall-clock accounting for one job's processing pipeline.
+
+Phases are timed around whole chunks and blocks, never around single rows,
+so the bookkeeping costs a few perf_counter() calls per chunk and can stay
+on in production.
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+# Reporting order of the pipeline's phases
+PHASES = ('receive', 'queue_wait', 'decode', 'parse', 'preview', 'merge', 'sort', 'write', 'lock_wait')
+
+
+class PhaseTimings:
+    """Seconds spent in each phase of one job."""
+    
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self._mark = time.perf_counter()
+    
+    def add(self, phase: str, seconds: float) -> None:
+        """Add time to a phase."""
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+    
+    def lap(self, phase: str) -> None:
+        """Charge the time since the previous lap (or creation) to a phase."""
+        now = time.perf_counter()
+        self.add(phase, now - self._mark)
+        self._mark = now
+    
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        """Charge the time spent in the block to a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+    
+    def merge(self, other: 'PhaseTimings') -> None:
+        """Add another job part's timings to these."""
+        for phase, seconds in other.seconds.items():
+            self.add(phase, seconds)
+    
+    def fill(self, metrics) -> None:
+        """Append the recorded phases to a ProcessingMetrics message in pipeline order."""
+        for phase in sorted(self.seconds, key=lambda name: PHASES.index(name) if name in PHASES else len(PHASES)):
+            metrics.phases.add(phase=phase, duration_ms=round(self.seconds[phase] * 1000, 3))
@@ -0,0 +1,145 @@
+"""
+Embedded SQLite index of completed jobs' department totals.
+
+Every completed job's totals and metrics are recorded when it finishes, so
+totals across jobs can be queried without re-reading any result CSV.
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    filename TEXT,
+    completed_at REAL NOT NULL,
+    rows_processed INTEGER NOT NULL,
+    rows_skipped INTEGER NOT NULL,
+    departments_count INTEGER NOT NULL,
+    processing_time_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_completed_at ON jobs (completed_at);
+CREATE TABLE IF NOT EXISTS totals (
+    job_id TEXT NOT NULL,
+    department TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    PRIMARY KEY (job_id, department)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS totals_department ON totals (department, job_id, total);
+"""
+
+# Per-connection lists a query filters on; unlike IN (?, ...) their size is not bounded
+# by SQLite's limit on bound variables
+QUERY_SCHEMA = """
+CREATE TEMP TABLE IF NOT EXISTS query_jobs (value TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TEMP TABLE IF NOT EXISTS query_departments (value TEXT PRIMARY KEY) WITHOUT ROWID;
+"""
+
+
+class ResultIndex:
+    """Index of per-job department totals backed by a local SQLite file."""
+    
+    def __init__(self, db_path: str = "storage/results.db"):
+        """
+        Initialize result index.
+        
+        Args:
+            db_path: SQLite database file (created on first use)
+        """
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database on first use; callers hold self._lock."""
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            conn.executescript(QUERY_SCHEMA)
+            self._conn = conn
+        return self._conn
+    
+    def add_job(self, job_id: str, filename: Optional[str], completed_at: float,
+                dept_counts: Dict[str, int], rows_processed: int, rows_skipped: int,
+                processing_time_ms: int) -> None:
+        """Record a completed job's totals, replacing any earlier entry for the same job."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM totals WHERE job_id = ?', (job_id,))
+                conn.execute(
+                    'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (job_id, filename, completed_at, rows_processed, rows_skipped,
+                     len(dept_counts), processing_time_ms)
+                )
+                conn.executemany(
+                    'INSERT INTO totals VALUES (?, ?, ?)',
+                    ((job_id, dept, total) for dept, total in dept_counts.items())
+                )
+    
+    def query_totals(self, departments: Iterable[str] = (), job_ids: Iterable[str] = (),
+                     since: Optional[float] = None,
+                     until: Optional[float] = None) -> Tuple[List[Tuple[str, int, int]], int]:
+        """
+        Sum department totals across indexed jobs.
+        
+        Args:
+            departments: Only these departments (all if empty)
+            job_ids: Only these jobs (all if empty)
+            since: Only jobs completed at or after this Unix time
+            until: Only jobs completed before this Unix time
+        
+        Returns:
+            ([(department, total, job_count), ...] sorted by department, number of jobs matched)
+        """
+        job_filters = []
+        params = []
+        job_ids = list(job_ids)
+        if job_ids:
+            job_filters.append('j.job_id IN (SELECT value FROM temp.query_jobs)')
+        if since is not None:
+            job_filters.append('j.completed_at >= ?')
+            params.append(since)
+        if until is not None:
+            job_filters.append('j.completed_at < ?')
+            params.append(until)
+        
+        filters = list(job_filters)
+        totals_params = list(params)
+        departments = list(departments)
+        if departments:
+            filters.append('t.department IN (SELECT value FROM temp.query_departments)')
+        
+        job_where = f"WHERE {' AND '.join(job_filters)}" if job_filters else ''
+        totals_where = f"WHERE {' AND '.join(filters)}" if filters else ''
+        
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                for table, values in (('query_jobs', job_ids), ('query_departments', departments)):
+                    conn.execute(f'DELETE FROM temp.{table}')
+                    conn.executemany(f'INSERT OR IGNORE INTO temp.{table} VALUES (?)',
+                                     ((value,) for value in values))
+                
+                # Only join jobs when filtering on it; totals alone cover the unfiltered case
+                join = 'JOIN jobs j ON j.job_id = t.job_id' if job_filters else ''
+                rows = conn.execute(
+                    f'SELECT t.department, SUM(t.total), COUNT(*) FROM totals t {join} {totals_where} '
+                    'GROUP BY t.department ORDER BY t.department',
+                    totals_params
+                ).fetchall()
+                jobs_matched = conn.execute(f'SELECT COUNT(*) FROM jobs j {job_where}', params).fetchone()[0]
+        return rows, jobs_matched
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
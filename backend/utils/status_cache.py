@@ -0,0 +1,213 @@
+"""
+Job status micro-cache with request coalescing for the HTTP proxy.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Statuses that never change once reached; cached for the longer terminal TTL
+TERMINAL_STATUSES = frozenset({'completed', 'cancelled', 'error'})
+
+# Statuses worth caching at all (not_found/unauthorized always go to the backend)
+CACHEABLE_STATUSES = TERMINAL_STATUSES | {'processing', 'cancelling'}
+
+
+class _Pending:
+    """A backend lookup in flight that concurrent callers wait on."""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class StatusCache:
+    """
+    Cache of job status results keyed by job id.
+    
+    Terminal statuses are kept for terminal_ttl (their output may still be
+    evicted from storage later), in-progress statuses expire after a short
+    TTL, and concurrent misses for the same job share a single backend lookup.
+    """
+    
+    def __init__(self, processing_ttl: float = 0.5, max_entries: int = 10000, terminal_ttl: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize status cache.
+        
+        Args:
+            processing_ttl: Seconds a non-terminal status stays fresh
+            max_entries: Maximum number of cached jobs (least recently used evicted first)
+            terminal_ttl: Seconds a terminal status stays fresh (0 keeps it until LRU-evicted)
+            clock: Monotonic time source
+        """
+        self.processing_ttl = processing_ttl
+        self.max_entries = max_entries
+        self.terminal_ttl = terminal_ttl
+        self._clock = clock
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._pending: Dict[str, _Pending] = {}
+        # Lookups in flight from async callers, all on the serving event loop
+        self._pending_async: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+    
+    def get(self, job_id: str, loader: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Return the status for job_id, calling loader only when no fresh entry exists.
+        
+        Args:
+            job_id: Job to look up
+            loader: Fetches the status from the backend; must return a dict with a 'status' key
+        
+        Returns:
+            The cached or freshly loaded status dict (shared, do not mutate)
+        """
+        with self._lock:
+            value = self._fresh(job_id)
+            if value is not None:
+                return value
+            
+            pending = self._pending.get(job_id)
+            leader = pending is None
+            if leader:
+                pending = self._pending[job_id] = _Pending()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+        
+        try:
+            value = loader()
+            pending.value = value
+            self._store(job_id, value)
+            return value
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._pending[job_id]
+            pending.event.set()
+    
+    async def get_async(self, job_id: str, loader: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Async counterpart of get() for callers on one event loop (the ASGI proxy).
+        
+        Args:
+            job_id: Job to look up
+            loader: Coroutine function fetching the status from the backend
+        
+        Returns:
+            The cached or freshly loaded status dict (shared, do not mutate)
+        """
+        with self._lock:
+            value = self._fresh(job_id)
+            if value is not None:
+                return value
+            
+            future = self._pending_async.get(job_id)
+            leader = future is None
+            if leader:
+                future = self._pending_async[job_id] = asyncio.get_running_loop().create_future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            # Shielded so one waiter's cancellation does not cancel the shared lookup
+            value = await asyncio.shield(future)
+            if value is None:
+                # The leader was cancelled before loading: look up again, one waiter leading
+                return await self.get_async(job_id, loader)
+            return value
+        
+        try:
+            value = await loader()
+            self._store(job_id, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            # Only the leader's request was cancelled; its waiters retry rather than fail
+            future.set_result(None)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here so an unawaited failure is not logged
+            raise
+        finally:
+            with self._lock:
+                del self._pending_async[job_id]
+    
+    def _fresh(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh cached status, counting the hit; callers hold self._lock."""
+        entry = self._entries.get(job_id)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is None or expires_at > self._clock():
+            self.hits += 1
+            self._entries.move_to_end(job_id)
+            return value
+        del self._entries[job_id]
+        return None
+    
+    def _store(self, job_id: str, value: Dict[str, Any]) -> None:
+        """Cache a freshly loaded status according to its state."""
+        status = value.get('status')
+        if status not in CACHEABLE_STATUSES or self.max_entries <= 0:
+            return
+        
+        if status not in TERMINAL_STATUSES:
+            expires_at = self._clock() + self.processing_ttl
+        else:
+            expires_at = self._clock() + self.terminal_ttl if self.terminal_ttl > 0 else None
+        with self._lock:
+            self._entries[job_id] = (value, expires_at)
+            self._entries.move_to_end(job_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, job_id: str) -> None:
+        """Drop any cached status for job_id."""
+        with self._lock:
+            self._entries.pop(job_id, None)
+    
+    def invalidate_download(self, download_url: str) -> int:
+        """
+        Drop cached statuses pointing at a result that is no longer on disk.
+        
+        Called when a download 404s (the output was evicted), so the next
+        poll asks the backend instead of repeating a dead download_url.
+        
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            stale = [job_id for job_id, (value, _) in self._entries.items()
+                     if value.get('download_url') == download_url]
+            for job_id in stale:
+                del self._entries[job_id]
+            return len(stale)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'entries': len(self._entries),
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0
+            }
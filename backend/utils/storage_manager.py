@@ -0,0 +1,285 @@
+"""
+Lifecycle of processed job outputs: sharded placement, access tracking and eviction.
+
+Outputs are spread over hashed subdirectories (ab/cd/<file>) so no single
+directory holds more than a few dozen files even with millions of jobs.
+Each output's size and last access are kept in a SQLite index next to the
+files, shared by the server (which registers and evicts outputs) and the
+HTTP proxy (which records downloads). A sweep evicts outputs older than
+max_age, then the least recently accessed ones until the total fits max_bytes.
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    filename TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_last_access ON outputs (last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+# Index file kept in the output root; the dot prefix keeps it out of downloads
+INDEX_FILENAME = '.storage.db'
+
+# Levels of hashed subdirectories and hex digits per level (256 x 256 leaves)
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+# Seconds within which repeated downloads of a file update its last access only once
+ACCESS_RESOLUTION = 60.0
+
+# Bound on the per-process memo of recently recorded accesses
+_TOUCHED_MAX_ENTRIES = 10000
+
+# Flat files from before sharding that are moved into shards (job results and profiles)
+LEGACY_OUTPUT_PATTERN = re.compile(r'^(?:[0-9a-f]{32}\.csv(?:\.gz)?|profile-[0-9a-f-]{36}\.prof)$')
+
+
+def shard_dir(filename: str) -> str:
+    """Relative hashed subdirectory holding filename; a .gz sibling shares its original's."""
+    if filename.endswith('.gz'):
+        filename = filename[:-3]
+    digest = hashlib.md5(filename.encode('utf-8')).hexdigest()
+    return os.path.join(*(digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS)))
+
+
+class StorageManager:
+    """Sharded output directory with a size- and age-bounded lifetime."""
+    
+    def __init__(self, root: str = "storage/processed", max_bytes: int = 0, max_age: float = 0,
+                 index_path: Optional[str] = None):
+        """
+        Initialize storage manager.
+        
+        Args:
+            root: Output directory; shards and the index live below it
+            max_bytes: Total size of tracked outputs kept by a sweep (0 = unbounded)
+            max_age: Seconds since last access after which outputs are evicted (0 = never)
+            index_path: SQLite index file (defaults to INDEX_FILENAME in root)
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.index_path = index_path or os.path.join(root, INDEX_FILENAME)
+        self._local = threading.local()
+        self._touched: Dict[str, float] = {}
+        
+        os.makedirs(root, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def path_for(self, filename: str) -> str:
+        """Sharded path of an output, creating its directory."""
+        directory = os.path.join(self.root, shard_dir(filename))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+    
+    def locate(self, filename: str) -> Optional[str]:
+        """
+        Find an output on disk.
+        
+        Returns:
+            The sharded path, else the flat path of a file written before
+            sharding (or kept flat, like dataset outputs), else None
+        """
+        for path in (os.path.join(self.root, shard_dir(filename), filename), os.path.join(self.root, filename)):
+            if os.path.isfile(path):
+                return path
+        return None
+    
+    def register(self, filename: str, job_id: str = '', now: Optional[float] = None) -> None:
+        """
+        Start tracking a written output; its size includes any .gz sibling.
+        
+        Args:
+            filename: Output written at path_for(filename)
+            job_id: Job whose record is dropped when the output is evicted
+                (empty for outputs that do not define a job, like profiles)
+            now: Registration time (defaults to the current time)
+        """
+        path = os.path.join(self.root, shard_dir(filename), filename)
+        size = 0
+        for candidate in (path, path + '.gz'):
+            try:
+                size += os.path.getsize(candidate)
+            except FileNotFoundError:
+                pass
+        now = time.time() if now is None else now
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?)',
+                (filename, job_id, size, now, now)
+            )
+    
+    def touch(self, filename: str, now: Optional[float] = None) -> None:
+        """Record a download, at most once per ACCESS_RESOLUTION per file and process."""
+        now = time.time() if now is None else now
+        if now - self._touched.get(filename, float('-inf')) < ACCESS_RESOLUTION:
+            return
+        if len(self._touched) >= _TOUCHED_MAX_ENTRIES:
+            self._touched.clear()
+        self._touched[filename] = now
+        with self._connection() as conn:
+            conn.execute(
+                'UPDATE outputs SET last_access = ? WHERE filename = ? AND last_access < ?',
+                (now, filename, now - ACCESS_RESOLUTION)
+            )
+    
+    def remove(self, filename: str) -> None:
+        """Stop tracking an output and delete it and its .gz sibling."""
+        with self._connection() as conn:
+            conn.execute('DELETE FROM outputs WHERE filename = ?', (filename,))
+        self._unlink(filename)
+    
+    def _unlink(self, filename: str) -> None:
+        """Delete an output's file and .gz sibling, if present."""
+        path = os.path.join(self.root, shard_dir(filename), filename)
+        for candidate in (path, path + '.gz'):
+            try:
+                os.unlink(candidate)
+            except FileNotFoundError:
+                pass
+    
+    def sweep(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """
+        Evict expired outputs, then the least recently accessed until within max_bytes.
+        
+        Each row is claimed with its own DELETE, so concurrent sweeps from
+        several worker processes never evict the same output twice.
+        
+        Returns:
+            [(filename, job_id), ...] of the outputs this call evicted
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        candidates = []
+        if self.max_age:
+            candidates.extend(conn.execute(
+                'SELECT filename, job_id, size FROM outputs WHERE last_access < ? ORDER BY last_access',
+                (now - self.max_age,)
+            ).fetchall())
+        if self.max_bytes:
+            excess = conn.execute('SELECT COALESCE(SUM(size), 0) FROM outputs').fetchone()[0] - self.max_bytes
+            excess -= sum(size for _, _, size in candidates)
+            if excess > 0:
+                expired = {filename for filename, _, _ in candidates}
+                for filename, job_id, size in conn.execute(
+                    'SELECT filename, job_id, size FROM outputs ORDER BY last_access'
+                ):
+                    if excess <= 0:
+                        break
+                    if filename not in expired:
+                        candidates.append((filename, job_id, size))
+                        excess -= size
+        
+        evicted = []
+        evicted_bytes = 0
+        for filename, job_id, size in candidates:
+            with conn:
+                claimed = conn.execute('DELETE FROM outputs WHERE filename = ?', (filename,)).rowcount
+            if claimed:
+                self._unlink(filename)
+                evicted.append((filename, job_id))
+                evicted_bytes += size
+        
+        with conn:
+            conn.executemany(
+                'INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+                (('evicted_files', len(evicted)), ('evicted_bytes', evicted_bytes))
+            )
+            conn.execute('INSERT OR REPLACE INTO counters VALUES (?, ?)', ('last_sweep', now))
+        return evicted
+    
+    def adopt_legacy(self) -> int:
+        """
+        Move flat job results and profiles written before sharding into shards and track them.
+        
+        Returns:
+            Number of files adopted
+        """
+        with os.scandir(self.root) as entries:
+            names = [entry.name for entry in entries if entry.is_file() and LEGACY_OUTPUT_PATTERN.match(entry.name)]
+        moved = []
+        for name in names:
+            try:
+                os.replace(os.path.join(self.root, name), self.path_for(name))
+            except FileNotFoundError:
+                continue  # adopted concurrently by another worker
+            moved.append(name)
+        # Registered once everything has moved, so results' sizes include their .gz
+        for name in moved:
+            if not name.endswith('.gz'):
+                self.register(name, now=os.path.getmtime(self.path_for(name)))
+        return len(moved)
+    
+    def usage(self) -> Dict[str, float]:
+        """Report tracked outputs, limits and eviction totals."""
+        conn = self._connection()
+        files, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM outputs').fetchone()
+        counters = dict(conn.execute('SELECT name, value FROM counters'))
+        return {
+            'files': files,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'max_age_seconds': self.max_age,
+            'evicted_files': int(counters.get('evicted_files', 0)),
+            'evicted_bytes': int(counters.get('evicted_bytes', 0)),
+            'last_sweep': counters.get('last_sweep', 0)
+        }
+    
+    def run_sweeper(self, interval: float, on_evict: Callable[[str, str], None],
+                    stop: Optional[threading.Event] = None) -> None:
+        """
+        Adopt legacy files, then sweep every interval seconds until stop is set.
+        
+        Args:
+            interval: Seconds between sweeps
+            on_evict: Called with (filename, job_id) for every evicted output
+            stop: Optional event ending the loop
+        """
+        stop = stop or threading.Event()
+        try:
+            adopted = self.adopt_legacy()
+            if adopted:
+                logger.info(f"Moved {adopted} flat outputs into sharded storage")
+        except OSError as e:
+            logger.warning(f"Could not adopt flat outputs: {str(e)}")
+        
+        while not stop.wait(interval):
+            try:
+                evicted = self.sweep()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Storage sweep failed: {str(e)}")
+                continue
+            for filename, job_id in evicted:
+                on_evict(filename, job_id)
+            if evicted:
+                usage = self.usage()
+                logger.info(f"Evicted {len(evicted)} outputs; {usage['files']} outputs "
+                            f"using {usage['bytes']} bytes remain")
@@ -0,0 +1,175 @@
+"""
+Incremental request-body readers for streaming uploads through the HTTP proxy.
+
+Bodies are read from the WSGI input stream (or, for the ASGI proxy, from
+async body messages) as they arrive and handed out in fixed-size chunks, so
+an upload is never spooled to disk or held in memory before it is forwarded
+to the gRPC server.
+"""
+from typing import AsyncIterator, BinaryIO, Iterator, Optional
+
+from werkzeug.sansio.multipart import MultipartDecoder, File, Data, Epilogue, NEED_DATA
+
+# Size of each UploadChunk sent to the gRPC server (see benchmarks/bench_upload_chunks.py)
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+# Size of each read from the incoming request body
+READ_SIZE = 64 * 1024
+
+
+def rechunk(pieces: Iterator[bytes], chunk_size: int) -> Iterator[bytes]:
+    """Coalesce arbitrarily sized pieces into chunk_size blocks (the last one may be shorter)."""
+    buffer = bytearray()
+    for piece in pieces:
+        if not buffer and len(piece) == chunk_size:
+            yield piece
+            continue
+        
+        buffer += piece
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    
+    if buffer:
+        yield bytes(buffer)
+
+
+def iter_raw_body(stream: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a raw (application/octet-stream or text/csv) request body in chunks."""
+    def pieces():
+        while True:
+            data = stream.read(READ_SIZE)
+            if not data:
+                break
+            yield data
+    
+    return rechunk(pieces(), chunk_size)
+
+
+class MultipartFileReader:
+    """Incrementally extract a single file field from a multipart/form-data body."""
+    
+    def __init__(self, stream: BinaryIO, boundary: bytes, field_name: str = 'file'):
+        """
+        Initialize multipart reader.
+        
+        Args:
+            stream: Request body stream
+            boundary: Multipart boundary from the Content-Type header
+            field_name: Form field holding the uploaded file
+        """
+        self.stream = stream
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self._decoder = MultipartDecoder(boundary)
+        self._in_file = False
+    
+    def _next_event(self):
+        """Return the next multipart event, reading more of the body as needed."""
+        while True:
+            event = self._decoder.next_event()
+            if event is not NEED_DATA:
+                return event
+            data = self.stream.read(READ_SIZE)
+            self._decoder.receive_data(data or None)
+    
+    def open(self) -> Optional[str]:
+        """
+        Advance to the file field and return its filename.
+        
+        Returns:
+            The uploaded filename (possibly empty), or None if the body has no such field
+        """
+        while True:
+            event = self._next_event()
+            if isinstance(event, Epilogue):
+                return None
+            if isinstance(event, File) and event.name == self.field_name:
+                self.filename = event.filename
+                self._in_file = True
+                return self.filename
+    
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield the file contents in chunk_size blocks as they arrive."""
+        def pieces():
+            while self._in_file:
+                event = self._next_event()
+                if not isinstance(event, Data):
+                    continue
+                if event.data:
+                    yield event.data
+                if not event.more_data:
+                    self._in_file = False
+        
+        return rechunk(pieces(), chunk_size)
+
+
+async def arechunk(pieces: AsyncIterator[bytes], chunk_size: int) -> AsyncIterator[bytes]:
+    """Async counterpart of rechunk()."""
+    buffer = bytearray()
+    async for piece in pieces:
+        if not buffer and len(piece) == chunk_size:
+            yield piece
+            continue
+        
+        buffer += piece
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    
+    if buffer:
+        yield bytes(buffer)
+
+
+class AsyncMultipartFileReader(MultipartFileReader):
+    """MultipartFileReader over an async iterator of body pieces."""
+    
+    def __init__(self, pieces: AsyncIterator[bytes], boundary: bytes, field_name: str = 'file'):
+        """
+        Initialize async multipart reader.
+        
+        Args:
+            pieces: Request body as it arrives
+            boundary: Multipart boundary from the Content-Type header
+            field_name: Form field holding the uploaded file
+        """
+        super().__init__(None, boundary, field_name)
+        self.pieces = pieces
+    
+    async def _next_event(self):
+        """Return the next multipart event, awaiting more of the body as needed."""
+        while True:
+            event = self._decoder.next_event()
+            if event is not NEED_DATA:
+                return event
+            try:
+                data = await self.pieces.__anext__()
+            except StopAsyncIteration:
+                data = None
+            if data is None or data:
+                self._decoder.receive_data(data)
+    
+    async def open(self) -> Optional[str]:
+        """Advance to the file field and return its filename (None if the body has no such field)."""
+        while True:
+            event = await self._next_event()
+            if isinstance(event, Epilogue):
+                return None
+            if isinstance(event, File) and event.name == self.field_name:
+                self.filename = event.filename
+                self._in_file = True
+                return self.filename
+    
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Yield the file contents in chunk_size blocks as they arrive."""
+        async def pieces():
+            while self._in_file:
+                event = await self._next_event()
+                if not isinstance(event, Data):
+                    continue
+                if event.data:
+                    yield event.data
+                if not event.more_data:
+                    self._in_file = False
+        
+        return arechunk(pieces(), chunk_size)
@@ -0,0 +1,270 @@
+"""
+On-disk spool for resumable upload sessions.
+
+Each session is a pair of files in the spool directory: <session_id>.json
+holding metadata and <session_id>.part holding the bytes received so far.
+The size of the .part file is the committed offset, so sessions survive
+dropped streams and server restarts. Sessions idle for longer than a TTL
+are deleted by expire().
+
+A writer stream claims a session with an exclusive flock on its .part
+file, so the claim also holds against worker processes sharing the spool
+directory.
+"""
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterator, Optional
+from uuid import uuid4
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Block size used when reading a spooled upload back for processing
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadSpool:
+    """Persistent storage for resumable upload sessions."""
+    
+    def __init__(self, spool_dir: str = "storage/uploads"):
+        """
+        Initialize upload spool.
+        
+        Args:
+            spool_dir: Directory holding session metadata and partial data
+        """
+        self.spool_dir = spool_dir
+        # Sessions claimed by streams in this process, with their locked data file
+        self._active: Dict[str, object] = {}
+        self._lock = threading.Lock()
+    
+    def _meta_path(self, session_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{session_id}.json")
+    
+    def _data_path(self, session_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{session_id}.part")
+    
+    def _write_metadata(self, session_id: str, metadata: Dict) -> None:
+        """Atomically replace a session's metadata file."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.spool_dir, prefix='.', suffix='.tmp')
+        with open(fd, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+        os.replace(tmp_path, self._meta_path(session_id))
+    
+    def create(self, filename: Optional[str], total_size: int = 0) -> str:
+        """
+        Open a new session.
+        
+        Args:
+            filename: Original filename of the upload
+            total_size: Expected size in bytes, or 0 if unknown
+        
+        Returns:
+            The new session id
+        """
+        os.makedirs(self.spool_dir, exist_ok=True)
+        session_id = uuid4().hex
+        open(self._data_path(session_id), 'wb').close()
+        self._write_metadata(session_id, {
+            'session_id': session_id,
+            'filename': filename,
+            'total_size': total_size,
+            'status': 'receiving',
+            'job_id': '',
+            'created_at': time.time()
+        })
+        return session_id
+    
+    def metadata(self, session_id: str) -> Optional[Dict]:
+        """Return a session's metadata, or None if it does not exist."""
+        # Session ids are uuid hex; reject anything that could escape the spool dir
+        if not session_id or not session_id.isalnum():
+            return None
+        try:
+            with open(self._meta_path(session_id), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def committed_offset(self, session_id: str) -> int:
+        """Return the number of bytes durably received for a session."""
+        try:
+            return os.path.getsize(self._data_path(session_id))
+        except FileNotFoundError:
+            return 0
+    
+    def acquire(self, session_id: str) -> bool:
+        """
+        Claim a session for one writer stream; False if another stream holds it.
+        
+        The claim is an exclusive flock on the session's data file, so it
+        also excludes streams in other processes. The holder should re-read
+        the metadata, which another process may have completed meanwhile.
+        """
+        with self._lock:
+            if session_id in self._active:
+                return False
+            lock_file = open(self._data_path(session_id), 'ab')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return False
+            self._active[session_id] = lock_file
+            return True
+    
+    def release(self, session_id: str) -> None:
+        """Release a session claimed with acquire()."""
+        with self._lock:
+            lock_file = self._active.pop(session_id, None)
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+    
+    def append(self, session_id: str, offset: int, data: bytes, f=None) -> int:
+        """
+        Append a chunk received at offset and return the new committed offset.
+        
+        Bytes before the committed offset (retransmissions) are skipped.
+        
+        Args:
+            session_id: Session to append to
+            offset: Byte offset of data within the upload
+            data: Chunk payload
+            f: Open unbuffered append handle from open_data(), to avoid reopening per chunk
+        
+        Raises:
+            ValueError: If offset is beyond the committed offset (a gap)
+        """
+        committed = f.tell() if f is not None else self.committed_offset(session_id)
+        if offset > committed:
+            raise ValueError(f"Chunk offset {offset} is beyond committed offset {committed}")
+        
+        skip = committed - offset
+        if skip >= len(data):
+            return committed
+        
+        payload = memoryview(data)[skip:]
+        if f is None:
+            with self.open_data(session_id) as out:
+                self._write_all(out, payload)
+        else:
+            self._write_all(f, payload)
+        return committed + len(payload)
+    
+    @staticmethod
+    def _write_all(f, payload: memoryview) -> None:
+        """Write payload through an unbuffered handle, retrying short writes."""
+        while payload:
+            written = f.write(payload)
+            payload = payload[written:]
+    
+    def open_data(self, session_id: str):
+        """Open a session's data file for unbuffered appends."""
+        return open(self._data_path(session_id), 'ab', buffering=0)
+    
+    def iter_data(self, session_id: str) -> Iterator[bytes]:
+        """Yield a session's received bytes in blocks."""
+        with open(self._data_path(session_id), 'rb') as f:
+            for block in iter(lambda: f.read(READ_BLOCK_SIZE), b''):
+                yield block
+    
+    def complete(self, session_id: str, job_id: str, size: int) -> None:
+        """Mark a session as handed off to a processing job after receiving size bytes."""
+        metadata = self.metadata(session_id)
+        if metadata is not None:
+            metadata['status'] = 'completed'
+            metadata['job_id'] = job_id
+            metadata['size'] = size
+            self._write_metadata(session_id, metadata)
+    
+    def expire(self, max_age: float, now: Optional[float] = None) -> int:
+        """
+        Delete sessions with no activity for max_age seconds.
+        
+        Activity is the last write to a session's data or metadata, so
+        abandoned sessions lose their partial data and completed sessions
+        their metadata. Sessions held by a stream in any process are kept.
+        
+        Returns:
+            Number of sessions deleted
+        """
+        now = time.time() if now is None else now
+        try:
+            names = os.listdir(self.spool_dir)
+        except FileNotFoundError:
+            return 0
+        
+        expired = 0
+        for name in names:
+            session_id, ext = os.path.splitext(name)
+            if ext != '.json':
+                continue
+            paths = (self._meta_path(session_id), self._data_path(session_id))
+            with self._lock:
+                if session_id in self._active:
+                    continue
+                last_activity = 0.0
+                for path in paths:
+                    try:
+                        last_activity = max(last_activity, os.path.getmtime(path))
+                    except FileNotFoundError:
+                        pass
+                if now - last_activity < max_age or not self._unlink_unclaimed(paths):
+                    continue
+            expired += 1
+        return expired
+    
+    @staticmethod
+    def _unlink_unclaimed(paths) -> bool:
+        """Delete a session's files unless a stream in another process holds its data file."""
+        meta_path, data_path = paths
+        try:
+            lock_file = open(data_path, 'rb')
+        except FileNotFoundError:
+            lock_file = None
+        try:
+            if lock_file is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            for path in paths:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            return True
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+    
+    def run_sweeper(self, interval: float, max_age: float, stop: Optional[threading.Event] = None) -> None:
+        """
+        Expire idle sessions every interval seconds until stop is set.
+        
+        Args:
+            interval: Seconds between sweeps
+            max_age: Seconds without activity after which a session is deleted
+            stop: Optional event ending the loop
+        """
+        stop = stop or threading.Event()
+        while not stop.wait(interval):
+            try:
+                expired = self.expire(max_age)
+            except OSError as e:
+                logger.warning(f"Upload session sweep failed: {str(e)}")
+                continue
+            if expired:
+                logger.info(f"Expired {expired} idle upload sessions")
+    
+    def discard_data(self, session_id: str) -> None:
+        """Delete a session's received bytes, keeping its metadata."""
+        try:
+            os.unlink(self._data_path(session_id))
+        except FileNotFoundError:
+            pass